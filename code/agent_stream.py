@@ -0,0 +1,125 @@
+# code/agent_stream.py
+
+import re
+from langchain.callbacks.base import BaseCallbackHandler
+
+# 최종 답변 $JSON_BLOB에서 action_input 문자열이 시작되는 지점
+FINAL_ANSWER_START = re.compile(r'"action"\s*:\s*"Final Answer"\s*,\s*"action_input"\s*:\s*"')
+HEX4 = re.compile(r'[0-9a-fA-F]{4}')
+JSON_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', '\\': '\\', '/': '/'}
+
+
+class FinalAnswerExtractor:
+    """
+    LLM이 토큰 단위로 내보내는 STRUCTURED_CHAT 출력에서 최종 답변 문자열만 골라냅니다.
+    {"action": "Final Answer", "action_input": "..."}의 action_input이 시작되면 그 뒤 글자를
+    JSON 이스케이프를 풀어 가며 돌려주고, 닫는 따옴표를 만나면 멈춥니다.
+    이스케이프 문자(서로게이트 쌍 포함)가 토큰 경계에서 잘리면 다음 토큰이 올 때까지 기다립니다.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """새 LLM 호출(에이전트 반복)이 시작될 때 상태를 비웁니다."""
+        self.buffer = ""
+        self.position = None
+        self.finished = False
+
+    def feed(self, token):
+        """토큰 하나를 받아, 이번에 새로 드러난 최종 답변 글자들을 반환합니다. (없으면 빈 문자열)"""
+        self.buffer += token
+        if self.finished:
+            return ""
+        if self.position is None:
+            match = FINAL_ANSWER_START.search(self.buffer)
+            if match is None:
+                return ""
+            self.position = match.end()
+
+        buffer, index, output = self.buffer, self.position, []
+        while index < len(buffer):
+            char = buffer[index]
+            if char == '"':
+                self.finished = True
+                break
+            if char == '\\':
+                if index + 1 >= len(buffer):
+                    break
+                escaped = buffer[index + 1]
+                if escaped == 'u':
+                    if index + 6 > len(buffer):
+                        break
+                    if not HEX4.fullmatch(buffer[index + 2:index + 6]):
+                        output.append('\ufffd')
+                        index += 6
+                        continue
+                    code = int(buffer[index + 2:index + 6], 16)
+                    if 0xD800 <= code < 0xDC00:
+                        # 이모지 같은 BMP 밖 글자는 \uD83D\uDE00처럼 두 개로 나뉘어 오므로 짝을 기다려 합칩니다.
+                        if index + 12 > len(buffer):
+                            break
+                        low = buffer[index + 6:index + 12]
+                        if low[:2] == '\\u' and HEX4.fullmatch(low[2:]) and 0xDC00 <= int(low[2:], 16) < 0xE000:
+                            output.append(chr(0x10000 + ((code - 0xD800) << 10) + (int(low[2:], 16) - 0xDC00)))
+                            index += 12
+                            continue
+                    # 짝이 없는 서로게이트는 UTF-8로 내보낼 수 없으므로 대체 문자로 바꿉니다.
+                    output.append('\ufffd' if 0xD800 <= code < 0xE000 else chr(code))
+                    index += 6
+                    continue
+                output.append(JSON_ESCAPES.get(escaped, escaped))
+                index += 2
+                continue
+            output.append(char)
+            index += 1
+        self.position = index
+        return "".join(output)
+
+
+class AgentEventStream(BaseCallbackHandler):
+    """
+    에이전트 실행 중의 콜백을 화면이 소비할 이벤트로 바꾸어 큐에 넣습니다.
+    - {'type': 'action', 'tool', 'input'}: 도구 호출
+    - {'type': 'observation', 'tool', 'output'}: 도구 결과 (parallel_actions 안의 개별 도구는 제외)
+    - {'type': 'token', 'text'}: 최종 답변 토큰
+    - {'type': 'reset'}: 앞서 흘려보낸 답변 토큰을 지워야 함 (최종 답변이 도구 호출과 섞여 버려지고 LLM을 다시 부를 때)
+    ChatOllama는 /api/chat 응답을 조각 단위로 받아 on_llm_new_token으로 알려 주므로,
+    LLM 호출이 끝나기 전에 최종 답변을 화면에 흘려보낼 수 있습니다.
+    """
+    def __init__(self, events):
+        self.events = events
+        self.extractor = FinalAnswerExtractor()
+        self._tool_runs = set()
+        self._streamed = False
+
+    def _start_llm_call(self):
+        """새 LLM 호출이 시작되면, 이전 호출에서 흘려보낸 답변은 최종 답변이 아니었으므로 화면에서 지우게 합니다."""
+        self.extractor.reset()
+        if self._streamed:
+            self._streamed = False
+            self.events.put({'type': 'reset'})
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._start_llm_call()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._start_llm_call()
+
+    def on_llm_new_token(self, token, **kwargs):
+        text = self.extractor.feed(token)
+        if text:
+            self._streamed = True
+            self.events.put({'type': 'token', 'text': text})
+
+    def on_agent_action(self, action, **kwargs):
+        self.events.put({'type': 'action', 'tool': action.tool, 'input': action.tool_input})
+
+    def on_tool_start(self, serialized, input_str, run_id=None, parent_run_id=None, **kwargs):
+        self._tool_runs.add(run_id)
+
+    def on_tool_end(self, output, run_id=None, parent_run_id=None, **kwargs):
+        self._tool_runs.discard(run_id)
+        # 묶음 실행 도구 안에서 돈 개별 도구는 묶음의 관찰 결과에 함께 담기므로 따로 보내지 않습니다.
+        if parent_run_id in self._tool_runs:
+            return
+        self.events.put({'type': 'observation', 'tool': kwargs.get('name'), 'output': str(output)})
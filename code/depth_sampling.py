@@ -0,0 +1,57 @@
+# code/depth_sampling.py
+
+import numpy as np
+
+# 박스 깊이 샘플링 방식
+SAMPLING_METHODS = ('center', 'median', 'trimmed_mean')
+
+
+def sample_box_depth(depth_data, boxes_xyxy, method='median', inner_ratio=0.5, grid_size=9, trim=0.2):
+    """
+    각 탐지 박스의 안쪽 영역(ROI)에서 깊이 값을 강건하게 추출함.
+    박스 중심을 기준으로 폭/높이의 inner_ratio 만큼의 창을 잡고,
+    그 안에 grid_size x grid_size 격자로 샘플을 뽑아 0(구멍)을 제외한
+    중앙값(median) 또는 절사평균(trimmed_mean)을 모든 박스에 대해 한 번에 계산함.
+    유효한 샘플이 하나도 없는 박스는 0을 반환함.
+    """
+    height, width = depth_data.shape[:2]
+    boxes = np.asarray(boxes_xyxy, dtype=np.float64)
+    centers_x = (boxes[:, 0] + boxes[:, 2]) / 2
+    centers_y = (boxes[:, 1] + boxes[:, 3]) / 2
+
+    if method == 'center':
+        pixel_x = np.clip(centers_x.astype(np.int32), 0, width - 1)
+        pixel_y = np.clip(centers_y.astype(np.int32), 0, height - 1)
+        return depth_data[pixel_y, pixel_x].astype(np.float64)
+
+    if method not in SAMPLING_METHODS:
+        raise ValueError(f"Unknown depth sampling method: {method}")
+
+    # (N, G) 크기의 격자 픽셀 좌표를 만든 뒤 (N, G, G)로 한 번에 인덱싱
+    offsets = np.linspace(-0.5, 0.5, grid_size) * inner_ratio
+    grid_x = centers_x[:, None] + (boxes[:, 2] - boxes[:, 0])[:, None] * offsets
+    grid_y = centers_y[:, None] + (boxes[:, 3] - boxes[:, 1])[:, None] * offsets
+    grid_x = np.clip(grid_x.astype(np.int32), 0, width - 1)
+    grid_y = np.clip(grid_y.astype(np.int32), 0, height - 1)
+    samples = depth_data[grid_y[:, :, None], grid_x[:, None, :]].reshape(len(boxes), -1).astype(np.float64)
+
+    # 0(구멍)은 inf로 밀어내고 정렬하여, 유효 샘플이 앞쪽에 모이도록 함
+    valid_counts = np.count_nonzero(samples > 0, axis=1)
+    samples[samples <= 0] = np.inf
+    samples.sort(axis=1)
+    rows = np.arange(len(boxes))
+
+    if method == 'median':
+        lower = np.maximum(valid_counts - 1, 0) // 2
+        upper = valid_counts // 2
+        result = (samples[rows, lower] + samples[rows, upper]) / 2
+    else:
+        # 유효 샘플의 앞뒤 trim 비율만큼을 잘라낸 나머지의 평균
+        cut = (valid_counts * trim).astype(np.int64)
+        index = np.arange(samples.shape[1])[None, :]
+        keep = (index >= cut[:, None]) & (index < (valid_counts - cut)[:, None])
+        kept_counts = np.maximum(keep.sum(axis=1), 1)
+        result = np.where(keep, samples, 0.0).sum(axis=1) / kept_counts
+
+    result[valid_counts == 0] = 0.0
+    return result
@@ -0,0 +1,53 @@
+# code/detections.py
+
+import numpy as np
+
+
+class DetectionBatch:
+    """
+    한 프레임의 탐지 결과를 배열 단위로 보관하는 구조체.
+    박스마다 딕셔너리를 만드는 대신 NumPy 배열로 들고 있다가,
+    에이전트 도구가 필요로 할 때만 좌표 목록으로 변환함.
+    추적기를 거친 결과라면 track_ids에 객체별 고유 번호가 채워짐.
+    """
+    __slots__ = ('names', 'class_ids', 'confidences', 'boxes', 'centers', 'points', 'track_ids')
+
+    def __init__(self, names, class_ids, confidences, boxes, centers, points, track_ids=None):
+        self.names = names              # (N,) 객체 이름
+        self.class_ids = class_ids      # (N,) YOLO 클래스 번호
+        self.confidences = confidences  # (N,) 신뢰도
+        self.boxes = boxes              # (N, 4) xyxy 픽셀 좌표
+        self.centers = centers          # (N, 2) 박스 중심 픽셀 (정수)
+        self.points = points            # (N, 3) 카메라 기준 좌표 (cm)
+        self.track_ids = track_ids      # (N,) 추적 ID (추적기 미사용 시 None)
+
+    @classmethod
+    def empty(cls):
+        """탐지 결과가 없는 빈 배치를 생성함."""
+        return cls(
+            np.empty(0, dtype=object), np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.float32), np.empty((0, 4), dtype=np.float32),
+            np.empty((0, 2), dtype=np.int32), np.empty((0, 3), dtype=np.float64)
+        )
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    def to_text(self):
+        """탐지된 객체 이름을 중복 없이 나열한 문자열을 반환함."""
+        if len(self) == 0:
+            return "nothing"
+        return ", ".join(dict.fromkeys(self.names.tolist()))
+
+    def to_coordinates(self):
+        """기존 도구들이 사용하는 좌표 딕셔너리 목록 형식으로 변환함."""
+        confidences = np.round(self.confidences.astype(np.float64), 2).tolist()
+        points = np.round(self.points, 2).tolist()
+        coordinates = [
+            {'name': name, 'confidence': conf, 'x': p[0], 'y': p[1], 'z': p[2]}
+            for name, conf, p in zip(self.names.tolist(), confidences, points)
+        ]
+        if self.track_ids is not None:
+            for coord, track_id in zip(coordinates, self.track_ids.tolist()):
+                coord['id'] = track_id
+        return coordinates
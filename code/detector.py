@@ -0,0 +1,116 @@
+# code/detector.py
+
+import os
+import shutil
+import time
+import numpy as np
+from ultralytics import YOLO
+from logger import get_logger
+
+logger = get_logger('DETECTOR')
+
+# 지원하는 추론 백엔드 (torch: Ultralytics PyTorch 기본 경로)
+DETECTOR_BACKENDS = ('torch', 'onnx', 'openvino')
+
+
+class YoloDetector:
+    """
+    YOLO 추론 백엔드를 하나의 호출 형태로 감싸는 클래스입니다.
+    - onnx/openvino 백엔드는 최초 실행 시 .pt 모델을 내보내고(export) 모델 폴더에 캐시합니다.
+    - int8=True이면 양자화된 모델을 사용합니다. (ONNX: 동적 양자화, OpenVINO: NNCF 보정)
+    - 입력 크기(imgsz)를 고정하고, 시작 시 예열(warmup) 추론으로 첫 프레임 지연을 없앱니다.
+    VisionSystem과 PyBulletSimulator가 같은 클래스를 공유합니다.
+    """
+    def __init__(self, model_path, backend='torch', imgsz=640, int8=False, threads=None,
+                 warmup=True, calibration_data='coco8.yaml'):
+        if backend not in DETECTOR_BACKENDS:
+            raise ValueError(f"Unknown detector backend: {backend}")
+
+        self.source_path = model_path
+        self.backend = backend
+        self.imgsz = imgsz
+        self.int8 = int8
+        self.threads = threads
+        self.calibration_data = calibration_data
+
+        if self.threads and self.backend == 'torch':
+            import torch
+            torch.set_num_threads(self.threads)
+
+        self.model_path = self._prepare_model()
+        self.model = YOLO(self.model_path, task='detect')
+        self.warmup_seconds = self.warmup() if warmup else 0.0
+        logger.info(f"Detector ready: backend={self.backend}, int8={self.int8}, imgsz={self.imgsz}, "
+                    f"model={os.path.basename(self.model_path)}, warmup={self.warmup_seconds:.2f}s")
+
+    @property
+    def names(self):
+        """클래스 번호와 이름의 대응표를 반환합니다."""
+        return self.model.names
+
+    def cached_model_path(self):
+        """백엔드 설정에 해당하는 내보낸 모델의 캐시 경로를 반환합니다."""
+        directory = os.path.dirname(os.path.abspath(self.source_path))
+        stem = os.path.splitext(os.path.basename(self.source_path))[0]
+        suffix = f"{self.imgsz}{'_int8' if self.int8 else ''}"
+        if self.backend == 'onnx':
+            return os.path.join(directory, f"{stem}_{suffix}.onnx")
+        return os.path.join(directory, f"{stem}_{suffix}_openvino_model")
+
+    def _prepare_model(self):
+        """필요하면 모델을 내보내고, 실제로 불러올 모델 경로를 반환합니다."""
+        if self.backend == 'torch':
+            return self.source_path
+
+        cached_path = self.cached_model_path()
+        if os.path.exists(cached_path):
+            return cached_path
+
+        logger.info(f"Exporting {os.path.basename(self.source_path)} to {self.backend} (imgsz={self.imgsz})...")
+        source = YOLO(self.source_path)
+        if self.backend == 'onnx':
+            exported = source.export(format='onnx', imgsz=self.imgsz, dynamic=False, simplify=True)
+            if self.int8:
+                # ONNX Runtime 동적 양자화로 가중치를 INT8로 변환합니다.
+                from onnxruntime.quantization import quantize_dynamic, QuantType
+                quantize_dynamic(exported, cached_path, weight_type=QuantType.QUInt8)
+                os.remove(exported)
+                return cached_path
+        else:
+            exported = source.export(format='openvino', imgsz=self.imgsz, int8=self.int8,
+                                     data=self.calibration_data if self.int8 else None)
+
+        shutil.move(exported, cached_path)
+        return cached_path
+
+    def _apply_thread_settings(self):
+        """ONNX Runtime 세션을 지정한 스레드 수로 다시 생성합니다."""
+        if not self.threads or self.backend != 'onnx':
+            return
+        backend = getattr(getattr(self.model, 'predictor', None), 'model', None)
+        if backend is None or not hasattr(backend, 'session'):
+            logger.warning("ONNX session not found; thread setting was not applied.")
+            return
+
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        backend.session = onnxruntime.InferenceSession(
+            self.model_path, sess_options=options, providers=backend.session.get_providers()
+        )
+
+    def warmup(self, runs=2):
+        """빈 이미지로 추론을 몇 번 수행하여 그래프 초기화 비용을 미리 치르고, 소요 시간(초)을 반환합니다."""
+        started = time.perf_counter()
+        dummy = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+        self(dummy)
+        self._apply_thread_settings()
+        for _ in range(runs - 1):
+            self(dummy)
+        return time.perf_counter() - started
+
+    def __call__(self, image, conf=0.5):
+        """이미지 한 장을 추론하여 Ultralytics Results 목록을 반환합니다."""
+        return self.model.predict(image, imgsz=self.imgsz, conf=conf, verbose=False)
@@ -1,17 +1,31 @@
 # code/engine.py
 
+import os
+import queue
+import sys
 import threading
 import time
-import cv2
+from collections import deque
+import numpy as np
 import streamlit as st
 from streamlit.runtime.scriptrunner import add_script_run_ctx
 from langchain.callbacks.base import BaseCallbackHandler
 from langchain_community.chat_models import ChatOllama
 from langchain.agents import initialize_agent, AgentType
-from langchain.memory import ConversationSummaryBufferMemory
 from langchain.prompts import MessagesPlaceholder
+from langchain.globals import set_llm_cache
 
 from vision import VisionSystem
+from vision_pipeline import VisionPipeline
+from vision_worker import VisionWorkerClient
+from vision_snapshot import VisionSnapshot, SnapshotStore
+from servo_controller import VisualServoController
+from intent_router import IntentRouter
+from parallel_tools import MultiActionOutputParser, ParallelActionsTool, is_parallel_safe
+from agent_stream import AgentEventStream
+from llm_cache import LLMResponseCache, DEFAULT_CACHE_PATH
+from summary_memory import BackgroundSummaryMemory
+from ollama_prompt import OLLAMA_KEEP_ALIVE, OLLAMA_NUM_CTX, PromptCacheMonitor, freeze_system_prefix, warm_up
 from tools import TOOLS
 from logger import get_logger
 
@@ -41,22 +55,47 @@ class AgentFileLogger(BaseCallbackHandler):
         agent_logger.info("> Finished chain.\n")
 
 class MachEngine:
-    def __init__(self, sim_mode=False):
-        """비전 시스템과 메모리, 에이전트를 초기화합니다."""
+    def __init__(self, sim_mode=False, frame_source=None, vision_process=None):
+        """
+        비전 시스템과 메모리, 에이전트를 초기화합니다.
+        frame_source에 녹화 재생 소스(ReplaySource)를 넘기면 카메라 없이 녹화 세션으로 동작합니다.
+        vision_process가 True이면(기본값: 환경 변수 MACH_VISION_PROCESS=1) 카메라와 YOLO를
+        별도 작업 프로세스에서 돌리고, 엔진은 공유 메모리로 결과만 읽어 옵니다.
+        """
         self.sim_mode = sim_mode  # 모드 상태 저장
+        if vision_process is None:
+            vision_process = os.environ.get("MACH_VISION_PROCESS") == "1"
+        self.vision_process = vision_process
+        self.frame_source = frame_source
         
-        self.vision = VisionSystem(sim_mode=self.sim_mode)
-        self.last_frame = None
-        self.last_vision_result = "nothing"
-        self.last_coordinates = []
+        # 별도 프로세스 모드에서는 작업 프로세스가 카메라를 소유하므로 여기서 열지 않습니다.
+        self.vision = None if vision_process else VisionSystem(sim_mode=self.sim_mode, source=frame_source)
+        # 프레임, 탐지 문자열, 좌표를 한 덩어리로 교체하는 최신 비전 스냅샷 저장소
+        self.snapshots = SnapshotStore()
+        # 팔이 마지막으로 움직인 시점의 프레임 번호 (이보다 큰 번호의 프레임이 '이동 후' 프레임)
+        self.motion_seq = 0
         
         self.llm = ChatOllama(
             model="gemma3:27b", 
             base_url="http://ollama.aikopo.net", 
-            temperature=0.0
+            temperature=0.0,
+            # 모델과 프롬프트 캐시가 내려가지 않도록 붙잡아 두고, 프롬프트가 잘리지 않을 만큼 컨텍스트를 고정합니다.
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            num_ctx=OLLAMA_NUM_CTX
         )
+        # 같은 대화 상태에서 같은 요청에 대한 LLM 응답(도구 호출 계획, 요약 포함)을 디스크에 캐시합니다.
+        # 실시간 상태 도구의 관찰 결과가 담긴 프롬프트는 캐시하지 않습니다. (MACH_LLM_CACHE=0 이면 끔)
+        self.llm_cache = None
+        if os.environ.get("MACH_LLM_CACHE", "1") != "0":
+            self.llm_cache = LLMResponseCache(
+                path=os.environ.get("MACH_LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+                live_tools=[t.name for t in TOOLS if (t.metadata or {}).get("live_state")],
+                state_key=lambda: f"sim_mode={self.sim_mode}",
+            )
+        set_llm_cache(self.llm_cache)
         
-        self.memory = ConversationSummaryBufferMemory(
+        # 대화 기록이 길어지면 답변을 돌려준 뒤 백그라운드에서 요약합니다. (사용자 턴에서 요약 LLM 호출을 뺌)
+        self.memory = BackgroundSummaryMemory(
             llm=self.llm,
             max_token_limit=1000, 
             memory_key="chat_history",
@@ -66,7 +105,37 @@ class MachEngine:
         
         # 클래스 내부의 _init_agent 함수를 올바르게 호출합니다.
         self.agent_executor = self._init_agent()
-        self.is_running = False
+        # 시스템 메시지를 바이트 단위로 고정하고, 반복마다 Ollama의 prompt 평가 토큰/시간을 기록합니다.
+        self.prompt_prefix = freeze_system_prefix(self.agent_executor)
+        self.prompt_monitor = PromptCacheMonitor(self.prompt_prefix)
+        self.llm.callbacks = [self.prompt_monitor]
+        # 첫 대화 턴이 모델 적재를 기다리지 않도록 미리 모델을 올리고 접두부를 평가해 둡니다.
+        threading.Thread(target=warm_up, args=(self.llm, self.prompt_prefix), name="ollama-warmup", daemon=True).start()
+        # 단순 요청은 에이전트를 거치지 않고 바로 처리합니다. (MACH_FAST_PATH=0 이면 끔)
+        self.router = IntentRouter(TOOLS) if os.environ.get("MACH_FAST_PATH", "1") != "0" else None
+        # 대화 턴별 첫 글자 표시 시간(TTFT)과 전체 소요 시간 기록
+        self.turn_metrics = deque(maxlen=50)
+        self.vision_pipeline = None
+
+    @property
+    def is_running(self):
+        """비전 파이프라인이 동작 중인지 여부를 반환합니다."""
+        return self.vision_pipeline is not None and self.vision_pipeline.is_running
+
+    @property
+    def last_frame(self):
+        """최신 스냅샷의 원본 컬러 프레임 (읽기 전용)."""
+        return self.snapshots.latest().frame
+
+    @property
+    def last_vision_result(self):
+        """최신 스냅샷의 탐지 객체 이름 문자열."""
+        return self.snapshots.latest().vision_result
+
+    @property
+    def last_coordinates(self):
+        """최신 스냅샷의 객체별 좌표 목록."""
+        return list(self.snapshots.latest().coordinates)
 
     def _init_agent(self):
         """반드시 지켜야할 지침들로 에이전트를 초기화합니다."""
@@ -87,7 +156,9 @@ class MachEngine:
             "- 단순 탐지는 'vision_detect', 상세 분석(옷, 색상 등)은 'vision_analyze'를 사용하십시오.\n"
             "- 팔을 움직일 때는 'vision_detect'로 최신 좌표를 얻은 뒤, 'robot_action'을 호출하십시오.\n"
             "- 'robot_action' 사용 시 target_x/y/z_cm 파라미터를 필수적으로 포함하십시오.\n"
-            "- [이동 루프]: 로봇 팔 이동 후에는 반드시 'vision_detect'를 재수행하여 객체 위치를 재확인하십시오.\n"
+            "- 특정 물체에 팔을 가져갈 때는 'visual_servo'를 한 번 호출하십시오. 도착하거나 멈출 때까지 스스로 위치를 재확인하며 접근합니다.\n"
+            "- [이동 루프]: 'robot_action'으로 직접 팔을 움직였다면 반드시 'vision_detect'를 재수행하여 객체 위치를 재확인하십시오.\n"
+            "- [동시 호출]: 서로 결과에 기대지 않는 조회 도구({parallel_tools})는 $JSON_BLOB 목록 하나([{{...}}, {{...}}])로 한꺼번에 호출할 수 있으며, 관찰 결과도 한꺼번에 돌아옵니다.\n"
             "- [중단 조건]: 물체가 사라지거나(nothing), 좌표가 (0,0,0)이거나, '닿지 않음(Unreachable)' 오류 발생 시 즉시 멈추고 보고하십시오.\n\n"
 
             "[제3원칙: 기억 관리] (Memory)\n"
@@ -101,7 +172,10 @@ class MachEngine:
             "당신은 바퀴가 없어 이동할 수 없습니다. 오직 팔만 움직일 수 있음을 명심하십시오."
         )
 
-        return initialize_agent(
+        parallel_tools = ", ".join(f"'{tool.name}'" for tool in TOOLS if is_parallel_safe(tool))
+        system_instruction = system_instruction.replace("{parallel_tools}", parallel_tools)
+
+        agent_executor = initialize_agent(
             tools=TOOLS, 
             llm=self.llm, 
             agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION, 
@@ -113,41 +187,218 @@ class MachEngine:
             agent_kwargs={
                 "prefix": system_instruction,
                 "memory_prompts": [MessagesPlaceholder(variable_name="chat_history")],
-                "input_variables": ["input", "agent_scratchpad", "chat_history"]
+                "input_variables": ["input", "agent_scratchpad", "chat_history"],
+                # 목록으로 받은 여러 도구 호출을 parallel_actions 호출 하나로 묶는 파서
+                "output_parser": MultiActionOutputParser()
             }
         )
+        # parallel_actions는 프롬프트에는 보이지 않고, 파서가 묶은 호출을 실행할 때만 쓰입니다.
+        self.parallel_tool = ParallelActionsTool.from_tools(TOOLS)
+        agent_executor.tools = list(agent_executor.tools) + [self.parallel_tool]
+        return agent_executor
 
     def run_agent(self, user_input, callbacks=None):
-        """에이전트를 실행하여 사용자 입력에 대응합니다."""
+        """
+        에이전트를 실행하여 사용자 입력에 대응합니다.
+        표정 요청, 탐지/위치 질문처럼 단순한 요청은 빠른 경로에서 도구를 바로 실행하고 에이전트를 건너뜁니다.
+        """
+        if self.router is not None:
+            answer = self.router.route(user_input)
+            if answer is not None:
+                self._remember_turn(user_input, answer)
+                return answer
+
         try:
+            started = time.perf_counter()
             response = self.agent_executor.invoke(
                 {"input": user_input},
                 {"callbacks": callbacks}
             )
+            if self.router is not None:
+                self.router.record_agent_turn(time.perf_counter() - started)
             return response.get("output", "답변을 생성하지 못했습니다.")
         except Exception as e:
             agent_logger.error(f"에이전트 실행 오류: {e}")
             return f"오류가 발생했습니다: {str(e)}"
 
-    def start_vision_loop(self):
-        """비전 루프를 별도 스레드에서 시작합니다."""
+    def stream_agent(self, user_input):
+        """
+        에이전트를 백그라운드 스레드에서 실행하며 진행 이벤트를 차례로 내보내는 생성기입니다.
+        {'type': 'action' | 'observation' | 'token' | 'reset' | 'final', ...} 형태이며, 'token'은 최종 답변이 생성되는 대로
+        조각 단위로 나오고('reset'이 오면 그때까지의 조각은 버림), 마지막에는 항상 전체 답변을 담은 'final'이 나옵니다.
+        첫 답변 글자가 화면에 나갈 수 있었던 시점(TTFT)과 전체 턴 시간을 따로 기록합니다.
+        """
+        started = time.perf_counter()
+        if self.router is not None:
+            answer = self.router.route(user_input)
+            if answer is not None:
+                self._remember_turn(user_input, answer)
+                self._record_turn(started, time.perf_counter(), fast_path=True)
+                yield {'type': 'final', 'output': answer}
+                return
+
+        events = queue.Queue()
+
         def run():
-            self.is_running = True
-            logger.info("Vision loop started")
             try:
-                while self.is_running:
-                    combined, color, text, coords = self.vision.process_frame()
-                    if combined is not None:
-                        self.last_frame = color
-                        self.last_vision_result = text
-                        self.last_coordinates = coords
-                        cv2.imshow("MACH VII - Live Vision", combined)
-                        if cv2.waitKey(1) & 0xFF == ord('q'): break
-                    time.sleep(0.01)
+                response = self.agent_executor.invoke(
+                    {"input": user_input},
+                    {"callbacks": [AgentEventStream(events)]}
+                )
+                events.put({'type': 'final', 'output': response.get("output", "답변을 생성하지 못했습니다.")})
+            except Exception as e:
+                agent_logger.error(f"에이전트 실행 오류: {e}")
+                events.put({'type': 'final', 'output': f"오류가 발생했습니다: {str(e)}", 'error': True})
             finally:
-                cv2.destroyAllWindows()
-                self.vision.release()
-        
-        thread = threading.Thread(target=run, daemon=True)
+                events.put(None)
+
+        # 도구가 st.session_state와 화면 요소를 쓸 수 있도록 실행 문맥을 붙여 둡니다.
+        thread = threading.Thread(target=run, name="agent-turn", daemon=True)
         add_script_run_ctx(thread)
-        thread.start()
\ No newline at end of file
+        thread.start()
+
+        first_visible_at = None
+        while (event := events.get()) is not None:
+            if first_visible_at is None and event['type'] in ('token', 'final'):
+                first_visible_at = time.perf_counter()
+            yield event
+        thread.join()
+        self._record_turn(started, first_visible_at)
+
+    def _record_turn(self, started, first_visible_at, fast_path=False):
+        """한 턴의 TTFT와 전체 소요 시간을 기록합니다. 에이전트 턴이면 빠른 경로의 절약 시간 추정에도 씁니다."""
+        total = time.perf_counter() - started
+        ttft = (first_visible_at or time.perf_counter()) - started
+        self.turn_metrics.append({'ttft_s': ttft, 'total_s': total, 'fast_path': fast_path})
+        if not fast_path and self.router is not None:
+            self.router.record_agent_turn(total)
+        agent_logger.info(f"Turn finished: TTFT {ttft:.2f}s, total {total:.2f}s{' (fast path)' if fast_path else ''}")
+
+    def turn_stats(self):
+        """최근 대화 턴의 TTFT와 전체 소요 시간 p50/p95(초)를 반환합니다."""
+        if not self.turn_metrics:
+            return {}
+        ttft = np.array([m['ttft_s'] for m in self.turn_metrics])
+        total = np.array([m['total_s'] for m in self.turn_metrics])
+        return {
+            'turns': len(self.turn_metrics),
+            'ttft_p50_s': round(float(np.percentile(ttft, 50)), 2),
+            'ttft_p95_s': round(float(np.percentile(ttft, 95)), 2),
+            'total_p50_s': round(float(np.percentile(total, 50)), 2),
+            'total_p95_s': round(float(np.percentile(total, 95)), 2),
+        }
+
+    def _remember_turn(self, user_input, answer):
+        """빠른 경로로 처리한 대화도 에이전트가 이어서 알 수 있도록 대화 기억에 남깁니다."""
+        try:
+            self.memory.save_context({"input": user_input}, {"output": answer})
+        except Exception as e:
+            agent_logger.warning(f"빠른 경로 대화 기억 실패: {e}")
+
+    def _publish_vision_result(self, packet):
+        """비전 파이프라인의 발행 단계에서 호출되어 최신 탐지 결과를 엔진에 반영합니다."""
+        batch = packet['batch']
+        self.snapshots.publish(VisionSnapshot(
+            seq=packet['seq'], captured_at=packet['captured_at'], frame=packet['color'],
+            vision_result=batch.to_text(), coordinates=batch.to_coordinates(), batch=batch
+        ))
+
+    def start_vision_loop(self, headless=None):
+        """
+        비전 루프를 수집/추론/발행 스레드로 나누어 시작합니다.
+        headless가 True이면 화면 창을 띄우지 않으며, 지정하지 않으면 환경 변수 MACH_HEADLESS=1이거나
+        리눅스에서 DISPLAY가 없을 때 헤드리스로 동작합니다.
+        시뮬레이터 모드에서는 서버를 과도하게 호출하지 않도록 수집 주기를 30fps로 제한합니다.
+        별도 프로세스 모드에서는 실행 중인 작업 프로세스에 붙거나, 없으면 새로 띄웁니다.
+        """
+        if self.vision_process:
+            # 작업 프로세스는 항상 헤드리스로 동작하며, 화면은 get_display_frame()으로 이 프로세스에서 그립니다.
+            self.vision_pipeline = VisionWorkerClient(
+                on_publish=self._publish_vision_result, sim_mode=self.sim_mode,
+                replay=getattr(self.frame_source, 'path', None)
+            )
+            for thread in self.vision_pipeline.threads:
+                add_script_run_ctx(thread)
+            self.vision_pipeline.start()
+            return
+
+        if headless is None:
+            headless = (os.environ.get("MACH_HEADLESS") == "1"
+                        or (sys.platform.startswith("linux") and not os.environ.get("DISPLAY")))
+
+        self.vision_pipeline = VisionPipeline(
+            self.vision,
+            on_publish=self._publish_vision_result,
+            window_name=None if headless else "MACH VII - Live Vision",
+            min_capture_interval=1 / 30 if self.sim_mode else 0.0
+        )
+        for thread in self.vision_pipeline.threads:
+            add_script_run_ctx(thread)
+        self.vision_pipeline.start()
+
+    def get_display_frame(self):
+        """
+        탐지 박스와 깊이 컬러맵이 그려진 최신 화면을 요청 시점에 그려 반환합니다.
+        (합성 화면, 주석 이미지) 형태이며, 반환 이미지는 재사용 버퍼입니다.
+        """
+        if self.vision_pipeline is None:
+            return None, None
+        return self.vision_pipeline.render_latest()
+
+    def vision_stats(self):
+        """비전 파이프라인 단계별 FPS와 지연 시간, 추론 생략 통계를 반환합니다."""
+        if self.vision_pipeline is None:
+            return {}
+        report = self.vision_pipeline.stats()
+        # 별도 프로세스 모드에서는 작업 프로세스가 추론 생략 통계를 함께 기록합니다.
+        if self.vision is not None and self.vision.motion_gate is not None:
+            report['motion_gate'] = self.vision.motion_gate.stats()
+        if self.vision is not None and self.vision.sim_server is not None:
+            report['sim_server'] = self.vision.sim_server.stats()
+            if self.vision.sim_server.stream is not None:
+                report['sim_stream'] = self.vision.sim_server.stream.stats()
+        return report
+
+    def notify_arm_moved(self):
+        """
+        로봇 팔이 움직였음을 알려, 다음 프레임에서 반드시 새로 탐지하도록 합니다.
+        이동 시점의 프레임 번호를 기록해 두었다가 get_snapshot(fresh=True)가 이동 후 프레임을 기다리게 합니다.
+        """
+        if self.vision is not None:
+            self.vision.force_inference()
+        elif self.vision_pipeline is not None:
+            self.vision_pipeline.force_inference()
+        if self.vision_pipeline is not None:
+            # 지금 수집 중인 프레임은 이동 전에 찍혔을 수 있으므로 한 장을 더 건너뜁니다.
+            self.motion_seq = self.vision_pipeline.last_captured_seq + 1
+        else:
+            self.motion_seq = self.snapshots.latest().seq
+        return self.motion_seq
+
+    def get_snapshot(self, fresh=False, timeout=2.0):
+        """
+        최신 비전 스냅샷을 반환합니다.
+        fresh가 True이고 팔이 움직인 뒤의 프레임이 아직 발행되지 않았다면 최대 timeout초 기다리며,
+        그래도 들어오지 않으면 가장 최근 스냅샷을 그대로 반환합니다.
+        """
+        snapshot = self.snapshots.latest()
+        if not fresh or snapshot.seq > self.motion_seq or not self.is_running:
+            return snapshot
+
+        started = time.perf_counter()
+        fresh_snapshot = self.snapshots.wait_for_snapshot(newer_than=self.motion_seq, timeout=timeout)
+        if fresh_snapshot is None:
+            logger.warning(f"No post-motion frame within {timeout:.1f}s (motion seq {self.motion_seq})")
+            return self.snapshots.latest()
+        logger.info(f"Waited {(time.perf_counter() - started) * 1000:.0f}ms for post-motion frame #{fresh_snapshot.seq}")
+        return fresh_snapshot
+
+    def servo_to(self, target, arm, timeout=20.0, **options):
+        """
+        비전 스냅샷을 프레임 단위로 받아 target 물체('cup' 또는 'cup#3')에 팔을 접근시킵니다.
+        arm은 position()/move(position)/settle(timeout)을 가진 팔 객체(SimArm, CommandArm)이며, 결과 요약(dict)을 반환합니다.
+        """
+        if not self.is_running:
+            return {'status': 'no_vision', 'target': target}
+        controller = VisualServoController(self.snapshots, arm, on_move=self.notify_arm_moved, **options)
+        return controller.run(target, timeout=timeout)
@@ -0,0 +1,177 @@
+# code/frame_source.py
+
+import json
+import os
+import time
+import numpy as np
+from logger import get_logger
+
+logger = get_logger('SOURCE')
+
+# 녹화 폴더 구성: color.bin / depth.bin (프레임을 이어 붙인 원시 배열), stamps.npy, meta.json
+COLOR_FILE, DEPTH_FILE, STAMPS_FILE, META_FILE = "color.bin", "depth.bin", "stamps.npy", "meta.json"
+
+
+class FrameRecorder:
+    """
+    정렬된 컬러/깊이 프레임을 메모리 맵으로 바로 열 수 있는 원시 바이너리 형식으로 녹화합니다.
+    카메라 내부 파라미터, 깊이 스케일 등은 metadata로 받아 meta.json에 함께 기록합니다.
+    """
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.metadata = dict(metadata or {})
+        os.makedirs(self.path, exist_ok=True)
+        self._color_file = open(os.path.join(self.path, COLOR_FILE), "wb")
+        self._depth_file = open(os.path.join(self.path, DEPTH_FILE), "wb")
+        self._stamps = []
+        self._layout = None
+
+    def write(self, color_image, depth_data, timestamp=None):
+        """프레임 한 쌍을 파일 끝에 이어 씁니다. 모든 프레임은 첫 프레임과 같은 크기여야 합니다."""
+        layout = (color_image.shape, color_image.dtype.str, depth_data.shape, depth_data.dtype.str)
+        if self._layout is None:
+            self._layout = layout
+        elif layout != self._layout:
+            raise ValueError(f"Frame layout changed during recording: {layout} != {self._layout}")
+
+        self._color_file.write(np.ascontiguousarray(color_image).tobytes())
+        self._depth_file.write(np.ascontiguousarray(depth_data).tobytes())
+        self._stamps.append(time.time() if timestamp is None else timestamp)
+
+    def close(self):
+        """파일을 닫고 프레임 수와 배열 형식을 meta.json에 기록합니다."""
+        self._color_file.close()
+        self._depth_file.close()
+        if self._layout is None:
+            logger.warning(f"No frames were recorded to {self.path}")
+            return
+
+        color_shape, color_dtype, depth_shape, depth_dtype = self._layout
+        np.save(os.path.join(self.path, STAMPS_FILE), np.array(self._stamps, dtype=np.float64))
+        meta = dict(self.metadata, count=len(self._stamps),
+                    color_shape=list(color_shape), color_dtype=color_dtype,
+                    depth_shape=list(depth_shape), depth_dtype=depth_dtype)
+        with open(os.path.join(self.path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        logger.info(f"Recorded {len(self._stamps)} frames to {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplaySource:
+    """
+    FrameRecorder로 녹화한 세션을 메모리 맵으로 열어 프레임을 순서대로 재생합니다.
+    VisionSystem(source=...)에 넘기면 리얼센스 파이프라인이나 PyBulletServer 대신 사용됩니다.
+    pacing='realtime'이면 녹화 당시의 시간 간격을 지키고, 'fast'이면 기다리지 않고 바로 내보냅니다.
+    """
+    def __init__(self, path, pacing="realtime", loop=True):
+        if pacing not in ("realtime", "fast"):
+            raise ValueError(f"Unknown pacing: {pacing}")
+        self.path = path
+        self.pacing = pacing
+        self.loop = loop
+
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        count = self.meta['count']
+        self.color = np.memmap(os.path.join(path, COLOR_FILE), dtype=np.dtype(self.meta['color_dtype']),
+                               mode="r", shape=(count, *self.meta['color_shape']))
+        self.depth = np.memmap(os.path.join(path, DEPTH_FILE), dtype=np.dtype(self.meta['depth_dtype']),
+                               mode="r", shape=(count, *self.meta['depth_shape']))
+        self.stamps = np.load(os.path.join(path, STAMPS_FILE))
+
+        # 녹화 당시의 카메라 설정을 그대로 재현하기 위한 값들
+        self.sim_mode = self.meta.get('mode') == 'sim'
+        self.camera_params = self.meta.get('camera_params')
+        self.depth_scale = self.meta.get('depth_scale')
+
+        self.index = 0
+        self._started_at = None
+
+    def __len__(self):
+        return len(self.stamps)
+
+    def read(self):
+        """
+        다음 프레임의 (컬러, 깊이) 배열을 반환합니다. 메모리 맵 위의 읽기 전용 뷰이므로 복사가 일어나지 않습니다.
+        재생이 끝났고 loop가 False이면 (None, None)을 반환합니다.
+        """
+        if self.index >= len(self):
+            if not self.loop or len(self) == 0:
+                return None, None
+            self.index = 0
+            self._started_at = None
+
+        if self.pacing == "realtime":
+            now = time.perf_counter()
+            if self._started_at is None:
+                self._started_at = now - (self.stamps[self.index] - self.stamps[0])
+            wait = self._started_at + (self.stamps[self.index] - self.stamps[0]) - now
+            if wait > 0:
+                time.sleep(wait)
+
+        color_image, depth_data = self.color[self.index], self.depth[self.index]
+        self.index += 1
+        return color_image, depth_data
+
+    def release(self):
+        """메모리 맵을 닫습니다."""
+        self.color = self.depth = None
+
+
+class SyntheticSource:
+    """
+    하드웨어나 녹화 없이 벤치마크를 돌리기 위한 합성 프레임 소스입니다.
+    바닥 평면 위에서 움직이는 사각형 물체들을 그려 컬러/깊이 프레임을 만들며,
+    ReplaySource와 같은 방식으로 VisionSystem(source=...)에 넘길 수 있습니다.
+    """
+    def __init__(self, frames=300, sim_mode=False, width=None, height=480, objects=5, seed=0):
+        self.frames = frames
+        self.sim_mode = sim_mode
+        self.width = width or (600 if sim_mode else 640)
+        self.height = height
+        self.depth_scale = None if sim_mode else 0.001
+        self.camera_params = None if sim_mode else {
+            'width': self.width, 'height': self.height, 'fx': 615.0, 'fy': 615.0,
+            'ppx': self.width / 2, 'ppy': self.height / 2,
+            'model': 'inverse_brown_conrady', 'coeffs': [0.0] * 5,
+        }
+        rng = np.random.default_rng(seed)
+        self._positions = rng.uniform([40, 40], [self.width - 120, self.height - 120], size=(objects, 2))
+        self._velocities = rng.uniform(-3, 3, size=(objects, 2))
+        self._colors = rng.integers(0, 255, size=(objects, 3)).tolist()
+        self._background = rng.integers(90, 130, size=(self.height, self.width, 3), dtype=np.uint8)
+        self.index = 0
+
+    def __len__(self):
+        return self.frames
+
+    def read(self):
+        """다음 합성 프레임 (컬러, 깊이)을 생성합니다. 지정한 프레임 수를 넘으면 (None, None)을 반환합니다."""
+        if self.index >= self.frames:
+            return None, None
+        self.index += 1
+
+        color_image = self._background.copy()
+        # 바닥 깊이 0.8m, 물체 깊이 0.5m (파이불렛은 깊이 버퍼 값으로 근사)
+        if self.sim_mode:
+            depth_data = np.full((self.height, self.width), 0.99, dtype=np.float32)
+            object_depth = 0.98
+        else:
+            depth_data = np.full((self.height, self.width), 800, dtype=np.uint16)
+            object_depth = 500
+
+        self._positions += self._velocities
+        self._positions %= [self.width - 80, self.height - 80]
+        for (x, y), color in zip(self._positions.astype(int).tolist(), self._colors):
+            color_image[y:y + 80, x:x + 80] = color
+            depth_data[y:y + 80, x:x + 80] = object_depth
+        return color_image, depth_data
+
+    def release(self):
+        """합성 소스는 정리할 자원이 없습니다."""
+        pass
@@ -0,0 +1,179 @@
+# code/intent_router.py
+
+import os
+import re
+import threading
+import time
+from collections import deque
+from tools.emotion_set import EMOTION_PRESETS, KOREAN_MAPPING
+from logger import get_logger
+
+logger = get_logger('ROUTER')
+
+# 에이전트 실행 시간을 아직 재 보지 못했을 때 쓰는 한 턴 소요 시간 추정치 (절약 시간 보고용)
+DEFAULT_AGENT_TURN_S = float(os.environ.get("MACH_AGENT_TURN_S", "8.0"))
+
+# 혼자서 표정 요청이 되는 명령형 동사 ("웃어봐", "울어봐"처럼 발화 전체가 이 말일 때만)
+EMOTION_VERBS = {
+    '웃어': 'joy', '웃자': 'joy', '기뻐해': 'joy', '울어': 'sadness', '슬퍼해': 'sadness',
+    '화내': 'anger', '무서워해': 'fear', '겁먹어': 'fear', '부러워해': 'envy',
+}
+# 감정 형용사 ("슬픈 영화 추천해줘"처럼 다른 뜻으로도 쓰이므로 '표정/얼굴'과 함께 있을 때만 씁니다)
+EMOTION_ADJECTIVES = {
+    '웃는': 'joy', '기쁜': 'joy', '행복한': 'joy', '슬픈': 'sadness', '우는': 'sadness', '화난': 'anger',
+    '무서운': 'fear', '겁먹은': 'fear', '부러운': 'envy', '지루한': 'ennui', '심심한': 'ennui', '민망한': 'embarrassment',
+}
+# 답변에 쓰는 프리셋별 한국어 이름
+EMOTION_LABELS = {
+    'idle': '평온한', 'thinking': '생각하는', 'joy': '기쁜', 'sadness': '슬픈', 'anger': '화난',
+    'disgust': '까칠한', 'fear': '겁먹은', 'anxiety': '불안한', 'embarrassment': '당황한',
+    'envy': '부러워하는', 'ennui': '따분한',
+}
+# "슬픈 표정 지어줘", "웃는 얼굴 보여줘"처럼 표정/얼굴을 지어 달라는 요청
+FACE_REQUEST = re.compile(r'(표정|얼굴)\S*\s*(좀\s*)?(지어|짓|해|보여|만들|바꿔)')
+# 부르는 말과 어미를 뺀 발화 전체가 명령형 동사 하나인지 확인합니다. ("맹칠아 웃어봐!")
+IMPERATIVE_PATTERN = re.compile(
+    r'^\s*(맹칠아?\s*,?\s*)?(좀\s*)?(?P<verb>' + '|'.join(EMOTION_VERBS) + r')'
+    r'\s*(봐|봐요|봐라|보거라|줘|줘요|요|라)?\s*[!.~?]*\s*$')
+
+# "뭐가 보여?", "앞에 뭐 있어?" 같은 전체 탐지 질문 (의문사와 함께 보이는 것/장소를 가리키는 말이 있어야 합니다)
+DETECT_PATTERN = re.compile(
+    r'(뭐가|무엇이|뭐|무엇|어떤\s*(것|거|물건)\s*(이|가)?)\s*(보여|보이)'
+    r'|(앞에|눈앞에|화면에|카메라에)\S*\s*(뭐가|무엇이|뭐|무엇|어떤)'
+    r'|what\s+(do\s+you\s+see|is\s+in\s+front)', re.IGNORECASE)
+# "컵 어디 있어?" 같은 위치 질문 ('#3'처럼 추적 번호를 붙일 수 있습니다)
+LOCATION_PATTERN = re.compile(
+    r'^\s*(?P<target>[\w가-힣 ]+?(\s*#\s*\d+)?)\s*(은|는|이|가)?\s*(어디|위치|좌표)', re.IGNORECASE)
+
+# 위치 질문에 나오는 한국어 물체 이름 -> YOLO(COCO) 클래스 이름
+OBJECT_NAMES = {
+    '컵': 'cup', '잔': 'cup', '병': 'bottle', '물병': 'bottle', '사람': 'person', '휴대폰': 'cell phone',
+    '핸드폰': 'cell phone', '폰': 'cell phone', '책': 'book', '마우스': 'mouse', '키보드': 'keyboard',
+    '노트북': 'laptop', '의자': 'chair', '가위': 'scissors', '숟가락': 'spoon', '포크': 'fork',
+    '칼': 'knife', '그릇': 'bowl', '바나나': 'banana', '사과': 'apple', '오렌지': 'orange',
+    '곰인형': 'teddy bear', '인형': 'teddy bear', '시계': 'clock', '리모컨': 'remote', '꽃병': 'vase',
+    '가방': 'backpack', '우산': 'umbrella', '화분': 'potted plant', '텔레비전': 'tv', '티비': 'tv',
+}
+# 이런 말이 섞인 요청은 단순 조회가 아니므로 에이전트에게 넘깁니다.
+OPEN_ENDED = re.compile(r'왜|어떻게|그리고|다음에|한\s*뒤|잡아|집어|옮겨|움직|가져|기억|저장|설명|분석|색깔|무슨\s*색|입고')
+# "웃는 얼굴 하지 마"처럼 하지 말라는 요청은 규칙이 뜻을 뒤집어 실행할 수 있으므로 에이전트에게 넘깁니다.
+NEGATION = re.compile(r'지\s*마|말아|하지\s*마|않')
+
+
+class IntentRouter:
+    """
+    자주 들어오는 단순 요청을 규칙으로 알아보고, LLM 에이전트를 거치지 않고 도구를 바로 실행하는 빠른 경로입니다.
+    - 표정 요청 ("웃어봐", "슬픈 표정 지어줘") -> emotion_set
+    - 탐지 질문 ("뭐가 보여?") -> vision_detect
+    - 위치 질문 ("컵 어디 있어?", "cup#3 위치") -> find_location
+    그 밖의 열린 요청은 None을 반환하여 에이전트가 처리하게 합니다.
+    빠른 경로로 처리한 비율과, 에이전트 평균 턴 시간 대비 절약한 시간을 stats()로 보고합니다.
+    """
+    def __init__(self, tools, max_length=40):
+        self.tools = {t.name: t for t in tools}
+        self.max_length = max_length
+        self._lock = threading.Lock()
+        self._agent_turns = deque(maxlen=50)
+        self.total = 0
+        self.hits = {}
+        self.fast_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def classify(self, text):
+        """입력을 (의도, 도구 인자)로 분류합니다. 빠른 경로로 처리할 수 없으면 (None, None)입니다."""
+        text = text.strip()
+        if not text or len(text) > self.max_length or OPEN_ENDED.search(text) or NEGATION.search(text):
+            return None, None
+
+        emotion = self._match_emotion(text)
+        if emotion is not None:
+            return 'emotion', emotion
+        if DETECT_PATTERN.search(text):
+            return 'detect', text
+        target = self._match_location(text)
+        if target is not None:
+            return 'location', target
+        return None, None
+
+    def _match_emotion(self, text):
+        """
+        표정 요청이면 프리셋 이름을 반환합니다.
+        '표정/얼굴'을 지어 달라는 말과 감정 단어가 함께 있거나, 발화 전체가 "웃어봐" 같은 명령형 동사일 때만 표정 요청으로 봅니다.
+        """
+        imperative = IMPERATIVE_PATTERN.match(text)
+        if imperative is not None:
+            return EMOTION_VERBS[imperative.group('verb')]
+        if not FACE_REQUEST.search(text):
+            return None
+        lower_text = text.lower()
+        found = next((name for name in EMOTION_PRESETS if re.search(rf'\b{name}\b', lower_text)), None)
+        if found is None:
+            words = list(KOREAN_MAPPING.items()) + list(EMOTION_ADJECTIVES.items()) + list(EMOTION_VERBS.items())
+            found = next((name for word, name in words if word in text), None)
+        return found
+
+    def _match_location(self, text):
+        """위치 질문이면 find_location에 넘길 물체 이름('cup', 'cup#3')을 반환합니다."""
+        match = LOCATION_PATTERN.search(text)
+        if match is None:
+            return None
+        target = match.group('target').strip()
+        name, _, track_id = target.partition('#')
+        name = name.strip().lower()
+        name = OBJECT_NAMES.get(name, name)
+        if name not in OBJECT_NAMES.values():
+            return None
+        return f"{name}#{track_id.strip()}" if track_id else name
+
+    def route(self, text):
+        """
+        빠른 경로로 처리할 수 있으면 도구를 실행하고 답변 문자열을 반환합니다.
+        처리할 수 없으면 None을 반환합니다.
+        """
+        started = time.perf_counter()
+        intent, argument = self.classify(text)
+        with self._lock:
+            self.total += 1
+        if intent is None:
+            return None
+
+        if intent == 'emotion':
+            self.tools['emotion_set'].invoke({"emotion_input": argument})
+            answer = f"분부대로 {EMOTION_LABELS.get(argument, argument)} 표정을 지었사옵니다, 마마."
+        elif intent == 'detect':
+            answer = f"마마, 지금 눈앞의 모습을 아뢰옵니다.\n{self.tools['vision_detect'].invoke({'query': argument})}"
+        else:
+            answer = f"마마, 찾아보았사옵니다.\n{self.tools['find_location'].invoke({'target': argument})}"
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.hits[intent] = self.hits.get(intent, 0) + 1
+            self.fast_seconds += elapsed
+            self.saved_seconds += max(self.agent_turn_estimate() - elapsed, 0.0)
+        logger.info(f"Fast path '{intent}' ({argument}) in {elapsed * 1000:.0f}ms: {text}")
+        return answer
+
+    def record_agent_turn(self, seconds):
+        """에이전트가 처리한 한 턴의 소요 시간을 기록합니다. (절약 시간 추정에 사용)"""
+        with self._lock:
+            self._agent_turns.append(seconds)
+
+    def agent_turn_estimate(self):
+        """에이전트 한 턴의 평균 소요 시간(초)입니다. 아직 재 보지 못했으면 기본 추정치를 씁니다."""
+        if not self._agent_turns:
+            return DEFAULT_AGENT_TURN_S
+        return sum(self._agent_turns) / len(self._agent_turns)
+
+    def stats(self):
+        """전체 요청 수, 빠른 경로 처리 비율과 의도별 횟수, 평균 처리 시간, 절약한 시간(초)을 반환합니다."""
+        with self._lock:
+            routed = sum(self.hits.values())
+            return {
+                'total': self.total,
+                'routed': routed,
+                'hit_rate': round(routed / self.total, 3) if self.total else 0.0,
+                'intents': dict(self.hits),
+                'fast_path_ms': round(self.fast_seconds / routed * 1000, 1) if routed else 0.0,
+                'agent_turn_s': round(self.agent_turn_estimate(), 2),
+                'saved_s': round(self.saved_seconds, 1),
+            }
@@ -0,0 +1,153 @@
+# code/llm_cache.py
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from logger import get_logger
+
+logger = get_logger('ENGINE')
+
+DEFAULT_CACHE_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "llm_cache.sqlite"))
+
+WHITESPACE = re.compile(r'(?:\s|\\[ntr])+')
+
+
+class LLMResponseCache(BaseCache):
+    """
+    ChatOllama 응답을 디스크(sqlite)에 보관하는 LangChain 캐시입니다.
+    - 키: 공백을 정규화한 프롬프트 + 모델 설정(llm_string) + 엔진 상태(state_key(), 예: 시뮬레이터 모드)
+    - 만료: ttl초가 지난 항목은 쓰지 않고 지우며, max_entries개 / max_bytes를 넘으면 가장 오래 안 쓴 항목부터 지웁니다.
+    - 실시간 상태를 읽는 도구(live_tools)의 관찰 결과가 프롬프트(scratchpad)에 들어 있으면 조회도 저장도 하지 않습니다.
+      그런 응답은 카메라 화면이나 팔 위치가 바뀌면 달라져야 하기 때문입니다.
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, live_tools=(), state_key=None,
+                 ttl=7 * 24 * 3600, max_entries=2000, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.state_key = state_key
+        self._live_pattern = None
+        if live_tools:
+            names = "|".join(re.escape(name) for name in live_tools)
+            self._live_pattern = re.compile(rf'\\?"action\\?"\s*:\s*\\?"({names})\\?"')
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+        self._connection.commit()
+
+        # 통계
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _key(self, prompt, llm_string):
+        """정규화한 프롬프트와 모델 설정, 엔진 상태로 캐시 키를 만듭니다."""
+        # 채팅 프롬프트는 메시지 목록을 JSON으로 직렬화한 문자열이므로 이스케이프된 줄바꿈/탭도 공백으로 봅니다.
+        normalized = WHITESPACE.sub(' ', prompt).strip()
+        state = self.state_key() if self.state_key is not None else ""
+        return hashlib.sha256(f"{llm_string}\x00{state}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def _depends_on_live_state(self, prompt):
+        """프롬프트에 실시간 상태 도구의 호출(과 그 관찰 결과)이 들어 있는지 확인합니다."""
+        return self._live_pattern is not None and self._live_pattern.search(prompt) is not None
+
+    def lookup(self, prompt, llm_string):
+        if self._depends_on_live_state(prompt):
+            with self._lock:
+                self.skipped += 1
+            return None
+
+        key, now = self._key(prompt, llm_string), time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                self._connection.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._connection.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+
+        try:
+            generations = [loads(generation) for generation in json.loads(row[0])]
+            # 서버를 거치지 않은 응답임을 표시합니다. (저장된 prompt_eval_count 등을 다시 세지 않도록)
+            for generation in generations:
+                generation.generation_info = {**(generation.generation_info or {}), "cached": True}
+            return generations
+        except Exception as e:
+            logger.warning(f"LLM cache entry could not be restored: {e}")
+            return None
+
+    def update(self, prompt, llm_string, return_val):
+        if self._depends_on_live_state(prompt):
+            return
+        value = json.dumps([dumps(generation) for generation in return_val])
+        size, now = len(value.encode("utf-8")), time.time()
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (self._key(prompt, llm_string), value, size, now, now))
+            self.stores += 1
+            self._evict(now)
+            self._connection.commit()
+
+    def _evict(self, now):
+        """만료된 항목을 지우고, 개수와 용량 한도를 넘으면 가장 오래 안 쓴 항목부터 지웁니다."""
+        cursor = self._connection.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        self.evictions += cursor.rowcount
+        count, total = self._connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        removed = 0
+        for key, size in self._connection.execute("SELECT key, size FROM llm_cache ORDER BY last_used").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._connection.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            count, total, removed = count - 1, total - size, removed + 1
+        self.evictions += removed
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._connection.execute("DELETE FROM llm_cache")
+            self._connection.commit()
+
+    def stats(self):
+        """적중/실패/건너뜀(실시간 상태) 횟수, 적중률, 저장 항목 수와 용량을 반환합니다."""
+        with self._lock:
+            count, total = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'skipped_live': self.skipped,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'entries': count,
+                'bytes': total,
+            }
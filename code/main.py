@@ -4,7 +4,7 @@ import os
 from logger import setup_terminal_logging
 from engine import MachEngine
 from face_renderer import render_face_svg 
-from langchain_community.callbacks.streamlit import StreamlitCallbackHandler
+from robot_dispatcher import dispatcher_stats
 
 # 1. 시스템 기록 설정
 setup_terminal_logging()
@@ -103,13 +103,86 @@ with col_left:
     
     # [수정] 현재 모드에 따라 탐지 결과의 출처를 표시합니다.
     mode_tag = "[SIM]" if st.session_state.sim_mode else "[REAL]"
-    st.info(f"{mode_tag} Detected: {engine.last_vision_result}")
+    # 문자열과 좌표가 서로 다른 프레임에서 오지 않도록 스냅샷 하나에서 함께 읽습니다.
+    snapshot = engine.get_snapshot()
+    st.info(f"{mode_tag} Detected: {snapshot.vision_result}")
     
-    if engine.last_coordinates:
+    if snapshot.coordinates:
         with st.expander("Details", expanded=True):
-            for coord in engine.last_coordinates:
+            for coord in snapshot.coordinates:
                 # 좌표 값을 cm 단위로 정렬하여 표시합니다.
-                st.write(f"- {coord['name']}: X={coord['x']}, Y={coord['y']}, Z={coord['z']}cm")
+                label = f"{coord['name']}#{coord['id']}" if 'id' in coord else coord['name']
+                st.write(f"- {label}: X={coord['x']}, Y={coord['y']}, Z={coord['z']}cm")
+
+    # 비전 파이프라인 단계별 처리 속도를 표시합니다.
+    vision_stats = engine.vision_stats()
+    if vision_stats:
+        with st.expander("Pipeline Stats", expanded=False):
+            for stage in ("capture", "inference", "publish", "render"):
+                stage_stats = vision_stats.get(stage)
+                if not stage_stats:
+                    continue
+                st.write(f"- {stage}: {stage_stats['fps']} fps, {stage_stats['latency_ms']} ms")
+            st.write(f"- end-to-end: {vision_stats.get('end_to_end_ms', 0)} ms")
+            if 'motion_gate' in vision_stats:
+                st.write(f"- YOLO skipped: {vision_stats['motion_gate']['skip_ratio'] * 100:.0f}%")
+            for endpoint, endpoint_stats in vision_stats.get('sim_server', {}).items():
+                st.write(f"- sim {endpoint}: {endpoint_stats['mean_ms']} ms (p95 {endpoint_stats['p95_ms']} ms)")
+            if 'sim_stream' in vision_stats:
+                stream_stats = vision_stats['sim_stream']
+                st.write(f"- sim stream: {stream_stats['fps']} fps, dropped {stream_stats['dropped']}, "
+                         f"reconnects {stream_stats['reconnects']}")
+
+    # 빠른 경로(에이전트를 건너뛴 단순 요청) 처리 비율과 절약한 시간을 표시합니다.
+    if engine.router is not None and engine.router.total:
+        router_stats = engine.router.stats()
+        st.write(f"Fast path: {router_stats['routed']}/{router_stats['total']} "
+                 f"({router_stats['hit_rate'] * 100:.0f}%), {router_stats['fast_path_ms']} ms avg, "
+                 f"~{router_stats['saved_s']}s saved")
+
+    # 대화 턴의 첫 글자 표시 시간(TTFT)과 전체 소요 시간을 표시합니다.
+    turn_stats = engine.turn_stats()
+    if turn_stats:
+        st.write(f"Agent turns: TTFT p50 {turn_stats['ttft_p50_s']}s (p95 {turn_stats['ttft_p95_s']}s), "
+                 f"total p50 {turn_stats['total_p50_s']}s (p95 {turn_stats['total_p95_s']}s), n={turn_stats['turns']}")
+
+    # 백그라운드 대화 요약 횟수와 사용자 턴에서 빠진 요약 시간을 표시합니다.
+    memory_stats = engine.memory.stats()
+    if memory_stats['summaries'] or memory_stats['pending']:
+        st.write(f"Memory: {memory_stats['summaries']} background summaries "
+                 f"({memory_stats['summary_avg_s']}s avg, ~{memory_stats['removed_from_turns_s']}s kept off turns), "
+                 f"buffer {memory_stats['buffer_tokens']} tokens{' (summarizing)' if memory_stats['pending'] else ''}")
+
+    # LLM 응답 캐시의 적중률과 저장 용량을 표시합니다.
+    if engine.llm_cache is not None:
+        cache_stats = engine.llm_cache.stats()
+        if cache_stats['hits'] + cache_stats['misses'] + cache_stats['skipped_live']:
+            st.write(f"LLM cache: {cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']} hits "
+                     f"({cache_stats['hit_rate'] * 100:.0f}%), {cache_stats['skipped_live']} live skipped, "
+                     f"{cache_stats['entries']} entries ({cache_stats['bytes'] / 1024:.0f} KB)")
+
+    # 에이전트 반복마다 Ollama가 실제로 평가한 프롬프트 토큰과 접두부 재사용 비율을 표시합니다.
+    prompt_stats = engine.prompt_monitor.stats()
+    if prompt_stats:
+        st.write(f"LLM prompt: ~{prompt_stats['prompt_tokens_avg']} tokens/iter, evaluated {prompt_stats['prompt_eval_avg']} "
+                 f"(reuse {prompt_stats['reuse_ratio'] * 100:.0f}%), eval p50 {prompt_stats['prompt_eval_p50_ms']} ms "
+                 f"(p95 {prompt_stats['prompt_eval_p95_ms']} ms), reloads {prompt_stats['reloads']}, n={prompt_stats['iterations']}")
+
+    # 한 번의 LLM 반복에서 여러 조회 도구를 동시에 실행한 횟수와 절약한 반복/시간을 표시합니다.
+    parallel_stats = engine.parallel_tool.stats
+    if parallel_stats['batches']:
+        st.write(f"Parallel tools: {parallel_stats['batches']} steps, {parallel_stats['actions']} calls, "
+                 f"{parallel_stats['iterations_saved']} LLM iterations and ~{parallel_stats['saved_s']:.1f}s saved")
+
+    # 로봇 명령 디스패처의 대기열 상태와 명령별 지연 시간을 표시합니다.
+    for robot_stats in dispatcher_stats().values():
+        with st.expander("Robot Commands", expanded=False):
+            st.write(f"- queue: {robot_stats['queue_depth']}, submitted {robot_stats['submitted']}, "
+                     f"coalesced {robot_stats['coalesced']}, rejected {robot_stats['rejected']}, "
+                     f"failed {robot_stats['failed']}")
+            for name, latency in robot_stats['latency'].items():
+                st.write(f"- {name}: {latency['mean_ms']} ms (p50 {latency['p50_ms']}, p95 {latency['p95_ms']} ms, "
+                         f"n={latency['count']})")
 
 # [우측 패널]
 with col_right:
@@ -126,9 +199,25 @@ with col_right:
             st.write(user_input)
         
         with chat_box.chat_message("assistant"):
-            st_callback = StreamlitCallbackHandler(st.container())
+            # 도구 호출 과정은 접히는 상태 상자에, 최종 답변은 생성되는 대로 아래 칸에 흘려 씁니다.
+            status_box = st.status("생각 중...", expanded=False)
+            answer_box = st.empty()
+            answer, failed = "", False
             # 에이전트 실행 시 현재 모드가 반영된 엔진을 사용합니다.
-            answer = engine.run_agent(user_input, callbacks=[st_callback])
-            st.write(answer)
+            for event in engine.stream_agent(user_input):
+                if event['type'] == 'action':
+                    status_box.write(f"🔧 {event['tool']}: {event['input']}")
+                elif event['type'] == 'observation':
+                    status_box.write(f"👁 {event['output']}")
+                elif event['type'] == 'token':
+                    answer += event['text']
+                    answer_box.markdown(answer + "▌")
+                elif event['type'] == 'reset':
+                    answer = ""
+                    answer_box.empty()
+                elif event['type'] == 'final':
+                    answer, failed = event['output'], event.get('error', False)
+                    answer_box.markdown(answer)
+            status_box.update(label="완료", state="error" if failed else "complete")
             st.session_state.messages.append({"role": "assistant", "content": answer})
             st.rerun()
\ No newline at end of file
@@ -0,0 +1,71 @@
+# code/motion_gate.py
+
+import threading
+import time
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    장면 변화 여부를 값싸게 판별하여 YOLO 추론을 건너뛸지 결정하는 클래스입니다.
+    프레임을 작은 흑백 이미지로 축소한 뒤, 마지막으로 추론한 프레임과의 차이를 비교합니다.
+    변화가 없더라도 force_interval(초)마다, 그리고 force() 호출 직후에는 반드시 추론하도록 합니다.
+    min_interval(초)을 주면 장면이 바뀌더라도 그 간격보다 자주 추론하지 않으며,
+    그 사이 프레임은 추적기의 예측으로 채웁니다.
+    """
+    def __init__(self, size=(80, 60), pixel_threshold=12, changed_ratio=0.01, force_interval=1.0, min_interval=0.0):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.changed_ratio = changed_ratio
+        self.force_interval = force_interval
+        self.min_interval = min_interval
+        self._reference = None
+        self._last_inference_at = 0.0
+        self._force_event = threading.Event()
+        self.inferred = 0
+        self.skipped = 0
+
+    def _thumbnail(self, color_image):
+        """비교용 축소 흑백 이미지를 생성합니다."""
+        gray = cv2.cvtColor(color_image, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def force(self):
+        """다음 프레임에서 반드시 추론하도록 요청합니다. (로봇 팔 이동 직후 등)"""
+        self._force_event.set()
+
+    def should_infer(self, color_image):
+        """
+        이번 프레임에 추론이 필요한지 판단합니다.
+        추론이 필요하다고 판단하면 해당 프레임을 새 기준 프레임으로 삼습니다.
+        """
+        now = time.monotonic()
+        thumbnail = self._thumbnail(color_image)
+
+        elapsed = now - self._last_inference_at
+        needs_inference = (
+            self._reference is None
+            or self._force_event.is_set()
+            or elapsed >= self.force_interval
+        )
+        if not needs_inference and elapsed >= self.min_interval:
+            changed = np.count_nonzero(np.abs(thumbnail - self._reference) > self.pixel_threshold)
+            needs_inference = changed > self.changed_ratio * thumbnail.size
+
+        if needs_inference:
+            self._force_event.clear()
+            self._reference = thumbnail
+            self._last_inference_at = now
+            self.inferred += 1
+        else:
+            self.skipped += 1
+        return needs_inference
+
+    def stats(self):
+        """추론 수행/생략 횟수와 생략 비율을 반환합니다."""
+        total = self.inferred + self.skipped
+        return {
+            'inferred': self.inferred, 'skipped': self.skipped,
+            'skip_ratio': round(self.skipped / total, 3) if total else 0.0
+        }
@@ -0,0 +1,175 @@
+# code/ollama_prompt.py
+
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+import requests
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain_core.messages import SystemMessage, get_buffer_string
+from langchain_core.prompts.chat import SystemMessagePromptTemplate
+from summary_memory import count_tokens
+from logger import get_logger
+
+logger = get_logger('ENGINE')
+
+# 모델을 메모리에 붙잡아 두는 시간. 내려가면 프롬프트 캐시(KV 캐시)도 함께 사라집니다.
+OLLAMA_KEEP_ALIVE = os.environ.get("MACH_OLLAMA_KEEP_ALIVE", "30m")
+# 컨텍스트 길이. Ollama 기본값(2048)보다 프롬프트가 길면 서버가 앞부분을 잘라 내어 접두부가 매번 달라집니다.
+# 요청마다 값이 바뀌면 모델을 다시 올리므로 고정값으로 씁니다.
+OLLAMA_NUM_CTX = int(os.environ.get("MACH_OLLAMA_NUM_CTX", "8192"))
+# prompt 평가 외에 모델 적재에 이보다 오래 걸렸으면 모델을 다시 올린 것으로 봅니다.
+RELOAD_THRESHOLD_MS = 1000.0
+
+
+def freeze_system_prefix(agent_executor):
+    """
+    에이전트 프롬프트의 시스템 메시지(행동 강령 + 도구 설명 + 응답 형식)를 한 번만 렌더링한 고정 메시지로 바꾸고,
+    그 문자열을 반환합니다. 매 반복마다 같은 바이트열이 요청 맨 앞에 오므로 서버가 접두부의 KV 캐시를 재사용할 수 있습니다.
+    (요청 구성: 고정 시스템 메시지 -> 대화 기록 -> 입력 + scratchpad 순으로, 뒤쪽만 늘어납니다)
+    """
+    prompt = agent_executor.agent.llm_chain.prompt
+    for index, message in enumerate(prompt.messages):
+        if isinstance(message, SystemMessagePromptTemplate):
+            frozen = message.format()
+            prompt.messages[index] = frozen
+            return frozen.content
+    raise ValueError("에이전트 프롬프트에 시스템 메시지가 없습니다.")
+
+
+def warm_up(llm, prefix, timeout=300):
+    """
+    모델을 미리 올리고 고정 접두부를 한 번 평가해 둡니다. 첫 대화 턴이 모델 적재를 기다리지 않게 합니다.
+    에이전트 요청과 같은 옵션(num_ctx 등)을 보내야 서버가 모델을 다시 올리지 않습니다.
+    """
+    options = {key: value for key, value in llm._default_params["options"].items() if value is not None}
+    options["num_predict"] = 1
+    payload = {
+        "model": llm.model,
+        "messages": [{"role": "system", "content": prefix}],
+        "options": options,
+        "keep_alive": llm.keep_alive,
+        "stream": False,
+    }
+    started = time.perf_counter()
+    try:
+        response = requests.post(f"{llm.base_url}/api/chat", json=payload, timeout=timeout)
+        response.raise_for_status()
+        result = response.json()
+        logger.info(f"Ollama warm-up: {result.get('prompt_eval_count', 0)} prefix tokens evaluated, "
+                    f"load {result.get('load_duration', 0) / 1e6:.0f}ms, total {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        logger.warning(f"Ollama warm-up failed: {e}")
+
+
+class PromptCacheMonitor(BaseCallbackHandler):
+    """
+    에이전트의 LLM 반복마다 프롬프트 길이(추정)와 Ollama가 실제로 평가한 토큰 수(prompt_eval_count),
+    평가 시간(prompt_eval_duration)을 기록하여 접두부 재사용 비율을 보여 줍니다.
+    - 고정 시스템 메시지로 시작하지 않는 호출(대화 요약 등)은 세지 않습니다.
+    - 시스템 메시지가 고정 접두부와 다르면 접두부가 흔들린 것으로 보고 prefix_drift를 올립니다.
+    - 응답 캐시에서 꺼낸 결과(generation_info의 cached)는 서버를 거치지 않았으므로 따로 셉니다.
+    """
+    def __init__(self, prefix, history=200):
+        self.prefix = prefix
+        self.prefix_hash = hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:12]
+        self.prefix_tokens = count_tokens(prefix)
+        self.iterations = deque(maxlen=history)
+        self.prefix_drift = 0
+        self.cached_replays = 0
+        self._pending = {}
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, run_id=None, **kwargs):
+        request = messages[0] if messages else []
+        if not request or not isinstance(request[0], SystemMessage):
+            return
+        if request[0].content != self.prefix:
+            with self._lock:
+                self.prefix_drift += 1
+            logger.warning(f"Agent system prompt differs from the frozen prefix {self.prefix_hash}")
+            return
+        texts = [get_buffer_string([message]) for message in request]
+        with self._lock:
+            self._pending[run_id] = {'texts': texts, 'started': time.perf_counter()}
+
+    def on_llm_error(self, error, run_id=None, **kwargs):
+        with self._lock:
+            self._pending.pop(run_id, None)
+
+    def on_llm_end(self, response, run_id=None, **kwargs):
+        with self._lock:
+            pending = self._pending.pop(run_id, None)
+        if pending is None or not response.generations or not response.generations[0]:
+            return
+        info = response.generations[0][0].generation_info or {}
+        if info.get("cached"):
+            with self._lock:
+                self.cached_replays += 1
+            return
+        if not info.get("done"):
+            return
+
+        texts = pending['texts']
+        prompt_tokens = sum(count_tokens(text) for text in texts)
+        with self._lock:
+            reusable = self._shared_tokens(self._previous, texts)
+            self._previous = texts
+        # 프롬프트 전체가 캐시에 있으면 Ollama가 prompt_eval_count를 생략하기도 합니다.
+        evaluated = info.get("prompt_eval_count", 0)
+        record = {
+            'prompt_tokens': prompt_tokens,
+            'reusable_tokens': reusable,
+            'prompt_eval_count': evaluated,
+            'prompt_eval_ms': info.get("prompt_eval_duration", 0) / 1e6,
+            'load_ms': info.get("load_duration", 0) / 1e6,
+            'wall_s': time.perf_counter() - pending['started'],
+        }
+        with self._lock:
+            self.iterations.append(record)
+        logger.info(f"LLM iteration: prompt ~{prompt_tokens} tokens (~{reusable} reusable), "
+                    f"evaluated {evaluated} in {record['prompt_eval_ms']:.0f}ms, load {record['load_ms']:.0f}ms")
+
+    @staticmethod
+    def _shared_tokens(previous, texts):
+        """직전 요청과 앞에서부터 겹치는 부분의 토큰 수(추정)입니다. 서버가 재사용할 수 있는 최대치입니다."""
+        if previous is None:
+            return 0
+        shared = 0
+        for before, now in zip(previous, texts):
+            if before == now:
+                shared += count_tokens(now)
+                continue
+            shared += count_tokens(os.path.commonprefix([before, now]))
+            break
+        return shared
+
+    def stats(self):
+        """
+        반복 횟수, 반복당 프롬프트 토큰(추정)과 실제 평가 토큰, 재사용 비율(실측/기대), prompt 평가 시간 p50/p95(ms),
+        모델 재적재 횟수, 접두부 흔들림 횟수, 응답 캐시 재생 횟수를 반환합니다.
+        """
+        with self._lock:
+            records = list(self.iterations)
+            drift, replays = self.prefix_drift, self.cached_replays
+        if not records:
+            return {}
+        prompt = sum(r['prompt_tokens'] for r in records)
+        evaluated = sum(r['prompt_eval_count'] for r in records)
+        eval_ms = np.array([r['prompt_eval_ms'] for r in records])
+        return {
+            'iterations': len(records),
+            'prefix_tokens': self.prefix_tokens,
+            'prompt_tokens_avg': round(prompt / len(records)),
+            'prompt_eval_avg': round(evaluated / len(records)),
+            'reuse_ratio': round(min(max(1 - evaluated / prompt, 0.0), 1.0), 3) if prompt else 0.0,
+            'expected_reuse_ratio': round(sum(r['reusable_tokens'] for r in records) / prompt, 3) if prompt else 0.0,
+            'prompt_eval_p50_ms': round(float(np.percentile(eval_ms, 50)), 1),
+            'prompt_eval_p95_ms': round(float(np.percentile(eval_ms, 95)), 1),
+            'reloads': sum(1 for r in records if r['load_ms'] > RELOAD_THRESHOLD_MS),
+            'prefix_drift': drift,
+            'cached_replays': replays,
+        }
@@ -0,0 +1,140 @@
+# code/parallel_tools.py
+
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Type
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from langchain.agents.structured_chat.output_parser import StructuredChatOutputParser
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.exceptions import OutputParserException
+from langchain_core.pydantic_v1 import BaseModel, Field
+from langchain_core.tools import BaseTool
+from logger import get_logger
+
+logger = get_logger('AGENT')
+
+# 여러 도구 호출을 한 번에 받는 내부 도구 이름 (에이전트 프롬프트에는 노출하지 않습니다)
+PARALLEL_TOOL_NAME = "parallel_actions"
+
+JSON_BLOCK_PATTERN = re.compile(r"```(?:json\s+)?(\W.*?)```", re.DOTALL)
+
+
+def is_parallel_safe(tool):
+    """도구가 metadata={'parallel_safe': True}로 부작용 없는 조회 도구임을 선언했는지 확인합니다."""
+    return bool((tool.metadata or {}).get("parallel_safe"))
+
+
+class MultiActionOutputParser(StructuredChatOutputParser):
+    """
+    STRUCTURED_CHAT 에이전트 출력에서 여러 개의 $JSON_BLOB(목록 하나 또는 블록 여러 개)을 읽어 들이는 파서입니다.
+    도구 호출이 하나면 기존과 같이 AgentAction 하나를, 여럿이면 parallel_actions 도구 호출 하나로 묶어 반환하므로
+    여러 도구의 관찰 결과가 한 번의 LLM 반복 안에 함께 돌아옵니다.
+    """
+    def parse(self, text):
+        try:
+            blobs = []
+            for block in JSON_BLOCK_PATTERN.findall(text):
+                response = json.loads(block.strip(), strict=False)
+                blobs.extend(response if isinstance(response, list) else [response])
+            if not blobs:
+                return super().parse(text)
+
+            for blob in blobs:
+                if not isinstance(blob, dict) or "action" not in blob:
+                    raise ValueError(f"Invalid action blob: {blob}")
+                if blob["action"] == "Final Answer" and "action_input" not in blob:
+                    raise ValueError("Final Answer without action_input")
+
+            # 도구 호출과 최종 답변이 섞여 있으면 도구부터 실행하고, 답변은 관찰 결과를 본 뒤 다시 쓰게 합니다.
+            actions = [blob for blob in blobs if blob["action"] != "Final Answer"]
+            if not actions:
+                return AgentFinish({"output": blobs[0]["action_input"]}, text)
+            if len(actions) == 1:
+                return AgentAction(actions[0]["action"], actions[0].get("action_input", {}), text)
+            return AgentAction(
+                PARALLEL_TOOL_NAME,
+                {"actions": [{"action": a["action"], "action_input": a.get("action_input", {})} for a in actions]},
+                text,
+            )
+        except OutputParserException:
+            raise
+        except Exception as e:
+            # handle_parsing_errors가 오류를 LLM에 돌려주고 다시 쓰게 하도록 파싱 오류로 바꿉니다.
+            raise OutputParserException(f"Could not parse LLM output: {text}") from e
+
+    @property
+    def _type(self):
+        return "multi_action_structured_chat"
+
+
+class ParallelActionsInput(BaseModel):
+    actions: List[Dict[str, Any]] = Field(description="[{'action': 도구 이름, 'action_input': 입력}, ...]")
+
+
+class ParallelActionsTool(BaseTool):
+    """
+    한 번에 요청된 여러 도구 호출을 실행하고 관찰 결과를 하나로 합쳐 돌려주는 내부 도구입니다.
+    요청 순서를 지키되, 연속된 parallel_safe 도구들은 스레드 풀에서 동시에 실행합니다.
+    (로봇 이동처럼 부작용이 있는 도구는 앞뒤 호출과 겹치지 않도록 차례로 실행합니다)
+    """
+    name: str = PARALLEL_TOOL_NAME
+    description: str = "여러 개의 독립적인 도구 호출을 한 번에 실행합니다."
+    args_schema: Type[BaseModel] = ParallelActionsInput
+    tools: Dict[str, BaseTool] = Field(default_factory=dict)
+    max_workers: int = 4
+    stats: Dict[str, float] = Field(
+        default_factory=lambda: {'batches': 0, 'actions': 0, 'iterations_saved': 0, 'saved_s': 0.0})
+
+    @classmethod
+    def from_tools(cls, tools, max_workers=4):
+        return cls(tools={tool.name: tool for tool in tools}, max_workers=max_workers)
+
+    def _run(self, actions, run_manager=None):
+        started = time.perf_counter()
+        callbacks = run_manager.get_child() if run_manager is not None else None
+        ctx = get_script_run_ctx()
+
+        def run_one(action):
+            # 풀 스레드에서도 도구가 st.session_state와 화면 요소에 접근할 수 있도록 실행 문맥을 붙입니다.
+            if ctx is not None:
+                add_script_run_ctx(threading.current_thread(), ctx)
+            tool = self.tools.get(action["action"])
+            if tool is None:
+                return action["action"], f"{action['action']} is not a valid tool.", 0.0
+            tool_started = time.perf_counter()
+            try:
+                observation = tool.run(action["action_input"], callbacks=callbacks)
+            except Exception as e:
+                observation = f"오류 발생: {e}"
+            return action["action"], observation, time.perf_counter() - tool_started
+
+        # 요청 순서대로, 연속된 parallel_safe 도구끼리만 묶습니다.
+        groups = []
+        for action in actions:
+            tool = self.tools.get(action["action"])
+            safe = tool is not None and is_parallel_safe(tool)
+            if safe and groups and groups[-1][0]:
+                groups[-1][1].append(action)
+            else:
+                groups.append((safe, [action]))
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="agent-tool") as pool:
+            for safe, group in groups:
+                if safe and len(group) > 1:
+                    results.extend(pool.map(run_one, group))
+                else:
+                    results.extend(run_one(action) for action in group)
+
+        elapsed = time.perf_counter() - started
+        sequential = sum(duration for _, _, duration in results)
+        self.stats['batches'] += 1
+        self.stats['actions'] += len(results)
+        self.stats['iterations_saved'] += len(results) - 1
+        self.stats['saved_s'] += max(sequential - elapsed, 0.0)
+        logger.info(f"Parallel step: {len(results)} tools in {elapsed * 1000:.0f}ms "
+                    f"(sequential {sequential * 1000:.0f}ms, saved {len(results) - 1} LLM iterations)")
+        return "\n".join(f"[{name}] {observation}" for name, observation, _ in results)
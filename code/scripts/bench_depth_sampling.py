@@ -0,0 +1,56 @@
+# code/scripts/bench_depth_sampling.py
+import os
+import sys
+import time
+import numpy as np
+
+# depth_sampling 모듈을 임포트하기 위해 code 폴더를 경로에 추가합니다.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from depth_sampling import sample_box_depth, SAMPLING_METHODS
+
+WIDTH, HEIGHT = 640, 480
+BOX_COUNTS = [1, 5, 10, 30, 100]
+REPEAT = 500
+
+
+def make_synthetic_depth(hole_ratio=0.15, seed=0):
+    """
+    리얼센스 z16 깊이 이미지를 흉내 낸 합성 데이터를 생성합니다.
+    hole_ratio 비율만큼의 픽셀은 0(구멍)으로 채웁니다.
+    """
+    rng = np.random.default_rng(seed)
+    depth = rng.integers(300, 3000, size=(HEIGHT, WIDTH), dtype=np.uint16)
+    depth[rng.random((HEIGHT, WIDTH)) < hole_ratio] = 0
+    return depth
+
+
+def make_boxes(count, seed=0):
+    """화면 안쪽에 무작위 xyxy 박스를 생성합니다."""
+    rng = np.random.default_rng(seed)
+    top_left = rng.uniform(0, [WIDTH - 120, HEIGHT - 120], size=(count, 2))
+    size = rng.uniform(20, 120, size=(count, 2))
+    return np.hstack((top_left, top_left + size)).astype(np.float32)
+
+
+def run_benchmark():
+    """샘플링 방식별, 박스 개수별 프레임당 소요 시간(ms)을 측정합니다."""
+    depth = make_synthetic_depth()
+    print(f"Depth sampling benchmark ({WIDTH}x{HEIGHT}, {REPEAT} frames)")
+    print(f"{'method':<14}" + "".join(f"{n:>10} box" for n in BOX_COUNTS))
+
+    for method in SAMPLING_METHODS:
+        row = f"{method:<14}"
+        for count in BOX_COUNTS:
+            boxes = make_boxes(count)
+            start = time.perf_counter()
+            for _ in range(REPEAT):
+                sample_box_depth(depth, boxes, method=method)
+            elapsed_ms = (time.perf_counter() - start) / REPEAT * 1000
+            row += f"{elapsed_ms:>11.3f}ms"
+        print(row)
+
+
+if __name__ == "__main__":
+    run_benchmark()
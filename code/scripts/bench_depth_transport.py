@@ -0,0 +1,103 @@
+# code/scripts/bench_depth_transport.py
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+# sim_camera, depth_codec, pybullet_server 모듈을 임포트하기 위해 code, code/tools 폴더를 경로에 추가합니다.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+sys.path.append(os.path.join(os.path.dirname(current_dir), "tools"))
+
+from sim_camera import SimCameraModel
+from depth_codec import ENCODINGS, encode_depth, decode_depth, available_compressions
+
+CAMERA = SimCameraModel()
+WIDTH, HEIGHT = CAMERA.width, CAMERA.height
+
+
+def make_sim_depth(seed=0):
+    """파이불렛 깊이 버퍼를 흉내 낸 합성 데이터 (경사진 바닥 + 사각형 물체들)를 생성합니다."""
+    rng = np.random.default_rng(seed)
+    depth = np.repeat(np.linspace(0.995, 0.985, HEIGHT, dtype=np.float32)[:, None], WIDTH, axis=1)
+    for x, y in rng.integers(0, [WIDTH - 80, HEIGHT - 80], size=(5, 2)).tolist():
+        depth[y:y + 80, x:x + 80] = rng.uniform(0.975, 0.985)
+    return depth
+
+
+def linearize(depth):
+    """깊이 버퍼 값(0~1)을 미터 단위 거리로 변환합니다."""
+    return CAMERA.linearize(depth.astype(np.float64))
+
+
+def measure(func, repeat):
+    """함수를 repeat번 실행하여 평균 소요 시간(ms)을 반환합니다."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def run_codec_benchmark(repeat):
+    """JSON과 이진 형식(인코딩 x 압축)별 크기, 인코딩/디코딩 시간, 거리 오차를 비교합니다."""
+    depth = make_sim_depth()
+    reference = linearize(depth)
+    print(f"Depth transport benchmark ({WIDTH}x{HEIGHT}, {repeat} frames)")
+    print(f"{'format':<14}{'bytes':>10}{'encode ms':>12}{'decode ms':>12}{'max err mm':>12}")
+
+    encode_ms, body = measure(lambda: json.dumps(depth.tolist()).encode(), max(repeat // 10, 1))
+    decode_ms, decoded = measure(lambda: np.array(json.loads(body), dtype=np.float32), max(repeat // 10, 1))
+    error_mm = np.abs(linearize(decoded) - reference).max() * 1000
+    print(f"{'json':<14}{len(body):>10}{encode_ms:>12.2f}{decode_ms:>12.2f}{error_mm:>12.2f}")
+
+    for encoding in ENCODINGS:
+        for compression in available_compressions():
+            encode_ms, body = measure(lambda: encode_depth(depth, encoding, compression), repeat)
+            decode_ms, decoded = measure(lambda: decode_depth(body), repeat)
+            error_mm = np.abs(linearize(decoded) - reference).max() * 1000
+            label = f"{encoding}+{compression}"
+            print(f"{label:<14}{len(body):>10}{encode_ms:>12.2f}{decode_ms:>12.2f}{error_mm:>12.2f}")
+
+
+def run_server_benchmark(ip, port, repeat, encoding, compression):
+    """실행 중인 서버(또는 mock_pybullet_server.py)에서 깊이를 받아오는 왕복 시간을 측정합니다."""
+    from pybullet_server import PyBulletServer
+
+    for label, server in (
+        ("binary", PyBulletServer(ip, port, depth_encoding=encoding, depth_compression=compression)),
+        ("json", PyBulletServer(ip, port)),
+    ):
+        if label == "json":
+            server.depth_headers = {"Accept": "application/json"}
+        server.get_depth_data()
+        elapsed_ms, depth = measure(server.get_depth_data, repeat)
+        shape = None if depth is None else depth.shape
+        print(f"/depth {label:<7} {elapsed_ms:8.2f} ms/frame  shape={shape}")
+
+    # 컬러+깊이를 한 번에 받는 /frame과, /image와 /depth를 따로 요청하는 예전 방식을 비교합니다.
+    server = PyBulletServer(ip, port, depth_encoding=encoding, depth_compression=compression)
+    server.get_frame()
+    elapsed_ms, _ = measure(server.get_frame, repeat)
+    print(f"/frame         {elapsed_ms:8.2f} ms/frame  (supported={server.frame_supported})")
+    elapsed_ms, _ = measure(lambda: (server.get_rgb_image(), server.get_depth_data()), repeat)
+    print(f"/image+/depth  {elapsed_ms:8.2f} ms/frame")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="깊이 전송 형식 벤치마크 (JSON 대비 이진/압축)")
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--server", default=None, help="측정할 서버 주소 ip:port (예: 127.0.0.1:5000)")
+    parser.add_argument("--encoding", choices=list(ENCODINGS), default="u16")
+    parser.add_argument("--compression", choices=available_compressions(), default="none")
+    args = parser.parse_args()
+
+    run_codec_benchmark(args.repeat)
+    if args.server:
+        ip, port = args.server.rsplit(":", 1)
+        run_server_benchmark(ip, int(port), args.repeat, args.encoding, args.compression)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# code/scripts/bench_detector.py
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+# detector 모듈을 임포트하기 위해 code 폴더를 경로에 추가합니다.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from detector import YoloDetector, DETECTOR_BACKENDS
+
+DEFAULT_MODEL = os.path.normpath(os.path.join(current_dir, "..", "..", "data", "models", "yolo11n.pt"))
+
+
+def load_frame(image_path):
+    """벤치마크에 사용할 이미지를 불러옵니다. 없으면 640x480 합성 이미지를 만듭니다."""
+    if image_path:
+        return cv2.imread(image_path)
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, size=(480, 640, 3), dtype=np.uint8)
+
+
+def bench_backend(backend, args, frame):
+    """한 백엔드의 예열 시간과 프레임당 지연 시간 분포(ms)를 측정합니다."""
+    detector = YoloDetector(args.model, backend=backend, imgsz=args.imgsz,
+                            int8=args.int8, threads=args.threads)
+    latencies = []
+    for _ in range(args.frames):
+        started = time.perf_counter()
+        detector(frame)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies = np.array(latencies)
+    return {
+        'backend': backend,
+        'warmup_s': detector.warmup_seconds,
+        'mean_ms': latencies.mean(),
+        'p50_ms': np.percentile(latencies, 50),
+        'p95_ms': np.percentile(latencies, 95),
+        'fps': 1000 / latencies.mean(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YOLO 백엔드별 프레임당 추론 지연 시간 비교")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--backends", nargs="+", default=list(DETECTOR_BACKENDS), choices=DETECTOR_BACKENDS)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--image", default=None, help="측정에 사용할 이미지 경로 (기본: 합성 이미지)")
+    args = parser.parse_args()
+
+    frame = load_frame(args.image)
+    print(f"{'backend':<10}{'warmup':>10}{'mean':>10}{'p50':>10}{'p95':>10}{'fps':>8}")
+    for backend in args.backends:
+        try:
+            r = bench_backend(backend, args, frame)
+        except Exception as error:
+            print(f"{backend:<10} 실패: {error}")
+            continue
+        print(f"{r['backend']:<10}{r['warmup_s']:>9.2f}s{r['mean_ms']:>8.1f}ms"
+              f"{r['p50_ms']:>8.1f}ms{r['p95_ms']:>8.1f}ms{r['fps']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# code/scripts/bench_vision.py
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+# vision 모듈을 임포트하기 위해 code 폴더를 경로에 추가합니다.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from vision import VisionSystem
+from frame_source import ReplaySource, SyntheticSource
+
+# VisionSystem.stage_times에 기록되는 단계 이름 (align은 리얼센스 실장비에서만 측정됨)
+STAGES = ('acquire', 'align', 'inference', 'deprojection', 'annotation', 'composition')
+
+
+def make_source(args):
+    """합성 프레임 또는 녹화 세션 소스를 생성합니다."""
+    if args.replay:
+        return ReplaySource(args.replay, pacing="fast", loop=True)
+    return SyntheticSource(frames=args.warmup + args.frames * 2 + 1, sim_mode=args.sim, objects=args.objects)
+
+
+def run_frame(vision):
+    """수집 → 추론 → 표시 한 사이클을 실행하고 단계별 소요 시간(초)을 반환합니다."""
+    vision.stage_times.clear()
+    started = time.perf_counter()
+    color_image, depth_data = vision.capture()
+    if color_image is None:
+        raise RuntimeError("Frame source returned no frame.")
+    batch, _ = vision.detect(color_image, depth_data)
+    vision.render(color_image, depth_data, batch)
+    timings = dict(vision.stage_times)
+    timings['total'] = time.perf_counter() - started
+    return timings
+
+
+def summarize(values_s):
+    """소요 시간 목록(초)을 p50/p95/p99(ms)와 처리량(fps)으로 요약합니다."""
+    values_ms = np.asarray(values_s) * 1000
+    mean_ms = float(values_ms.mean())
+    return {
+        'mean_ms': round(mean_ms, 3),
+        'p50_ms': round(float(np.percentile(values_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(values_ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(values_ms, 99)), 3),
+        'throughput_fps': round(1000 / mean_ms, 1) if mean_ms > 0 else None,
+        'samples': len(values_ms),
+    }
+
+
+def measure_latency(vision, frames):
+    """단계별 지연 시간 분포를 측정합니다."""
+    samples = {}
+    for _ in range(frames):
+        for stage, seconds in run_frame(vision).items():
+            samples.setdefault(stage, []).append(seconds)
+    return {stage: summarize(values) for stage, values in samples.items()}
+
+
+def measure_batch_deprojection(vision, boxes, frames):
+    """탐지 개수와 무관하게, 박스 boxes개의 일괄 좌표 변환 비용만 따로 측정합니다."""
+    color_image, depth_data = vision.capture()
+    height, width = depth_data.shape[:2]
+    rng = np.random.default_rng(0)
+    top_left = rng.uniform(0, [width - 100, height - 100], size=(boxes, 2))
+    boxes_xyxy = np.hstack((top_left, top_left + 80)).astype(np.float32)
+
+    values = []
+    for _ in range(frames):
+        started = time.perf_counter()
+        vision.deproject_boxes(boxes_xyxy, depth_data)
+        values.append(time.perf_counter() - started)
+    return summarize(values)
+
+
+def measure_memory(vision, frames):
+    """tracemalloc으로 프레임당 새로 할당되는 메모리(최대치 기준, 바이트)를 측정합니다."""
+    tracemalloc.start()
+    allocations = []
+    try:
+        for _ in range(frames):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            run_frame(vision)
+            _, peak = tracemalloc.get_traced_memory()
+            allocations.append(peak - before)
+    finally:
+        tracemalloc.stop()
+
+    allocations = np.asarray(allocations)
+    return {
+        'mean_bytes': int(allocations.mean()),
+        'p95_bytes': int(np.percentile(allocations, 95)),
+        'max_bytes': int(allocations.max()),
+    }
+
+
+def environment_info():
+    """빌드 간 비교를 위해 실행 환경 정보를 수집합니다."""
+    try:
+        revision = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=current_dir,
+                                           stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        revision = None
+    return {
+        'git_revision': revision,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+
+def compare_reports(report, baseline, threshold):
+    """기준 보고서 대비 p95 지연 시간이 threshold 배 이상 늘어난 단계를 찾습니다."""
+    regressions = []
+    for stage, stats in report['latency'].items():
+        base = baseline.get('latency', {}).get(stage)
+        if not base or not base.get('p95_ms'):
+            continue
+        ratio = stats['p95_ms'] / base['p95_ms']
+        if ratio >= threshold:
+            regressions.append({'stage': stage, 'baseline_p95_ms': base['p95_ms'],
+                                'p95_ms': stats['p95_ms'], 'ratio': round(ratio, 2)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VisionSystem 단계별 성능 벤치마크 (JSON 출력)")
+    parser.add_argument("--replay", default=None, help="녹화 세션 폴더 (지정하지 않으면 합성 프레임 사용)")
+    parser.add_argument("--sim", action="store_true", help="합성 프레임을 파이불렛 형식으로 생성")
+    parser.add_argument("--objects", type=int, default=5, help="합성 프레임의 물체 수")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--boxes", type=int, default=20, help="일괄 좌표 변환 측정에 쓸 박스 수")
+    parser.add_argument("--backend", default=None, help="YOLO 백엔드 (torch / onnx / openvino)")
+    parser.add_argument("--motion-gating", action="store_true", help="장면 변화 기반 추론 생략을 켠 채 측정")
+    parser.add_argument("--no-memory", action="store_true", help="메모리 할당 측정을 생략")
+    parser.add_argument("--output", default=None, help="결과 JSON 저장 경로 (기본: 표준 출력)")
+    parser.add_argument("--compare", default=None, help="비교할 기준 결과 JSON 경로")
+    parser.add_argument("--threshold", type=float, default=1.2, help="회귀로 판단할 p95 증가 배율")
+    args = parser.parse_args()
+
+    source = make_source(args)
+    vision = VisionSystem(source=source, motion_gating=args.motion_gating, detector_backend=args.backend)
+    for _ in range(args.warmup):
+        run_frame(vision)
+
+    report = {
+        'environment': environment_info(),
+        'config': {
+            'source': args.replay or ('synthetic-sim' if args.sim else 'synthetic-realsense'),
+            'frames': args.frames, 'backend': vision.model.backend,
+            'motion_gating': args.motion_gating,
+        },
+        'latency': measure_latency(vision, args.frames),
+        'batch_deprojection': dict(measure_batch_deprojection(vision, args.boxes, args.frames), boxes=args.boxes),
+    }
+    if not args.no_memory:
+        report['memory_per_frame'] = measure_memory(vision, args.frames)
+    vision.release()
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report['regressions'] = compare_reports(report, json.load(f), args.threshold)
+        exit_code = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    # 사람이 보기 위한 요약은 표준 에러로 출력하여 JSON 출력과 섞이지 않도록 합니다.
+    for stage in STAGES + ('total',):
+        stats = report['latency'].get(stage)
+        if stats:
+            print(f"{stage:<14} p50={stats['p50_ms']:>8.2f}ms  p95={stats['p95_ms']:>8.2f}ms  "
+                  f"p99={stats['p99_ms']:>8.2f}ms", file=sys.stderr)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# code/scripts/load_test_sim_stream.py
+import argparse
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+# pybullet_server 모듈을 임포트하기 위해 code/tools 폴더를 경로에 추가합니다.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(current_dir), "tools"))
+
+from pybullet_server import PyBulletServer
+
+
+def run_client(server, mode, duration, consume_interval, result):
+    """
+    한 클라이언트가 duration초 동안 프레임을 소비합니다.
+    consume_interval은 비전 루프가 프레임 하나를 처리하는 데 걸리는 시간을 흉내 냅니다.
+    """
+    if mode == "stream":
+        server.start_stream()
+    consumed, steps, waits = 0, [], []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        color_image, _, step = server.get_frame()
+        waits.append(time.perf_counter() - started)
+        if color_image is not None:
+            consumed += 1
+            steps.append(step)
+        time.sleep(consume_interval)
+
+    result.update(consumed=consumed, steps=steps, waits=waits, http=server.stats())
+    if server.stream is not None:
+        result['stream'] = server.stream.stats()
+        server.stop_stream()
+
+
+def run_load_test(ip, port, mode, clients, duration, consumer_fps):
+    """clients개의 클라이언트를 동시에 돌려 소비 fps, 대기 시간, 건너뛴 스텝 수를 집계합니다."""
+    consume_interval = 1.0 / consumer_fps if consumer_fps else 0.0
+    results = [{} for _ in range(clients)]
+    threads = [
+        threading.Thread(target=run_client, args=(PyBulletServer(ip, port), mode, duration, consume_interval, result))
+        for result in results
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"[{mode}] clients={clients}, duration={duration:.0f}s, consumer={consumer_fps or 'unlimited'} fps")
+    for index, result in enumerate(results):
+        waits_ms = np.asarray(result['waits']) * 1000
+        steps = [step for step in result['steps'] if step is not None]
+        # 연속된 두 프레임의 스텝 차이 - 1 = 소비하지 못하고 지나간 시뮬레이션 스텝 수
+        skipped = int(np.clip(np.diff(steps) - 1, 0, None).sum()) if len(steps) > 1 else 0
+        line = (f"  client {index}: {result['consumed'] / duration:6.1f} fps consumed, "
+                f"wait p50={np.percentile(waits_ms, 50):6.2f}ms p95={np.percentile(waits_ms, 95):6.2f}ms, "
+                f"skipped steps={skipped}")
+        if 'stream' in result:
+            stream = result['stream']
+            line += f", received={stream['received']}, dropped={stream['dropped']}, reconnects={stream['reconnects']}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="연무장 서버 푸시 스트림 / 요청 방식 부하 시험 (mock_pybullet_server.py와 함께 사용)")
+    parser.add_argument("--server", default="127.0.0.1:5000", help="서버 주소 ip:port")
+    parser.add_argument("--mode", choices=["stream", "poll", "both"], default="both")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--consumer-fps", type=float, default=15, help="클라이언트의 처리 속도 (0이면 제한 없음)")
+    args = parser.parse_args()
+
+    ip, port = args.server.rsplit(":", 1)
+    modes = ["stream", "poll"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        run_load_test(ip, int(port), mode, args.clients, args.duration, args.consumer_fps)
+
+
+if __name__ == "__main__":
+    main()
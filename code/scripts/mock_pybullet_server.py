@@ -0,0 +1,160 @@
+# code/scripts/mock_pybullet_server.py
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import cv2
+import numpy as np
+from flask import Flask, Response, jsonify, request
+
+# frame_source와 depth_codec 모듈을 임포트하기 위해 code, code/tools 폴더를 경로에 추가합니다.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+sys.path.append(os.path.join(os.path.dirname(current_dir), "tools"))
+
+from frame_source import SyntheticSource
+from depth_codec import (DEPTH_CONTENT_TYPE, FRAME_CONTENT_TYPE, STREAM_CONTENT_TYPE, STREAM_LENGTH,
+                         IMAGE_FORMATS, encode_depth, encode_frame, available_compressions)
+
+
+class MockScene:
+    """
+    실제 연무장(파이불렛) 서버 대신 합성 장면을 fps 주기로 갱신하며 제공하는 장면입니다.
+    바닥은 화면 아래로 갈수록 가까워지는 경사면으로 그려 실제 깊이 버퍼와 비슷한 분포를 만듭니다.
+    """
+    def __init__(self, fps=30, objects=5):
+        self.source = SyntheticSource(frames=sys.maxsize, sim_mode=True, objects=objects)
+        self.interval = 1.0 / fps
+        self.floor = np.linspace(0.995, 0.985, self.source.height, dtype=np.float32)[:, None]
+        self.lock = threading.Lock()
+        self.updated_at = 0.0
+        self.color, self.depth = None, None
+        self.step = 0
+        self.ee = {"x": 0.0, "y": 0.0, "z": 0.3}
+        self.objects = set()
+
+    def frame(self):
+        """현재 (컬러, 깊이, 스텝)을 반환합니다. 마지막 갱신 후 한 주기가 지났으면 다음 스텝으로 넘어갑니다."""
+        with self.lock:
+            now = time.monotonic()
+            if self.color is None or now - self.updated_at >= self.interval:
+                color, depth = self.source.read()
+                self.color = color
+                self.depth = np.where(depth >= 0.99, self.floor, depth).astype(np.float32)
+                self.step += 1
+                self.updated_at = now
+            return self.color, self.depth, self.step
+
+
+def create_app(scene, json_only=False):
+    """
+    연무장 서버와 같은 엔드포인트(/image, /depth, /set_pos, /ee, /set_object)와
+    컬러+깊이+스텝을 한 번에 내려주는 /frame, 새 스텝마다 프레임을 밀어 보내는 /stream을 가진 Flask 앱을 만듭니다.
+    """
+    app = Flask(__name__)
+
+    @app.get("/image")
+    def image():
+        color, _, _ = scene.frame()
+        _, encoded = cv2.imencode(".jpg", color, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        return Response(encoded.tobytes(), mimetype="image/jpeg")
+
+    @app.get("/depth")
+    def depth():
+        _, depth_data, _ = scene.frame()
+        # 이진 형식을 요청한 클라이언트에게만 이진으로 응답하고, 나머지는 예전처럼 JSON 목록으로 응답합니다.
+        if json_only or DEPTH_CONTENT_TYPE not in request.headers.get("Accept", ""):
+            return Response(json.dumps(depth_data.tolist()), mimetype="application/json")
+
+        encoding = request.args.get("encoding", "u16")
+        compression = request.args.get("compression", "none")
+        if compression not in available_compressions():
+            compression = "none"
+        try:
+            body = encode_depth(depth_data, encoding=encoding, compression=compression)
+        except ValueError as error:
+            return jsonify({"ok": False, "error": str(error)}), 400
+        return Response(body, mimetype=DEPTH_CONTENT_TYPE)
+
+    def frame_options():
+        """요청 인자에서 프레임 인코딩 옵션을 읽습니다. 지원하지 않는 값은 기본값으로 바꿉니다."""
+        compression = request.args.get("compression", "none")
+        image_format = request.args.get("image", "jpeg")
+        return {
+            'encoding': request.args.get("encoding", "u16"),
+            'compression': compression if compression in available_compressions() else "none",
+            'image_format': image_format if image_format in IMAGE_FORMATS else "jpeg",
+        }
+
+    @app.get("/frame")
+    def frame():
+        if json_only:
+            return jsonify({"ok": False, "error": "not supported"}), 404
+        color, depth_data, step = scene.frame()
+        try:
+            body = encode_frame(color, depth_data, step, **frame_options())
+        except ValueError as error:
+            return jsonify({"ok": False, "error": str(error)}), 400
+        return Response(body, mimetype=FRAME_CONTENT_TYPE, headers={"X-Sim-Step": str(step)})
+
+    @app.get("/stream")
+    def stream():
+        if json_only:
+            return jsonify({"ok": False, "error": "not supported"}), 404
+        options = frame_options()
+        fps = float(request.args.get("fps", 0)) or None
+
+        def generate():
+            # 장면이 새 스텝을 렌더링할 때마다(또는 요청한 fps 주기마다) 길이 + 프레임을 밀어 보냅니다.
+            last_step, sent_at = None, 0.0
+            while True:
+                color, depth_data, step = scene.frame()
+                now = time.monotonic()
+                if step == last_step or (fps and now - sent_at < 1.0 / fps):
+                    time.sleep(scene.interval / 4)
+                    continue
+                body = encode_frame(color, depth_data, step, **options)
+                yield STREAM_LENGTH.pack(len(body)) + body
+                last_step, sent_at = step, now
+
+        return Response(generate(), mimetype=STREAM_CONTENT_TYPE)
+
+    @app.post("/set_pos")
+    def set_pos():
+        x, y, z = request.get_json()["pos"]
+        scene.ee = {"x": x, "y": y, "z": z}
+        return jsonify({"ok": True})
+
+    @app.get("/ee")
+    def ee():
+        return jsonify(scene.ee)
+
+    @app.post("/set_object")
+    def set_object():
+        body = request.get_json()
+        if body.get("op", "create") == "delete":
+            scene.objects.discard(body["object"])
+        else:
+            scene.objects.add(body["object"])
+        return jsonify({"ok": True})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="테스트/벤치마크용 연무장(파이불렛) 대역 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--objects", type=int, default=5)
+    parser.add_argument("--json-only", action="store_true", help="이진 깊이 형식과 /frame, /stream을 지원하지 않는 예전 서버처럼 동작")
+    args = parser.parse_args()
+
+    app = create_app(MockScene(fps=args.fps, objects=args.objects), json_only=args.json_only)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
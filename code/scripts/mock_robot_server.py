@@ -0,0 +1,85 @@
+# code/scripts/mock_robot_server.py
+import argparse
+import itertools
+import math
+import threading
+import time
+from flask import Flask, jsonify, request
+
+
+class MockArm:
+    """
+    라즈베리 파이 로봇 서버 대신 명령을 받아 한 번에 하나씩 수행하는 가상 팔입니다.
+    이동 시간은 이동 거리 / 속도로 정하고, 명령은 받은 순서대로 이어서 수행합니다.
+    """
+    def __init__(self, speed_mm_s=200.0, min_duration=0.05):
+        self.speed_mm_s = speed_mm_s
+        self.min_duration = min_duration
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.position = (50.0, 0.0, 120.0)
+        self.busy_until = 0.0
+        self.tasks = {}
+
+    def accept(self, command, target):
+        """명령을 받아 작업 번호를 매기고, 앞선 작업이 끝난 뒤에 끝나도록 완료 예정 시각을 정합니다."""
+        with self.lock:
+            duration = self.min_duration
+            if target is not None:
+                end = (target["x"], target["y"], target["z"])
+                duration = max(math.dist(self.position, end) / self.speed_mm_s, self.min_duration)
+                self.position = end
+            now = time.monotonic()
+            self.busy_until = max(self.busy_until, now) + duration
+            task_id = f"pi-{next(self.ids)}"
+            self.tasks[task_id] = {"command": command, "finish_at": self.busy_until}
+            return task_id, duration
+
+    def status(self, task_id):
+        """작업 상태(running/done)를 반환합니다. 없는 작업이면 None입니다."""
+        with self.lock:
+            task = self.tasks.get(task_id)
+        if task is None:
+            return None
+        return "done" if time.monotonic() >= task["finish_at"] else "running"
+
+
+def create_app(arm, latency=0.0, no_status=False):
+    """
+    로봇 서버와 같은 POST /robot/action과, 작업 번호로 진행 상태를 돌려주는 GET /robot/task/<id>를 가진 Flask 앱을 만듭니다.
+    no_status가 True이면 상태 조회를 지원하지 않는 예전 서버처럼 404를 돌려줍니다.
+    """
+    app = Flask(__name__)
+
+    @app.post("/robot/action")
+    def action():
+        body = request.get_json()
+        time.sleep(latency)
+        task_id, duration = arm.accept(body.get("command"), body.get("target"))
+        return jsonify({"message": f"{body.get('command')} 접수 ({duration:.2f}s 예정)", "task_id": task_id})
+
+    @app.get("/robot/task/<task_id>")
+    def task(task_id):
+        status = None if no_status else arm.status(task_id)
+        if status is None:
+            return jsonify({"error": "not found"}), 404
+        return jsonify({"task_id": task_id, "status": status})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="테스트용 라즈베리 파이 로봇 서버 대역")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--speed", type=float, default=200.0, help="팔 이동 속도 (mm/s)")
+    parser.add_argument("--latency", type=float, default=0.0, help="명령 접수 응답 지연 (초)")
+    parser.add_argument("--no-status", action="store_true", help="작업 상태 조회를 지원하지 않는 예전 서버처럼 동작")
+    args = parser.parse_args()
+
+    app = create_app(MockArm(speed_mm_s=args.speed), latency=args.latency, no_status=args.no_status)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
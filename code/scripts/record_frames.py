@@ -0,0 +1,66 @@
+# code/scripts/record_frames.py
+import argparse
+import os
+import sys
+import time
+
+# vision 모듈을 임포트하기 위해 code 폴더를 경로에 추가합니다.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from vision import VisionSystem
+from frame_source import ReplaySource
+
+
+def record(args):
+    """리얼센스 또는 파이불렛 서버에서 정렬된 컬러/깊이 프레임을 녹화합니다."""
+    vision = VisionSystem(sim_mode=args.sim, motion_gating=False, tracking=False)
+    vision.start_recording(args.out)
+    recorded = 0
+    try:
+        while recorded < args.frames:
+            color_image, _ = vision.capture()
+            if color_image is None:
+                time.sleep(0.05)
+                continue
+            recorded += 1
+            print(f"\r녹화 중... {recorded}/{args.frames}", end="")
+    finally:
+        print()
+        vision.release()
+
+
+def replay(args):
+    """녹화된 세션을 재생하며 탐지 결과와 처리 속도를 출력합니다."""
+    source = ReplaySource(args.out, pacing=args.pacing, loop=False)
+    vision = VisionSystem(source=source)
+    started = time.perf_counter()
+    frames = 0
+    while True:
+        color_image, depth_data = vision.capture()
+        if color_image is None:
+            break
+        batch, _ = vision.detect(color_image, depth_data)
+        frames += 1
+        print(f"[{frames:04d}] {batch.to_text()}")
+    elapsed = time.perf_counter() - started
+    print(f"{frames} frames in {elapsed:.2f}s ({frames / max(elapsed, 1e-6):.1f} fps)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="비전 프레임 녹화 및 재생")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--out", required=True, help="녹화 폴더 경로")
+    parser.add_argument("--sim", action="store_true", help="파이불렛 서버에서 녹화")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--pacing", choices=["realtime", "fast"], default="fast")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        record(args)
+    else:
+        replay(args)
+
+
+if __name__ == "__main__":
+    main()
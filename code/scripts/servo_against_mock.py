@@ -0,0 +1,74 @@
+# code/scripts/servo_against_mock.py
+import argparse
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+# servo_controller, pybullet_server 모듈을 임포트하기 위해 code, code/tools 폴더를 경로에 추가합니다.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+sys.path.append(os.path.join(os.path.dirname(current_dir), "tools"))
+
+from arm_kinematics import CAM_OFFSET_X, CAM_OFFSET_Y, CAM_OFFSET_Z
+from pybullet_server import PyBulletServer
+from servo_controller import SimArm, VisualServoController
+from vision_snapshot import VisionSnapshot, SnapshotStore
+
+
+def robot_to_camera_cm(point_m):
+    """로봇 기준 좌표(m)를 비전이 보고하는 카메라 기준 좌표(cm)로 바꿉니다. (camera_to_robot의 역변환)"""
+    x, y, z = point_m
+    return round(-(y - CAM_OFFSET_Y) * 100, 2), round((CAM_OFFSET_Z - z) * 100, 2), round((x - CAM_OFFSET_X) * 100, 2)
+
+
+def publish_scene(store, target_m, fps, noise_cm, hide_after, stop_event, name="cup"):
+    """
+    비전 루프 대신 고정된 목표 물체의 탐지 결과를 fps 주기로 발행합니다.
+    noise_cm만큼 깊이 잡음을 섞고, hide_after초가 지나면 물체를 화면에서 없앱니다.
+    """
+    rng = np.random.default_rng(0)
+    started, seq = time.monotonic(), 0
+    while not stop_event.is_set():
+        seq += 1
+        coordinates = []
+        if hide_after is None or time.monotonic() - started < hide_after:
+            x, y, z = robot_to_camera_cm(target_m)
+            coordinates.append({'name': name, 'id': 1, 'x': x, 'y': y, 'z': round(z + rng.normal(0, noise_cm), 2)})
+        store.publish(VisionSnapshot(seq=seq, captured_at=time.perf_counter(),
+                                     vision_result=name if coordinates else "nothing", coordinates=coordinates))
+        time.sleep(1.0 / fps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="연무장 대역 서버(mock_pybullet_server.py)에 대한 시각 서보 제어 시험")
+    parser.add_argument("--server", default="127.0.0.1:5000", help="서버 주소 ip:port")
+    parser.add_argument("--target", type=float, nargs=3, default=[0.20, 0.05, 0.05], help="목표 물체의 로봇 기준 좌표 (m)")
+    parser.add_argument("--fps", type=float, default=30, help="탐지 결과 발행 주기")
+    parser.add_argument("--noise-cm", type=float, default=0.3, help="깊이 잡음 표준편차 (cm)")
+    parser.add_argument("--hide-after", type=float, default=None, help="이 시간(초)이 지나면 목표를 가립니다 (lost 시험)")
+    parser.add_argument("--timeout", type=float, default=20)
+    args = parser.parse_args()
+
+    ip, port = args.server.rsplit(":", 1)
+    arm = SimArm(PyBulletServer(ip, int(port)))
+    print(f"start ee={arm.position()}, target={args.target}")
+
+    store, stop_event = SnapshotStore(), threading.Event()
+    publisher = threading.Thread(target=publish_scene, daemon=True, args=(
+        store, args.target, args.fps, args.noise_cm, args.hide_after, stop_event))
+    publisher.start()
+
+    # 엔진 없이 돌리므로 이동 시점의 프레임 번호는 마지막 발행 번호로 대신합니다.
+    controller = VisualServoController(store, arm, on_move=lambda: store.latest().seq)
+    result = controller.run("cup", timeout=args.timeout)
+    stop_event.set()
+    publisher.join()
+
+    print(result)
+    print(f"final ee={arm.position()}")
+
+
+if __name__ == "__main__":
+    main()
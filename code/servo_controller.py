@@ -0,0 +1,230 @@
+# code/servo_controller.py
+
+import re
+import time
+import numpy as np
+from logger import get_logger
+from arm_kinematics import camera_to_robot, get_reachability_map
+
+logger = get_logger('SERVO')
+
+# 팔이 처음 위치를 알려주지 않을 때 가정하는 대기 자세 (로봇 기준 좌표, m)
+HOME_POSITION = (0.05, 0.0, 0.12)
+# 목표 이름 형식: 'cup' 또는 추적 번호를 붙인 'cup#3'
+TARGET_PATTERN = re.compile(r'^\s*(?P<name>[^#]*?[^#\s])\s*(#\s*(?P<track_id>\d+))?\s*$')
+
+
+class SimArm:
+    """파이불렛 서버의 팔입니다. 현재 끝단 위치는 서버의 /ee에서 읽고, 이동은 move_arm으로 보냅니다."""
+    def __init__(self, server, timeout=1.0):
+        self.server = server
+        self.timeout = timeout
+
+    def position(self):
+        """현재 끝단 좌표 (x, y, z)(m)를 반환합니다. 읽지 못하면 None입니다."""
+        ee = self.server.get_arm_position()
+        if not ee:
+            return None
+        if isinstance(ee, dict):
+            return ee['x'], ee['y'], ee['z']
+        return tuple(ee[:3])
+
+    def move(self, position):
+        """끝단을 position (x, y, z)(m)로 옮기고 성공 여부를 반환합니다."""
+        return self.server.move_arm([float(v) for v in position], timeout=self.timeout)
+
+    def settle(self, timeout):
+        """위치를 서버에서 직접 읽으므로 기다릴 명령이 없습니다."""
+        return True
+
+
+class CommandArm:
+    """
+    위치를 알려주지 않는 팔(실제 라즈베리 파이 서버 등)입니다.
+    send(position)으로 이동 명령을 제출하고 작업(RobotTask, 실패하면 None)을 받으며,
+    현재 위치는 마지막으로 보낸 목표 좌표로 추정합니다.
+    명령은 기다리지 않고 제출하므로, 추정 위치는 팔이 실제로 도착하기 전의 값일 수 있습니다.
+    도착했다고 보고하기 전에 settle()로 마지막 명령이 끝나기를 기다려야 합니다.
+    """
+    def __init__(self, send, home=HOME_POSITION):
+        self.send = send
+        self.commanded = tuple(home)
+        self.last_task = None
+
+    def position(self):
+        return self.commanded
+
+    def move(self, position):
+        task = self.send(position)
+        if task is None:
+            return False
+        self.last_task = task
+        self.commanded = tuple(float(v) for v in position)
+        return True
+
+    def settle(self, timeout):
+        """
+        마지막 이동 명령이 끝날 때까지 최대 timeout초 기다립니다.
+        성공하면 True, 실패(또는 다른 명령으로 대체)하면 False, 시간 안에 끝나지 않으면 None을 반환합니다.
+        """
+        task = self.last_task
+        if task is None:
+            return True
+        if not task.wait(timeout):
+            return None
+        return task.ok
+
+
+class VisualServoController:
+    """
+    비전 스냅샷을 프레임 단위로 받아 이름으로 지정한 물체에 팔 끝단을 접근시키는 폐루프 제어기입니다.
+    LLM이 robot_action과 vision_detect를 번갈아 부르던 이동 루프를 엔진 안에서 한 번에 수행합니다.
+
+    매 프레임마다 목표 물체의 좌표(카메라 기준 cm)를 로봇 기준 좌표(m)로 바꾸고 지수 이동 평균으로 평활화한 뒤,
+    오차에 gain을 곱한 만큼(최대 max_step) 팔을 옮기고 이동 후 프레임을 기다립니다.
+    다음 중 하나가 되면 멈춥니다.
+    - reached: 끝단과 목표의 거리가 tolerance 이내
+    - lost: 목표가 lost_frames 프레임 연속으로 보이지 않음
+    - unreachable: 목표나 다음 이동 지점이 팔이 닿지 않는 위치
+    - stalled: stall_frames 프레임 동안 거리가 줄지 않음
+    - arm_error: 팔이 이동 명령에 응답하지 않음
+    - timeout: timeout초 안에 도달하지 못함
+    - invalid_target: 목표 이름 형식이 잘못됨 ('cup#x', 'cup#' 등)
+    reached/stalled는 팔의 마지막 이동 명령이 끝났는지(arm.settle) 확인한 뒤에 보고합니다.
+    명령이 실패하면 arm_error, 남은 시간 안에 끝나지 않으면 timeout으로 바꿉니다.
+    """
+    def __init__(self, snapshots, arm, on_move=None, gain=0.6, max_step=0.03, tolerance=0.01,
+                 smoothing=0.5, lost_frames=15, stall_frames=20, frame_timeout=1.0):
+        self.snapshots = snapshots
+        self.arm = arm
+        self.on_move = on_move
+        self.gain = gain
+        self.max_step = max_step
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.lost_frames = lost_frames
+        self.stall_frames = stall_frames
+        self.frame_timeout = frame_timeout
+        self.reach_map = get_reachability_map()
+
+    @staticmethod
+    def find_target(coordinates, target, locked_id=None):
+        """
+        좌표 목록에서 목표를 찾습니다. 'cup#3'처럼 추적 번호를 주면 그 물체만, 이름만 주면
+        처음 고른 물체의 추적 번호(locked_id)를 계속 따라갑니다.
+        """
+        match = TARGET_PATTERN.match(target)
+        if match is None:
+            return None
+        name, track_id = match.group('name'), match.group('track_id')
+        if track_id is not None:
+            locked_id = int(track_id)
+        candidates = [c for c in coordinates if c['name'] == name]
+        if locked_id is not None:
+            candidates = [c for c in candidates if c.get('id') == locked_id]
+        # 좌표가 (0,0,0)이면 깊이를 얻지 못한 탐지이므로 목표로 쓰지 않습니다.
+        candidates = [c for c in candidates if (c['x'], c['y'], c['z']) != (0, 0, 0)]
+        return candidates[0] if candidates else None
+
+    def run(self, target, timeout=20.0):
+        """목표 물체에 접근할 때까지 제어 루프를 돌리고 결과 요약(dict)을 반환합니다."""
+        started = time.perf_counter()
+        deadline = started + timeout
+        seen_seq = self.snapshots.latest().seq
+        locked_id, estimate = None, None
+        missed, frames, moves = 0, 0, 0
+        best_distance, best_frame = np.inf, 0
+        distance, status = None, 'timeout'
+
+        if TARGET_PATTERN.match(target) is None:
+            return self._result('invalid_target', target, started, frames, moves, distance, None)
+
+        position = self.arm.position()
+        if position is None:
+            return self._result('arm_error', target, started, frames, moves, distance, position)
+        position = np.asarray(position, dtype=np.float64)
+
+        while time.perf_counter() < deadline:
+            snapshot = self.snapshots.wait_for_snapshot(
+                newer_than=seen_seq, timeout=min(self.frame_timeout, max(deadline - time.perf_counter(), 0)))
+            if snapshot is None:
+                missed += 1
+                if missed >= self.lost_frames:
+                    status = 'lost'
+                    break
+                continue
+            seen_seq = snapshot.seq
+            frames += 1
+
+            found = self.find_target(snapshot.coordinates, target, locked_id)
+            if found is None:
+                missed += 1
+                if missed >= self.lost_frames:
+                    status = 'lost'
+                    break
+                continue
+            missed = 0
+            locked_id = found.get('id', locked_id)
+
+            # 카메라 기준 좌표(cm) -> 로봇 기준 좌표(m), 깊이 잡음을 줄이기 위해 평활화합니다.
+            measured = np.array(camera_to_robot(found['x'], found['y'], found['z']), dtype=np.float64)
+            estimate = measured if estimate is None else estimate + self.smoothing * (measured - estimate)
+            if not self.reach_map.contains(estimate)[0]:
+                status = 'unreachable'
+                break
+
+            error = estimate - position
+            distance = float(np.linalg.norm(error))
+            if distance <= self.tolerance:
+                status = 'reached'
+                break
+            if distance < best_distance - 0.001:
+                best_distance, best_frame = distance, frames
+            elif frames - best_frame >= self.stall_frames:
+                status = 'stalled'
+                break
+
+            step = error * self.gain
+            step_norm = np.linalg.norm(step)
+            if step_norm > self.max_step:
+                step *= self.max_step / step_norm
+            next_position = position + step
+            if not self.reach_map.contains(next_position)[0]:
+                status = 'unreachable'
+                break
+            if not self.arm.move(next_position):
+                status = 'arm_error'
+                break
+            moves += 1
+            # 팔이 움직였으므로 이동 후에 찍힌 프레임부터 다시 봅니다.
+            if self.on_move is not None:
+                seen_seq = max(seen_seq, self.on_move())
+            measured_position = self.arm.position()
+            position = next_position if measured_position is None else np.asarray(measured_position, dtype=np.float64)
+
+        # 명령만 보내고 위치를 추정하는 팔은 마지막 명령이 실제로 끝나야 그 위치에 있다고 말할 수 있습니다.
+        if status in ('reached', 'stalled'):
+            settled = self.arm.settle(max(deadline - time.perf_counter(), 0.0))
+            if settled is None:
+                status = 'timeout'
+            elif not settled:
+                status = 'arm_error'
+
+        return self._result(status, target, started, frames, moves, distance, position, locked_id)
+
+    def _result(self, status, target, started, frames, moves, distance, position, locked_id=None):
+        """제어 루프 결과를 요약합니다."""
+        elapsed = time.perf_counter() - started
+        result = {
+            'status': status,
+            'target': f"{target.partition('#')[0]}#{locked_id}" if locked_id is not None else target,
+            'frames': frames,
+            'moves': moves,
+            'elapsed_s': round(elapsed, 2),
+            'loop_hz': round(frames / elapsed, 1) if elapsed > 0 else 0.0,
+            'distance_cm': None if distance is None else round(distance * 100, 1),
+            'position_cm': None if position is None else [round(float(v) * 100, 1) for v in position],
+        }
+        logger.info(f"Servo {result['target']}: {status} after {frames} frames / {moves} moves "
+                    f"in {elapsed:.2f}s (distance {result['distance_cm']}cm)")
+        return result
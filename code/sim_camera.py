@@ -0,0 +1,73 @@
+# code/sim_camera.py
+
+import threading
+import numpy as np
+
+
+class SimCameraModel:
+    """
+    파이불렛 카메라의 깊이 버퍼(0~1)를 미터 단위 3D 좌표로 바꾸는 공용 카메라 모델입니다.
+    VisionSystem과 PyBulletSimulator가 같은 객체를 써서 두 계산 경로가 서로 어긋나지 않도록 합니다.
+
+    픽셀 (px, py)의 좌표는 ((px - w/2) / w, (py - h/2) / h, 1) 방향의 광선에 거리 z를 곱한 값이며,
+    이 광선 방향을 해상도별로 한 번만 계산해 두고 재사용합니다.
+    near/far와 기본 해상도는 서버의 카메라 설정값과 일치해야 합니다.
+    """
+    def __init__(self, near=0.01, far=10.0, width=600, height=480):
+        self.near = near
+        self.far = far
+        self.width = width
+        self.height = height
+        self._lock = threading.Lock()
+        self._rays = {}
+
+    def metadata(self):
+        """녹화 메타데이터에 기록할 카메라 설정을 반환합니다."""
+        return {'near': self.near, 'far': self.far, 'width': self.width, 'height': self.height}
+
+    def rays(self, height=None, width=None):
+        """해상도별 픽셀 광선 방향 (H, W, 3) 배열을 반환합니다. 처음 요청된 해상도만 새로 계산합니다."""
+        height, width = height or self.height, width or self.width
+        rays = self._rays.get((height, width))
+        if rays is None:
+            with self._lock:
+                rays = self._rays.get((height, width))
+                if rays is None:
+                    rays = np.empty((height, width, 3), dtype=np.float32)
+                    rays[..., 0] = ((np.arange(width, dtype=np.float32) - width / 2) / width)[None, :]
+                    rays[..., 1] = ((np.arange(height, dtype=np.float32) - height / 2) / height)[:, None]
+                    rays[..., 2] = 1.0
+                    self._rays[(height, width)] = rays
+        return rays
+
+    def linearize(self, depth_buffer, out=None):
+        """깊이 버퍼 값(스칼라 또는 배열)을 카메라로부터의 거리(m)로 변환합니다."""
+        if np.isscalar(depth_buffer):
+            return self.far * self.near / (self.far - (self.far - self.near) * float(depth_buffer))
+        depth_buffer = np.asarray(depth_buffer)
+        out = np.multiply(depth_buffer, -(self.far - self.near), out=out,
+                          dtype=np.result_type(depth_buffer.dtype, np.float32))
+        out += self.far
+        return np.divide(self.far * self.near, out, out=out)
+
+    def point_cloud(self, depth_buffer):
+        """깊이 버퍼 전체를 (H, W, 3) 점군(m)으로 변환합니다. 광선 격자에 거리를 곱하는 한 번의 연산입니다."""
+        height, width = depth_buffer.shape[:2]
+        z_m = self.linearize(depth_buffer.astype(np.float32, copy=False))
+        return self.rays(height, width) * z_m[..., None]
+
+    def points_at(self, pixel_x, pixel_y, depth_values, shape=None):
+        """
+        여러 픽셀 (pixel_x, pixel_y)과 그 위치의 깊이 버퍼 값을 한 번에 (N, 3) 좌표(m)로 변환합니다.
+        shape에는 깊이 이미지의 (높이, 너비)를 넘기며, 생략하면 기본 해상도를 사용합니다.
+        """
+        height, width = (shape or (self.height, self.width))[:2]
+        rays = self.rays(height, width)
+        pixel_x = np.asarray(pixel_x, dtype=np.intp)
+        pixel_y = np.asarray(pixel_y, dtype=np.intp)
+        z_m = self.linearize(np.asarray(depth_values, dtype=np.float64))
+        return rays[pixel_y, pixel_x].astype(np.float64) * z_m[:, None]
+
+    def pixel_to_point(self, pixel_x, pixel_y, depth_value, shape=None):
+        """픽셀 하나를 (x, y, z) 좌표(m)로 변환합니다."""
+        return tuple(self.points_at([pixel_x], [pixel_y], [depth_value], shape)[0].tolist())
@@ -0,0 +1,163 @@
+# code/summary_memory.py
+
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain_core.messages import get_buffer_string
+from langchain_core.pydantic_v1 import Field, PrivateAttr
+from logger import get_logger
+
+logger = get_logger('MEMORY')
+
+# 토큰 수를 셀 GPT-2 토크나이저 경로 (이름이면 Hugging Face 로컬 캐시에서만 찾고, 내려받지 않습니다)
+TOKENIZER_PATH = os.environ.get("MACH_TOKENIZER_PATH", "gpt2")
+
+# 토크나이저를 쓸 수 없을 때의 추정 규칙: 한글은 음절마다, 영어 단어와 숫자, 기호는 하나씩 셉니다. (넉넉하게 세는 쪽)
+TOKEN_ESTIMATE_PATTERN = re.compile(r'[가-힣]|[A-Za-z]+|\d|[^\sA-Za-z\d가-힣]')
+
+
+@lru_cache(maxsize=1)
+def get_tokenizer():
+    """
+    로컬 GPT-2 토크나이저를 한 번만 불러와 재사용합니다. (LangChain 기본 토큰 계산과 같은 토크나이저)
+    네트워크가 없는 로봇에서 시작이 멈추지 않도록 디스크에 있는 파일(MACH_TOKENIZER_PATH)만 씁니다.
+    transformers가 설치되어 있지 않거나 토크나이저 파일이 없으면 None을 반환합니다.
+    """
+    try:
+        from transformers import GPT2TokenizerFast  # transformers는 선택 설치 항목입니다.
+        return GPT2TokenizerFast.from_pretrained(TOKENIZER_PATH, local_files_only=True)
+    except Exception as e:
+        logger.info(f"GPT-2 tokenizer unavailable, estimating token counts instead: {e}")
+        return None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text):
+    """문자열의 토큰 수를 셉니다. 같은 메시지는 다시 세지 않도록 결과를 캐시합니다."""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return len(TOKEN_ESTIMATE_PATTERN.findall(text))
+    return len(tokenizer.encode(text))
+
+
+class BackgroundSummaryMemory(ConversationSummaryBufferMemory):
+    """
+    대화 요약을 사용자 턴 밖에서 수행하는 ConversationSummaryBufferMemory입니다.
+    - save_context는 메시지를 버퍼에 붙이기만 하고 바로 돌아옵니다.
+    - 토큰 수는 메시지별로 캐시한 로컬 토크나이저로 셉니다. (LLM 서버를 부르지 않습니다)
+    - 버퍼가 max_token_limit을 넘으면 백그라운드 스레드가 오래된 메시지를 요약에 합칩니다.
+    load_memory_variables는 기다리지 않고 그 시점의 가장 최근 요약과 버퍼를 돌려주므로,
+    요약이 끝나기 전의 턴은 잠시 한도보다 긴 대화 기록을 보게 됩니다.
+    """
+    summary_stats: Dict[str, float] = Field(
+        default_factory=lambda: {'saves': 0, 'save_s': 0.0, 'summaries': 0, 'summary_s': 0.0, 'last_summary_s': 0.0})
+    _lock: Any = PrivateAttr(default_factory=threading.RLock)
+    _wake: Any = PrivateAttr(default_factory=threading.Event)
+    _idle: Any = PrivateAttr(default_factory=threading.Event)
+    _worker: Any = PrivateAttr(default=None)
+    _generation: int = PrivateAttr(default=0)
+
+    def count_buffer_tokens(self, messages):
+        return sum(count_tokens(get_buffer_string([message])) for message in messages)
+
+    def save_context(self, inputs, outputs):
+        """대화 한 쌍을 버퍼에 붙이고, 필요하면 백그라운드 요약을 예약합니다."""
+        started = time.perf_counter()
+        with self._lock:
+            BaseChatMemory.save_context(self, inputs, outputs)
+        self.prune()
+        with self._lock:
+            self.summary_stats['saves'] += 1
+            self.summary_stats['save_s'] += time.perf_counter() - started
+
+    def prune(self):
+        """버퍼가 토큰 한도를 넘었으면 백그라운드 요약 스레드를 깨웁니다. (기다리지 않습니다)"""
+        with self._lock:
+            if self.count_buffer_tokens(self.chat_memory.messages) <= self.max_token_limit:
+                return
+            self._idle.clear()
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._summarize_loop, name="memory-summary", daemon=True)
+                self._worker.start()
+        self._wake.set()
+
+    def load_memory_variables(self, inputs):
+        # 요약 스레드가 버퍼를 바꾸더라도 이번 턴의 대화 기록은 그대로 유지되도록 복사본을 돌려줍니다.
+        with self._lock:
+            variables = super().load_memory_variables(inputs)
+        history = variables[self.memory_key]
+        if isinstance(history, list):
+            variables[self.memory_key] = list(history)
+        return variables
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            super().clear()
+
+    def flush(self, timeout=None):
+        """예약된 요약이 끝날 때까지 기다립니다. 끝났으면 True를 반환합니다."""
+        with self._lock:
+            if self._worker is None:
+                return True
+        return self._idle.wait(timeout)
+
+    def _summarize_loop(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self._summarize_overflow()
+            except Exception as e:
+                logger.error(f"Background summarization failed: {e}")
+            if not self._wake.is_set():
+                self._idle.set()
+
+    def _summarize_overflow(self):
+        """한도를 넘은 오래된 메시지를 떼어 요약에 합칩니다. LLM 호출 중에는 잠금을 잡지 않습니다."""
+        with self._lock:
+            messages = list(self.chat_memory.messages)
+            total = self.count_buffer_tokens(messages)
+            pruned = []
+            while messages and total > self.max_token_limit:
+                pruned.append(messages.pop(0))
+                total -= self.count_buffer_tokens(pruned[-1:])
+            if not pruned:
+                return
+            summary, generation = self.moving_summary_buffer, self._generation
+
+        started = time.perf_counter()
+        new_summary = self.predict_new_summary(pruned, summary)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            # 요약하는 사이에 기억이 지워졌으면 결과를 버립니다.
+            if generation != self._generation:
+                return
+            del self.chat_memory.messages[:len(pruned)]
+            self.moving_summary_buffer = new_summary
+            self.summary_stats['summaries'] += 1
+            self.summary_stats['summary_s'] += elapsed
+            self.summary_stats['last_summary_s'] = elapsed
+        logger.info(f"Summarized {len(pruned)} messages in background in {elapsed:.2f}s (buffer {total} tokens)")
+
+    def stats(self):
+        """
+        요약 횟수와 평균 요약 시간, 사용자 턴에서 빠진 요약 시간(초), save_context 평균 시간(ms),
+        현재 버퍼 토큰 수, 요약 대기 여부를 반환합니다.
+        """
+        with self._lock:
+            stats = self.summary_stats
+            return {
+                'summaries': int(stats['summaries']),
+                'summary_avg_s': round(stats['summary_s'] / stats['summaries'], 2) if stats['summaries'] else 0.0,
+                'removed_from_turns_s': round(stats['summary_s'], 1),
+                'save_ms': round(stats['save_s'] / stats['saves'] * 1000, 2) if stats['saves'] else 0.0,
+                'buffer_tokens': self.count_buffer_tokens(self.chat_memory.messages),
+                'pending': self._worker is not None and not self._idle.is_set(),
+            }
@@ -1,12 +1,17 @@
 from .vision_detect import vision_detect
 from .emotion_set import emotion_set
 from .find_location import find_location
-from .robot_action import robot_action
+from .robot_action import robot_action, robot_task_status
 from .memory_save import memory_save
 from .memory_load import memory_load
 from .vision_analyze import vision_analyze
+from .visual_servo import visual_servo
 
+# 도구는 metadata로 다음 성질을 선언합니다.
+# - parallel_safe: 부작용 없는 조회 도구라 한 번의 LLM 반복에서 다른 조회 도구와 동시에 실행될 수 있음 (parallel_tools.py)
+# - live_state: 결과가 카메라/팔/DB의 현재 상태에 따라 달라지므로, 그 관찰 결과가 담긴 LLM 응답은 캐시하지 않음 (llm_cache.py)
 TOOLS = [
     vision_detect, emotion_set, find_location, 
-    robot_action, memory_save, memory_load, vision_analyze
+    robot_action, memory_save, memory_load, vision_analyze,
+    visual_servo, robot_task_status
 ]
\ No newline at end of file
@@ -0,0 +1,194 @@
+import hashlib
+import os
+import threading
+import numpy as np
+from logger import get_logger
+
+logger = get_logger('TOOLS')
+
+# [로봇 물리 제원 설정 - 단위: Meters]
+LINK_L1 = 0.08      # 어깨에서 팔꿈치까지 (J2~J3)
+LINK_L2 = 0.08      # 팔꿈치에서 손목까지 (J3~J4)
+LINK_D = 0.19       # 손목에서 그리퍼 끝단까지 (J4~End)
+BASE_HEIGHT = 0.12  # 지면에서 J2 관절까지의 높이
+TOTAL_REACH = LINK_L1 + LINK_L2 + LINK_D # 총 가동 범위: 0.35m
+
+# [카메라 설치 오프셋 설정 - 단위: Meters]
+# 로봇 베이스 중심(0,0,0) 기준 카메라의 상대 위치
+CAM_OFFSET_X = -0.05 # 로봇보다 5cm 뒤에 위치
+CAM_OFFSET_Y = 0.0   # 로봇과 좌우 정렬됨
+CAM_OFFSET_Z = 0.10  # 로봇 베이스보다 10cm 높게 위치
+
+# 도달 가능 지도 설정
+REACH_MAP_RESOLUTION = 0.005   # 복셀 한 변의 길이 (0.5cm)
+REACH_MAP_DIR = os.environ.get("MACH_REACH_MAP_DIR", os.path.dirname(os.path.abspath(__file__)))
+
+JOINT_NAMES = ("J1", "J2", "J3", "J4", "J5")
+
+
+def camera_to_robot(x_cm, y_cm, z_cm):
+    """
+    카메라 좌표계(Vision, cm)를 로봇 좌표계(Robot, m)로 번역합니다. 스칼라와 배열 모두 받습니다.
+    로봇 X = 카메라 Z + Offset / 로봇 Y = -카메라 X / 로봇 Z = -카메라 Y + Offset
+    """
+    v_x, v_y, v_z = np.divide(x_cm, 100.0), np.divide(y_cm, 100.0), np.divide(z_cm, 100.0)
+    return v_z + CAM_OFFSET_X, -v_x + CAM_OFFSET_Y, -v_y + CAM_OFFSET_Z
+
+
+def solve_ik_batch(points):
+    """
+    여러 목표 좌표 (N, 3)(m)의 관절 각도를 한 번에 계산합니다.
+    (N, 5) 각도 배열(도)과 도달 가능 여부 (N,) 배열을 반환하며, 닿지 않는 행의 각도는 NaN입니다.
+    계산식은 그리퍼(D) 길이까지 포함한 기존 단일 좌표 풀이와 같습니다.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    x_m, y_m, z_m = points[:, 0], points[:, 1], points[:, 2]
+
+    # 1. J1: 베이스 수평 회전각
+    joint1 = np.degrees(np.arctan2(y_m, x_m))
+
+    # 2. 로봇 베이스(J2) 기준 목표 높이(z)와 수평 거리(r), 전체 도달 거리 검증
+    r_target = np.hypot(x_m, y_m)
+    z_target = z_m - BASE_HEIGHT
+    reachable = np.hypot(r_target, z_target) <= TOTAL_REACH
+
+    # 3. 그리퍼(D) 접근 각도(phi)와 손목 위치(J4)
+    phi_rad = np.arctan2(z_target, r_target)
+    r_wrist = r_target - LINK_D * np.cos(phi_rad)
+    z_wrist = z_target - LINK_D * np.sin(phi_rad)
+
+    # 4. L1, L2 구간에 대한 코사인 법칙 (손목까지 닿지 않거나 손목이 어깨와 겹치면 풀 수 없습니다)
+    dist_sq = r_wrist**2 + z_wrist**2
+    dist = np.sqrt(dist_sq)
+    reachable &= (dist <= LINK_L1 + LINK_L2) & (dist > 0)
+    safe_dist = np.where(dist > 0, dist, 1.0)
+
+    joint3_rad = np.arccos(np.clip((dist_sq - LINK_L1**2 - LINK_L2**2) / (2 * LINK_L1 * LINK_L2), -1, 1))
+    alpha = np.arctan2(z_wrist, r_wrist)
+    beta = np.arccos(np.clip((LINK_L1**2 + dist_sq - LINK_L2**2) / (2 * LINK_L1 * safe_dist), -1, 1))
+
+    # 90도 오프셋 보정 적용 (마마의 교시 준수)
+    j2_final = np.degrees(alpha + beta) - 90.0
+    j3_final = np.degrees(joint3_rad) - 90.0
+    # 말단 그리퍼가 목표를 향하도록 설정
+    j4_final = np.degrees(phi_rad) - (j2_final + 90.0) - (j3_final + 90.0)
+
+    angles = np.stack([joint1, j2_final, j3_final, j4_final, np.zeros_like(joint1)], axis=1)
+    angles[~reachable] = np.nan
+    return angles, reachable
+
+
+def angles_to_dict(angles):
+    """각도 한 행을 {'J1': ..., 'J5': ...} 형태(소수점 한 자리)로 바꿉니다. 닿지 않는 행이면 None입니다."""
+    if np.isnan(angles).any():
+        return None
+    return {name: round(float(value), 1) for name, value in zip(JOINT_NAMES, angles)}
+
+
+def solve_inverse_kinematics(x_m, y_m, z_m):
+    """
+    3차원 좌표를 5축 로봇의 관절 각도로 변환합니다.
+    그리퍼(D) 길이까지 포함하여 도달 가능 여부를 판단하며, 닿지 않으면 None을 반환합니다.
+    """
+    try:
+        angles, _ = solve_ik_batch([(x_m, y_m, z_m)])
+        return angles_to_dict(angles[0])
+    except Exception:
+        return None
+
+
+class ReachabilityMap:
+    """
+    팔 작업 공간을 복셀로 나누어 각 복셀 중심에 IK 해가 있는지 미리 계산해 둔 도달 가능 지도입니다.
+    팔 제원(LINK_L1, LINK_L2, LINK_D, BASE_HEIGHT)과 해상도가 같으면 디스크에 저장된 지도를 다시 씁니다.
+    조회는 좌표를 복셀 번호로 바꾸는 표 조회이므로 수천 개의 좌표도 한 번에 검사할 수 있습니다.
+    복셀 중심 하나로 판정하므로 작업 공간 경계의 복셀은 실제와 다를 수 있어,
+    이웃 복셀과 판정이 갈리는 경계 복셀에 떨어진 좌표는 solve_ik_batch로 다시 확인합니다.
+    """
+    def __init__(self, resolution=REACH_MAP_RESOLUTION, cache_dir=REACH_MAP_DIR):
+        self.resolution = resolution
+        # 베이스 중심에서 TOTAL_REACH 안쪽만 닿을 수 있으므로 그 범위를 덮는 정육면체만 만듭니다.
+        self.origin = np.array([-TOTAL_REACH, -TOTAL_REACH, BASE_HEIGHT - TOTAL_REACH])
+        self.shape = (int(np.ceil(2 * TOTAL_REACH / resolution)) + 1,) * 3
+        self.cache_path = os.path.join(cache_dir, f"arm_reach_map_{self.geometry_key()}.npy")
+        self.grid = self._load_or_build()
+        self.boundary = self._boundary(self.grid)
+
+    def geometry_key(self):
+        """팔 제원과 해상도로 만든 캐시 키입니다. 제원이 바뀌면 지도를 다시 계산합니다."""
+        geometry = f"{LINK_L1}:{LINK_L2}:{LINK_D}:{BASE_HEIGHT}:{self.resolution}"
+        return hashlib.sha1(geometry.encode()).hexdigest()[:12]
+
+    def _load_or_build(self):
+        """디스크의 지도를 불러오고, 없거나 손상되었으면 새로 계산하여 저장합니다."""
+        if os.path.exists(self.cache_path):
+            try:
+                grid = np.load(self.cache_path)
+                if grid.shape == self.shape and grid.dtype == np.bool_:
+                    return grid
+            except (OSError, ValueError) as e:
+                logger.warning(f"도달 가능 지도 캐시를 읽지 못해 다시 계산합니다: {e}")
+
+        axes = [self.origin[i] + np.arange(self.shape[i]) * self.resolution for i in range(3)]
+        centers = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3)
+        _, reachable = solve_ik_batch(centers)
+        grid = reachable.reshape(self.shape)
+        try:
+            # 다른 프로세스가 절반만 쓴 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체합니다.
+            temp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                np.save(f, grid)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"도달 가능 지도를 저장하지 못했습니다: {e}")
+        logger.info(f"Reachability map built: {self.shape} voxels, {grid.mean() * 100:.1f}% reachable")
+        return grid
+
+    @staticmethod
+    def _boundary(grid):
+        """주변 26개 복셀 중 판정이 다른 것이 있는 복셀(작업 공간 경계)을 표시합니다."""
+        padded = np.pad(grid, 1, mode='constant', constant_values=False)
+        any_reachable = np.zeros_like(grid)
+        all_reachable = np.ones_like(grid)
+        nx, ny, nz = grid.shape
+        for dx in range(3):
+            for dy in range(3):
+                for dz in range(3):
+                    neighbour = padded[dx:dx + nx, dy:dy + ny, dz:dz + nz]
+                    any_reachable |= neighbour
+                    all_reachable &= neighbour
+        return any_reachable & ~all_reachable
+
+    def contains(self, points):
+        """
+        좌표 (N, 3)(m) 각각이 도달 가능한지 (N,) 배열로 반환합니다. 지도 밖은 닿지 않습니다.
+        경계 복셀에 떨어진 좌표만 IK로 정확히 다시 풀고, 나머지는 지도 조회로 끝냅니다.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        index = np.rint((points - self.origin) / self.resolution).astype(np.intp)
+        inside = ((index >= 0) & (index < self.shape)).all(axis=1)
+        result = np.zeros(len(points), dtype=bool)
+        on_boundary = np.zeros(len(points), dtype=bool)
+        i, j, k = index[inside].T
+        result[inside] = self.grid[i, j, k]
+        on_boundary[inside] = self.boundary[i, j, k]
+        if on_boundary.any():
+            _, result[on_boundary] = solve_ik_batch(points[on_boundary])
+        return result
+
+    def is_reachable(self, x_m, y_m, z_m):
+        """좌표 하나가 도달 가능한지 확인합니다."""
+        return bool(self.contains([(x_m, y_m, z_m)])[0])
+
+
+_reach_map = None
+_reach_map_lock = threading.Lock()
+
+
+def get_reachability_map():
+    """프로세스 전체에서 공유하는 도달 가능 지도를 반환합니다. 처음 호출할 때 불러오거나 계산합니다."""
+    global _reach_map
+    with _reach_map_lock:
+        if _reach_map is None:
+            _reach_map = ReachabilityMap()
+        return _reach_map
@@ -0,0 +1,150 @@
+# code/tools/depth_codec.py
+
+import struct
+import zlib
+import cv2
+import numpy as np
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # lz4는 선택 설치 항목입니다.
+    lz4_frame = None
+
+# 이진 깊이 전송 형식의 Content-Type
+DEPTH_CONTENT_TYPE = "application/x-mach-depth"
+
+# 헤더: 매직, 버전, 인코딩, 압축, 예비, 높이, 너비, 스케일, 오프셋, 본문 길이 (리틀 엔디언)
+_HEADER = struct.Struct("<4sBBBBIIffI")
+HEADER_SIZE = _HEADER.size
+_MAGIC = b"MDEP"
+_VERSION = 1
+
+# 인코딩: 원본 float32 / 반정밀도 float16 / 프레임별 최소~최대 범위로 양자화한 uint16
+ENCODINGS = {'f32': (0, np.float32), 'f16': (1, np.float16), 'u16': (2, np.uint16)}
+COMPRESSIONS = {'none': 0, 'zlib': 1, 'lz4': 2}
+_ENCODING_BY_CODE = {code: (name, dtype) for name, (code, dtype) in ENCODINGS.items()}
+_COMPRESSION_BY_CODE = {code: name for name, code in COMPRESSIONS.items()}
+
+
+def available_compressions():
+    """현재 환경에서 사용할 수 있는 압축 방식 목록을 반환합니다."""
+    return [name for name in COMPRESSIONS if name != 'lz4' or lz4_frame is not None]
+
+
+def encode_depth(depth, encoding="u16", compression="none", zlib_level=1):
+    """
+    깊이 배열(H, W)을 헤더 + 본문으로 된 이진 데이터로 인코딩합니다.
+    u16은 프레임의 최솟값~최댓값 범위를 65535단계로 나누므로, 값이 1 근처에 몰린
+    파이불렛 깊이 버퍼에서도 f16보다 훨씬 정밀합니다.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown depth encoding: {encoding}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown depth compression: {compression}")
+    if compression == 'lz4' and lz4_frame is None:
+        raise RuntimeError("lz4 compression requested but the lz4 package is not installed")
+
+    depth = np.asarray(depth, dtype=np.float32)
+    height, width = depth.shape
+    code, dtype = ENCODINGS[encoding]
+    scale, offset = 1.0, 0.0
+    if encoding == 'u16':
+        offset = float(depth.min())
+        scale = (float(depth.max()) - offset) / 65535 or 1.0
+        values = np.rint((depth - offset) / scale).astype(np.uint16)
+    else:
+        values = depth.astype(dtype, copy=False)
+
+    payload = values.tobytes()
+    if compression == 'zlib':
+        payload = zlib.compress(payload, zlib_level)
+    elif compression == 'lz4':
+        payload = lz4_frame.compress(payload)
+
+    header = _HEADER.pack(_MAGIC, _VERSION, code, COMPRESSIONS[compression], 0,
+                          height, width, scale, offset, len(payload))
+    return header + payload
+
+
+def decode_depth(data):
+    """
+    encode_depth로 만든 이진 데이터를 float32 깊이 배열(H, W)로 복원합니다.
+    압축하지 않은 f32는 np.frombuffer로 받은 버퍼를 그대로 쓰므로 복사가 없습니다. (읽기 전용 배열)
+    """
+    magic, version, code, compression, _, height, width, scale, offset, length = _HEADER.unpack_from(data)
+    data = memoryview(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"Not a depth frame (magic={magic!r}, version={version})")
+    if code not in _ENCODING_BY_CODE or compression not in _COMPRESSION_BY_CODE:
+        raise ValueError(f"Unsupported depth frame (encoding={code}, compression={compression})")
+
+    encoding, dtype = _ENCODING_BY_CODE[code]
+    payload = data[HEADER_SIZE:HEADER_SIZE + length]
+    if _COMPRESSION_BY_CODE[compression] == 'zlib':
+        payload = zlib.decompress(payload)
+    elif _COMPRESSION_BY_CODE[compression] == 'lz4':
+        if lz4_frame is None:
+            raise RuntimeError("Received an lz4 depth frame but the lz4 package is not installed")
+        payload = lz4_frame.decompress(payload)
+
+    values = np.frombuffer(payload, dtype=dtype, count=height * width).reshape(height, width)
+    if encoding == 'f32':
+        return values
+    if encoding == 'f16':
+        return values.astype(np.float32)
+    depth = values.astype(np.float32)
+    depth *= np.float32(scale)
+    depth += np.float32(offset)
+    return depth
+
+
+# --- 컬러 + 깊이 + 시뮬레이션 스텝을 한 번에 담는 프레임 형식 (/frame) ---
+
+FRAME_CONTENT_TYPE = "application/x-mach-frame"
+# /stream 응답: [4바이트 길이(리틀 엔디언) + 프레임 데이터]가 끝없이 이어지는 청크 스트림
+STREAM_CONTENT_TYPE = "application/x-mach-frame-stream"
+STREAM_LENGTH = struct.Struct("<I")
+
+# 헤더: 매직, 버전, 이미지 형식, 예비, 스텝, 높이, 너비, 이미지 길이, 깊이 길이 (리틀 엔디언)
+_FRAME_HEADER = struct.Struct("<4sBBHQIIII")
+FRAME_HEADER_SIZE = _FRAME_HEADER.size
+_FRAME_MAGIC = b"MFRM"
+# 이미지 형식: JPEG 또는 압축하지 않은 BGR 원본 (같은 PC에서는 디코딩 비용이 없는 raw가 유리)
+IMAGE_FORMATS = {'jpeg': 0, 'raw': 1}
+_IMAGE_FORMAT_BY_CODE = {code: name for name, code in IMAGE_FORMATS.items()}
+
+
+def encode_frame(color_image, depth, step, image_format="jpeg", jpeg_quality=90, **depth_options):
+    """같은 시뮬레이션 스텝의 컬러 이미지와 깊이 배열을 하나의 이진 응답으로 묶습니다."""
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image format: {image_format}")
+    if image_format == 'jpeg':
+        _, encoded = cv2.imencode(".jpg", color_image, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        image_bytes = encoded.tobytes()
+    else:
+        image_bytes = np.ascontiguousarray(color_image, dtype=np.uint8).tobytes()
+    depth_bytes = encode_depth(depth, **depth_options)
+
+    height, width = color_image.shape[:2]
+    header = _FRAME_HEADER.pack(_FRAME_MAGIC, _VERSION, IMAGE_FORMATS[image_format], 0, step,
+                                height, width, len(image_bytes), len(depth_bytes))
+    return b"".join((header, image_bytes, depth_bytes))
+
+
+def decode_frame(data):
+    """encode_frame으로 묶은 데이터를 (컬러 이미지, 깊이 배열, 스텝)으로 복원합니다."""
+    magic, version, image_code, _, step, height, width, image_length, depth_length = _FRAME_HEADER.unpack_from(data)
+    if magic != _FRAME_MAGIC or version != _VERSION:
+        raise ValueError(f"Not a frame (magic={magic!r}, version={version})")
+    if image_code not in _IMAGE_FORMAT_BY_CODE:
+        raise ValueError(f"Unsupported image format code: {image_code}")
+
+    view = memoryview(data)
+    image_bytes = view[FRAME_HEADER_SIZE:FRAME_HEADER_SIZE + image_length]
+    depth_start = FRAME_HEADER_SIZE + image_length
+    if _IMAGE_FORMAT_BY_CODE[image_code] == 'jpeg':
+        color_image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    else:
+        color_image = np.frombuffer(image_bytes, np.uint8).reshape(height, width, 3)
+    depth = decode_depth(view[depth_start:depth_start + depth_length])
+    return color_image, depth, step
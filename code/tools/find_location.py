@@ -1,3 +1,4 @@
+import re
 import streamlit as st
 from langchain_core.tools import tool
 from logger import get_logger
@@ -11,6 +12,7 @@ def find_location(target: str) -> str:
     
     Args:
         target: 찾을 객체명 (예: "cup", "person", "bottle")
+                특정 물체를 지정하려면 추적 번호를 붙입니다 (예: "cup#3")
     
     Returns:
         객체의 좌표 (x, y, z) 또는 "찾을 수 없음"
@@ -18,30 +20,46 @@ def find_location(target: str) -> str:
     try:
         logger.info(f"find_location 호출: {target}")
         
-        if "last_coordinates" not in st.session_state:
+        # 엔진이 관리하는 최신 탐지 결과를 우선 사용합니다.
+        engine = st.session_state.get("engine")
+        if engine is not None:
+            coordinates = engine.get_snapshot(fresh=True).coordinates
+        elif "last_coordinates" in st.session_state:
+            coordinates = st.session_state.last_coordinates
+        else:
             logger.warning("좌표 정보 없음")
             return f"{target}을(를) 찾을 수 없습니다."
         
-        coordinates = st.session_state.last_coordinates
-        
         if not coordinates:
             return f"{target}을(를) 찾을 수 없습니다."
         
-        target_lower = target.lower()
+        # "cup#3" 형태이면 이름과 추적 번호를 분리합니다.
+        id_match = re.match(r'^(.*?)\s*#\s*(\d+)\s*$', target.strip())
+        target_name = (id_match.group(1) if id_match else target).strip().lower()
+        target_id = int(id_match.group(2)) if id_match else None
+        
+        matches = [
+            coord for coord in coordinates
+            if coord['name'].lower() == target_name
+            and (target_id is None or coord.get('id') == target_id)
+        ]
         
-        for coord in coordinates:
-            if coord['name'].lower() == target_lower:
-                # 단위를 mm에서 cm로 변경하여 위치 정보를 반환합니다.
-                result = (
-                    f"{target}의 위치: "
-                    f"X={coord['x']}, Y={coord['y']}, Z={coord['z']}cm"
-                )
-                logger.info(result)
-                return result
+        if matches:
+            # 같은 종류의 물체가 여럿이면 추적 번호와 함께 모두 보고합니다.
+            lines = []
+            for coord in matches:
+                label = f"{coord['name']}#{coord['id']}" if 'id' in coord else target
+                lines.append(f"{label}의 위치: X={coord['x']}, Y={coord['y']}, Z={coord['z']}cm")
+            result = "\n".join(lines)
+            logger.info(result)
+            return result
         
         logger.info(f"{target}을(를) 찾을 수 없음")
         return f"{target}을(를) 찾을 수 없습니다."
         
     except Exception as e:
         logger.error(f"find_location 오류: {e}")
-        return f"오류 발생: {str(e)}"
\ No newline at end of file
+        return f"오류 발생: {str(e)}"
+
+# 최신 비전 스냅샷의 좌표를 읽기만 합니다.
+find_location.metadata = {"parallel_safe": True, "live_state": True}
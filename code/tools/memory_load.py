@@ -50,4 +50,7 @@ def memory_load(query: str) -> str:
         
     except Exception as e:
         logger.error(f"memory_load 오류: {e}")
-        return f"❌ 기억 조회 중 오류가 발생했습니다: {str(e)}"
\ No newline at end of file
+        return f"❌ 기억 조회 중 오류가 발생했습니다: {str(e)}"
+
+# FalkorDB를 읽기만 하며, 결과는 저장된 기억에 따라 달라집니다.
+memory_load.metadata = {"parallel_safe": True, "live_state": True}
@@ -1,15 +1,272 @@
+import random
+import threading
+import time
+from collections import deque
 import requests
+from requests.adapters import HTTPAdapter
 import numpy as np
 import cv2
+from depth_codec import DEPTH_CONTENT_TYPE, FRAME_CONTENT_TYPE, STREAM_LENGTH, decode_depth, decode_frame
+
+
+class LatencyStats:
+    """
+    엔드포인트별 요청 왕복 시간과 실패 횟수를 최근 구간 기준으로 집계합니다.
+    """
+    def __init__(self, window=100):
+        self._lock = threading.Lock()
+        self._window = window
+        self._latencies = {}
+        self._counts = {}
+        self._errors = {}
+
+    def record(self, endpoint, latency_s=None):
+        """요청 한 번의 결과를 기록합니다. latency_s가 None이면 실패로 셉니다."""
+        with self._lock:
+            if latency_s is None:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+                return
+            self._latencies.setdefault(endpoint, deque(maxlen=self._window)).append(latency_s)
+            self._counts[endpoint] = self._counts.get(endpoint, 0) + 1
+
+    def snapshot(self):
+        """엔드포인트별 평균/p95/최근 지연 시간(ms)과 요청·실패 횟수를 반환합니다."""
+        with self._lock:
+            report = {}
+            for endpoint in set(self._latencies) | set(self._errors):
+                latencies = np.asarray(self._latencies.get(endpoint, ()), dtype=np.float64) * 1000
+                report[endpoint] = {
+                    'mean_ms': round(float(latencies.mean()), 2) if len(latencies) else 0.0,
+                    'p95_ms': round(float(np.percentile(latencies, 95)), 2) if len(latencies) else 0.0,
+                    'last_ms': round(float(latencies[-1]), 2) if len(latencies) else 0.0,
+                    'count': self._counts.get(endpoint, 0),
+                    'errors': self._errors.get(endpoint, 0),
+                }
+            return report
+
+
+class FrameStream:
+    """
+    연무장 서버의 /stream에 오래 유지되는 연결을 열어, 서버가 렌더링할 때마다 밀어 주는 프레임을 받습니다.
+    수신 스레드는 가장 최근 프레임의 원본 바이트만 한 칸에 보관하고(읽지 않은 이전 프레임은 버림),
+    디코딩은 read()를 호출한 쪽에서 필요한 프레임에 대해서만 수행합니다.
+    연결이 끊기면 지수 백오프(min_backoff ~ max_backoff, 약간의 무작위 지연 포함)로 다시 연결합니다.
+    """
+    def __init__(self, url, params=None, connect_timeout=2.0, read_timeout=5.0,
+                 min_backoff=0.5, max_backoff=8.0):
+        self.url = url
+        self.params = dict(params or {})
+        self.timeout = (connect_timeout, read_timeout)
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        self._condition = threading.Condition()
+        self._payload = None
+        self._payload_seq = 0
+        self._consumed_seq = 0
+        self._response = None
+        self.is_running = False
+        self.connected = False
+        self.supported = True
+        self._thread = None
+
+        # 통계
+        self.received = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self._arrivals = deque(maxlen=60)
+
+    def start(self):
+        """수신 스레드를 시작합니다."""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._thread = threading.Thread(target=self._receive_loop, name="sim-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """수신을 멈추고 열린 연결을 닫습니다."""
+        self.is_running = False
+        response = self._response
+        if response is not None:
+            response.close()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def read(self, timeout=1.0):
+        """
+        아직 읽지 않은 가장 최근 프레임을 (컬러, 깊이, 스텝)으로 반환합니다.
+        새 프레임이 timeout초 안에 오지 않으면 (None, None, None)을 반환합니다.
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                    lambda: self._payload_seq > self._consumed_seq or not self.is_running, timeout):
+                return None, None, None
+            if self._payload_seq <= self._consumed_seq:
+                return None, None, None
+            payload, self._consumed_seq = self._payload, self._payload_seq
+        return decode_frame(payload)
+
+    def stats(self):
+        """수신 프레임 수, 버린 프레임 수, 재연결 횟수, 수신 fps를 반환합니다."""
+        with self._condition:
+            arrivals = list(self._arrivals)
+        fps = 0.0
+        if len(arrivals) > 1 and arrivals[-1] > arrivals[0]:
+            fps = (len(arrivals) - 1) / (arrivals[-1] - arrivals[0])
+        return {
+            'connected': self.connected, 'fps': round(fps, 1), 'received': self.received,
+            'dropped': self.dropped, 'reconnects': self.reconnects,
+        }
+
+    def _read_exact(self, raw, size):
+        """청크 경계와 관계없이 정확히 size바이트를 읽습니다. 연결이 끝나면 ConnectionError를 올립니다."""
+        chunks, remaining = [], size
+        while remaining:
+            chunk = raw.read(remaining)
+            if not chunk:
+                raise ConnectionError("Stream closed by server")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+    def _receive_loop(self):
+        """[수신 스레드] 연결을 유지하며 프레임을 받아 최신 칸에 넣고, 끊기면 백오프 후 재연결합니다."""
+        backoff = self.min_backoff
+        while self.is_running:
+            try:
+                with self.session.get(self.url, params=self.params, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 404:
+                        print("연무장 서버가 /stream을 지원하지 않습니다. 요청 방식으로 동작합니다.")
+                        self.supported = False
+                        break
+                    response.raise_for_status()
+                    self._response = response
+                    self.connected = True
+                    backoff = self.min_backoff
+                    while self.is_running:
+                        (length,) = STREAM_LENGTH.unpack(self._read_exact(response.raw, STREAM_LENGTH.size))
+                        payload = self._read_exact(response.raw, length)
+                        with self._condition:
+                            if self._payload_seq > self._consumed_seq:
+                                self.dropped += 1
+                            self._payload = payload
+                            self._payload_seq += 1
+                            self.received += 1
+                            self._arrivals.append(time.perf_counter())
+                            self._condition.notify_all()
+            except Exception as e:
+                if self.is_running:
+                    print(f"프레임 스트림 연결 끊김: {e}")
+            finally:
+                self._response = None
+                self.connected = False
+
+            if self.is_running:
+                self.reconnects += 1
+                time.sleep(backoff * random.uniform(1.0, 1.5))
+                backoff = min(backoff * 2, self.max_backoff)
+
+        self.is_running = False
+        with self._condition:
+            self._condition.notify_all()
+
 
 class PyBulletServer:
     """
     본진(MACH_SEVEN)에서 연무장 서버(Flask)와 통신을 담당하는 전령 클래스입니다.
     데이터 수신 및 로봇 제어 명령 전달을 전담합니다.
+    모든 요청은 연결을 재사용하는 requests.Session 하나로 보내며, 엔드포인트별 지연 시간을 기록합니다.
     """
-    def __init__(self, ip="127.0.0.1", port=5000):
+    def __init__(self, ip="127.0.0.1", port=5000, depth_encoding="u16", depth_compression="none",
+                 image_format="jpeg", pool_size=4):
         # 서버 접속을 위한 기본 주소를 설정합니다.
         self.base_url = f"http://{ip}:{port}"
+        # 깊이 데이터는 이진 형식(depth_codec)으로 요청하고, 서버가 지원하지 않으면 JSON으로 받습니다.
+        self.depth_params = {"encoding": depth_encoding, "compression": depth_compression}
+        self.depth_headers = {"Accept": f"{DEPTH_CONTENT_TYPE}, application/json;q=0.5"}
+        self.frame_params = dict(self.depth_params, image=image_format)
+
+        # 비전 수집 스레드와 에이전트 도구가 함께 쓰므로 연결 풀을 여러 개 둡니다.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.latency = LatencyStats()
+        # /frame을 지원하지 않는 예전 서버라면 /image, /depth 두 번 요청으로 대신합니다.
+        self.frame_supported = True
+        self.last_step = None
+        # start_stream()으로 켜는 푸시 방식 수신기 (켜져 있으면 get_frame이 요청 대신 사용)
+        self.stream = None
+
+    def _request(self, method, endpoint, **kwargs):
+        """세션으로 요청을 보내고 왕복 시간을 기록합니다. 실패 시 예외를 그대로 올립니다."""
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.base_url}{endpoint}", **kwargs)
+        except Exception:
+            self.latency.record(endpoint)
+            raise
+        self.latency.record(endpoint, time.perf_counter() - started)
+        return response
+
+    def stats(self):
+        """엔드포인트별 지연 시간 통계를 반환합니다."""
+        return self.latency.snapshot()
+
+    def start_stream(self, fps=None):
+        """
+        /stream 푸시 수신을 시작합니다. 이후 get_frame()은 서버가 밀어 준 최신 프레임을 기다려 반환합니다.
+        fps를 지정하면 서버에 그 주기로만 보내 달라고 요청합니다.
+        """
+        if self.stream is None:
+            params = dict(self.frame_params, **({"fps": fps} if fps else {}))
+            self.stream = FrameStream(f"{self.base_url}/stream", params=params)
+        self.stream.start()
+        return self.stream
+
+    def stop_stream(self):
+        """푸시 수신을 멈추고 요청 방식으로 돌아갑니다."""
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream = None
+
+    def get_frame(self, timeout=1.0):
+        """
+        같은 시뮬레이션 스텝의 컬러 이미지, 깊이 배열, 스텝 번호를 한 번의 요청(/frame)으로 가져옵니다.
+        스트림이 켜져 있으면 요청하지 않고, 아직 읽지 않은 최신 푸시 프레임을 최대 timeout초 기다립니다.
+        서버가 /frame을 지원하지 않으면 /image와 /depth를 차례로 요청하며, 이때 스텝 번호는 None입니다.
+        실패 시 (None, None, None)을 반환합니다.
+        """
+        if self.stream is not None and self.stream.supported:
+            try:
+                color_image, depth_data, step = self.stream.read(timeout=timeout)
+            except Exception as e:
+                print(f"스트림 프레임 복원 실패: {e}")
+                return None, None, None
+            if step is not None:
+                self.last_step = step
+            return color_image, depth_data, step
+
+        if self.frame_supported:
+            try:
+                r = self._request("GET", "/frame", params=self.frame_params, timeout=timeout)
+                if r.status_code == 200 and r.headers.get("Content-Type", "").startswith(FRAME_CONTENT_TYPE):
+                    color_image, depth_data, step = decode_frame(r.content)
+                    self.last_step = step
+                    return color_image, depth_data, step
+                if r.status_code == 404:
+                    print("연무장 서버가 /frame을 지원하지 않아 /image, /depth를 따로 요청합니다.")
+                    self.frame_supported = False
+                else:
+                    return None, None, None
+            except Exception as e:
+                print(f"프레임 수신 실패: {e}")
+                return None, None, None
+
+        return self.get_rgb_image(), self.get_depth_data(), None
 
     def get_rgb_image(self):
         """
@@ -18,7 +275,7 @@ class PyBulletServer:
         """
         try:
             # 서버의 /image 엔드포인트에 그림 데이터를 요청합니다.
-            r = requests.get(f"{self.base_url}/image", timeout=1)
+            r = self._request("GET", "/image", timeout=1)
             if r.status_code == 200:
                 # 받은 바이트 데이터를 숫자 배열(numpy)로 바꾼 뒤 이미지로 복원합니다.
                 img_array = np.frombuffer(r.content, np.uint8)
@@ -31,25 +288,29 @@ class PyBulletServer:
         """
         연무장 서버로부터 깊이 정보(Depth Map)를 가져옵니다.
         물체와의 거리를 계산하기 위해 숫자 배열 형태로 반환합니다.
+        서버가 이진 형식으로 응답하면 np.frombuffer로 바로 복원하고, 예전 서버처럼 JSON으로 응답하면 그대로 변환합니다.
         """
         try:
             # 서버의 /depth 엔드포인트에 깊이 데이터를 요청합니다.
-            r = requests.get(f"{self.base_url}/depth", timeout=1)
+            r = self._request("GET", "/depth", params=self.depth_params,
+                              headers=self.depth_headers, timeout=1)
             if r.status_code == 200:
+                if r.headers.get("Content-Type", "").startswith(DEPTH_CONTENT_TYPE):
+                    return decode_depth(r.content)
                 # JSON 형태의 데이터를 받아 실수형(float32) 숫자 배열로 변환합니다.
                 return np.array(r.json(), dtype=np.float32)
         except Exception as e:
             print(f"깊이 데이터 수신 실패: {e}")
         return None
 
-    def move_arm(self, position):
+    def move_arm(self, position, timeout=1):
         """
         로봇팔 끝단(End-Effector)을 목표 좌표 [x, y, z]로 이동시킵니다.
         단위는 미터(m)를 사용합니다.
         """
         try:
             # 목표 좌표를 JSON 형식으로 담아 서버에 전송합니다.
-            r = requests.post(f"{self.base_url}/set_pos", json={"pos": position}, timeout=1)
+            r = self._request("POST", "/set_pos", json={"pos": position}, timeout=timeout)
             return r.json().get("ok", False)
         except Exception as e:
             print(f"이동 명령 실패: {e}")
@@ -60,7 +321,7 @@ class PyBulletServer:
         현재 로봇팔 끝단의 실제 좌표(x, y, z)를 서버로부터 가져옵니다.
         """
         try:
-            r = requests.get(f"{self.base_url}/ee", timeout=1)
+            r = self._request("GET", "/ee", timeout=1)
             return r.json()
         except Exception as e:
             print(f"좌표 확인 실패: {e}")
@@ -72,8 +333,24 @@ class PyBulletServer:
         """
         try:
             body = {"object": name, "op": op}
-            r = requests.post(f"{self.base_url}/set_object", json=body, timeout=1)
+            r = self._request("POST", "/set_object", json=body, timeout=1)
             return r.json().get("ok", False)
         except Exception as e:
             print(f"물체 제어 실패: {e}")
-            return False
\ No newline at end of file
+            return False
+
+
+_shared_servers = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_server(ip="127.0.0.1", port=5000):
+    """
+    같은 주소의 연무장 서버에 대해 프로세스 전체가 공유하는 PyBulletServer를 반환합니다.
+    비전 수집, 시뮬레이터, robot_action이 하나의 연결 풀과 지연 시간 통계를 함께 씁니다.
+    """
+    with _shared_lock:
+        server = _shared_servers.get((ip, port))
+        if server is None:
+            server = _shared_servers[(ip, port)] = PyBulletServer(ip, port)
+        return server
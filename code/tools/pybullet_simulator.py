@@ -1,36 +1,38 @@
 import numpy as np
 import cv2
-from ultralytics import YOLO
-from pybullet_server import PyBulletServer
+import os
+import sys
+from pybullet_server import get_shared_server
+
+# 비전 시스템과 같은 탐지 백엔드를 쓰기 위해 code 폴더를 경로에 추가합니다.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from detector import YoloDetector
+from sim_camera import SimCameraModel
 
 class PyBulletSimulator:
     """
     YOLOv11 탐지 기능과 시뮬레이터 제어 기능을 결합한 통합 지휘관 클래스입니다.
     모든 거리와 좌표는 사용자 편의를 위해 cm 단위로 처리합니다.
     """
-    def __init__(self, model_path="yolo11n.pt"):
-        # 1. YOLOv11 모델을 불러와 지능을 장착합니다.
-        self.model = YOLO(model_path)
-        # 2. 연무장과 통신할 전령(Server)을 소환합니다.
-        self.server = PyBulletServer()
+    def __init__(self, model_path="yolo11n.pt", backend="torch", detector_options=None, camera=None):
+        # 1. YOLOv11 모델을 불러와 지능을 장착합니다. (VisionSystem과 같은 백엔드 사용)
+        self.model = YoloDetector(model_path, backend=backend, **(detector_options or {}))
+        # 2. 연무장과 통신할 전령(Server)을 소환합니다. (비전 시스템과 연결 풀을 공유)
+        self.server = get_shared_server()
         
-        # 카메라 투영 설정 (server.py의 설정값과 일치해야 정확합니다)
-        self.near = 0.01
-        self.far = 10.0
-        self.width = 600
-        self.height = 480
+        # 카메라 투영 모델 (VisionSystem과 같은 계산식을 공유하며, server.py의 설정값과 일치해야 정확합니다)
+        self.camera = camera or SimCameraModel()
 
-    def calculate_real_coords(self, px, py, depth_val):
+    def calculate_real_coords(self, px, py, depth_val, shape=None):
         """
         화면의 픽셀 좌표와 깊이 값을 실제 세계의 cm 좌표로 변환합니다.
+        시뮬레이션 환경의 카메라 위치와 각도에 따라 보정이 필요할 수 있습니다.
         """
-        # 깊이 값(0~1)을 실제 거리(m)로 변환하는 공식입니다.
-        z_m = self.far * self.near / (self.far - (self.far - self.near) * depth_val)
-        
-        # 카메라 시야각을 고려하여 X, Y 좌표를 계산합니다.
-        # 시뮬레이션 환경의 카메라 위치와 각도에 따라 보정이 필요할 수 있습니다.
-        x_m = (px - self.width / 2) * (z_m / self.width)
-        y_m = (py - self.height / 2) * (z_m / self.height)
+        x_m, y_m, z_m = self.camera.pixel_to_point(px, py, depth_val, shape)
         
         # m 단위를 cm 단위로 변환하여 반환합니다.
         return round(x_m * 100, 2), round(y_m * 100, 2), round(z_m * 100, 2)
@@ -39,29 +41,34 @@ class PyBulletSimulator:
         """
         현재 연무장을 살펴보고 탐지된 물체의 좌표를 cm 단위로 보고합니다.
         """
-        # 전령을 통해 현재 화면과 깊이 지도를 가져옵니다.
-        rgb_img = self.server.get_rgb_image()
-        depth_map = self.server.get_depth_data()
+        # 전령을 통해 같은 스텝의 화면과 깊이 지도를 한 번에 가져옵니다.
+        rgb_img, depth_map, _ = self.server.get_frame()
         
         if rgb_img is None or depth_map is None:
             print("연무장에서 데이터를 가져오는 데 실패했습니다.")
             return []
 
         # YOLO 모델로 물체를 탐지합니다.
-        results = self.model.predict(rgb_img, conf=0.5, verbose=False)
+        results = self.model(rgb_img, conf=0.5)
         found_objects = []
 
         for result in results:
-            for box in result.boxes:
-                # 탐지된 상자의 중앙 좌표를 구합니다.
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                cx, cy = int((x1 + x2) / 2), int((y1 + y2) / 2)
-                
-                # 중앙점의 깊이 값을 읽어 실제 cm 좌표로 변환합니다.
-                d_val = depth_map[cy][cx]
-                x_cm, y_cm, z_cm = self.calculate_real_coords(cx, cy, d_val)
-                label = result.names[int(box.cls[0])]
-                
+            if len(result.boxes) == 0:
+                continue
+            # 탐지된 모든 상자의 중앙 좌표를 한 번에 구합니다.
+            boxes_xyxy = result.boxes.xyxy.cpu().numpy()
+            centers = ((boxes_xyxy[:, :2] + boxes_xyxy[:, 2:]) / 2).astype(np.int32)
+            np.clip(centers[:, 0], 0, depth_map.shape[1] - 1, out=centers[:, 0])
+            np.clip(centers[:, 1], 0, depth_map.shape[0] - 1, out=centers[:, 1])
+
+            # 중앙점들의 깊이 값을 읽어 한 번의 연산으로 실제 cm 좌표로 변환합니다.
+            depth_values = depth_map[centers[:, 1], centers[:, 0]]
+            points_cm = np.round(self.camera.points_at(centers[:, 0], centers[:, 1], depth_values,
+                                                       depth_map.shape) * 100, 2)
+            class_ids = result.boxes.cls.cpu().numpy().astype(int).tolist()
+
+            for class_id, (x_cm, y_cm, z_cm) in zip(class_ids, points_cm.tolist()):
+                label = result.names[class_id]
                 # 마마의 명대로 (x, y, z) 형식으로 보고합니다.
                 print(f"({x_cm}, {y_cm}, {z_cm} cm) 위치에 {label} 이(가) 있사옵니다.")
                 found_objects.append({"name": label, "pos": [x_cm, y_cm, z_cm]})
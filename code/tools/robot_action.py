@@ -1,20 +1,53 @@
+import os
 import streamlit as st
-import requests
 from langchain_core.tools import tool
 from logger import get_logger
+from pybullet_server import get_shared_server
+from robot_dispatcher import get_shared_dispatcher, TASK_FAILED, TASK_REJECTED
 
 # 도구 로그 기록을 위한 로거 설정
 logger = get_logger('TOOLS')
 
-# [원격 로봇 서버 설정 - 기존 유지]
-ROBOT_IP = "100.127.161.127" 
-ROBOT_SERVER_URL = f"http://{ROBOT_IP}:8000/robot/action"
+# [원격 로봇 서버 설정 - 기존 유지] (MACH_ROBOT_SERVER=ip:port 로 바꿀 수 있음, 예: 로컬 대역 서버)
+ROBOT_SERVER = os.environ.get("MACH_ROBOT_SERVER", "100.127.161.127:8000")
+ROBOT_SERVER_URL = f"http://{ROBOT_SERVER}/robot/action"
+# 서버 작업 번호로 완료 여부를 조회하는 주소 (지원하지 않는 서버면 접수 응답을 완료로 간주)
+ROBOT_STATUS_URL = f"http://{ROBOT_SERVER}/robot/task/{{task_id}}"
 
 # [파이불렛 시뮬레이션 서버 설정 - 추가]
-SIM_SERVER_URL = "http://localhost:5000/set_pos"
+SIM_SERVER_IP, SIM_SERVER_PORT = "127.0.0.1", 5000
+
+def notify_arm_moved(task=None):
+    """
+    엔진에 팔 이동을 알려 다음 프레임의 YOLO 추론을 강제합니다.
+    task를 주면 그 작업이 끝난 뒤(팔이 실제로 움직인 뒤)에 알립니다. 그 전의 프레임은 이동 전 모습이기 때문입니다.
+    """
+    engine = st.session_state.get("engine")
+    if engine is None:
+        return
+    if task is None:
+        engine.notify_arm_moved()
+        return
+
+    def on_done(finished):
+        # 보내지도 못한(대체/거절된) 명령은 팔을 움직이지 않았습니다.
+        if finished.sent_at is not None:
+            engine.notify_arm_moved()
+    task.add_done_callback(on_done)
+
+def send_robot_command(command, target_mm=None, wait=True, timeout=None):
+    """
+    실제 라즈베리 파이 서버로 가는 명령을 공용 디스패처에 제출하고 RobotTask를 반환합니다.
+    target_mm은 (x, y, z) 목표 좌표(mm)이며, wait가 False이면 대기열에 넣자마자 반환합니다.
+    """
+    dispatcher = get_shared_dispatcher(ROBOT_SERVER_URL, status_url=ROBOT_STATUS_URL)
+    if not wait:
+        return dispatcher.submit(command, target_mm)
+    return dispatcher.send(command, target_mm, timeout=timeout)
 
 @tool
-def robot_action(command: str, target_x_mm: float = None, target_y_mm: float = None, target_z_mm: float = None) -> str:
+def robot_action(command: str, target_x_mm: float = None, target_y_mm: float = None, target_z_mm: float = None,
+                 wait: bool = True) -> str:
     """
     로봇 팔에 동작 명령을 내립니다. 
     시뮬레이터 모드인 경우 파이불렛으로, 아닌 경우 실제 로봇 서버로 전송합니다.
@@ -24,6 +57,7 @@ def robot_action(command: str, target_x_mm: float = None, target_y_mm: float = N
         target_x_mm: 목표 X 좌표 (mm)
         target_y_mm: 목표 Y 좌표 (mm)
         target_z_mm: 목표 Z 좌표 (mm)
+        wait: False이면 명령을 대기열에 넣고 바로 작업 번호를 반환합니다. (robot_task_status로 확인)
     """
     try:
         # 조종판의 시뮬레이터 모드 활성화 여부를 확인합니다.
@@ -37,37 +71,41 @@ def robot_action(command: str, target_x_mm: float = None, target_y_mm: float = N
             if target_x_mm is not None:
                 # 파이불렛 서버는 미터(m) 단위를 사용하므로 mm를 m로 변환합니다.
                 pos_m = [target_x_mm / 1000, target_y_mm / 1000, target_z_mm / 1000]
-                payload = {"pos": pos_m}
                 
-                # 파이불렛 전령에게 명령을 전달합니다.
-                response = requests.post(SIM_SERVER_URL, json=payload, timeout=2)
-                
-                if response.status_code == 200:
+                # 비전 시스템과 연결 풀을 공유하는 파이불렛 전령에게 명령을 전달합니다.
+                server = get_shared_server(SIM_SERVER_IP, SIM_SERVER_PORT)
+                if server.move_arm(pos_m, timeout=2):
+                    notify_arm_moved()
                     return f"✅ [파이불렛] 팔이 목표 좌표 {pos_m}m 로 이동하였나이다."
                 else:
-                    return f"❌ 파이불렛 서버 응답 실패 (코드: {response.status_code})"
+                    return "❌ 파이불렛 서버 응답 실패"
             return "✅ 파이불렛 모드에서 명령을 수신했으나 좌표가 없사옵니다."
 
         # --- [기존 로직 유지] 실제 라즈베리 파이 서버 로직 ---
-        payload = {
-            "command": command,
-            "target": {
-                "x": target_x_mm,
-                "y": target_y_mm,
-                "z": target_z_mm
-            } if target_x_mm is not None else None,
-            "speed": 50
-        }
-
-        response = requests.post(ROBOT_SERVER_URL, json=payload, timeout=5)
+        target_mm = (target_x_mm, target_y_mm, target_z_mm) if target_x_mm is not None else None
+        task = send_robot_command(command, target_mm, wait=wait)
         
-        if response.status_code == 200:
-            result = response.json()
-            msg = result.get("message", "명령이 전달되었습니다.")
-            return f"✅ 팔(라즈베리 파이)이 응답하였나이다: {msg} (ID: {result.get('task_id')})"
-        else:
-            return f"❌ 팔과의 통신에 실패하였나이다. (코드: {response.status_code})"
+        if task.status in (TASK_FAILED, TASK_REJECTED):
+            return f"❌ 팔과의 통신에 실패하였나이다. {task.describe()}"
+        notify_arm_moved(task)
+        if not task.done:
+            return f"✅ 명령을 팔(라즈베리 파이)에 맡겼나이다. {task.describe()}"
+        return f"✅ 팔(라즈베리 파이)이 응답하였나이다: {task.describe()}"
             
     except Exception as e:
         logger.error(f"robot_action 통신 오류: {e}")
-        return f"송구하오나 마마, 팔과 연결이 닿지 않사옵니다: {str(e)}"
\ No newline at end of file
+        return f"송구하오나 마마, 팔과 연결이 닿지 않사옵니다: {str(e)}"
+
+# 팔을 움직이며, 결과는 팔(서버)의 실제 응답입니다.
+robot_action.metadata = {"live_state": True}
+
+@tool
+def robot_task_status(task_id: str) -> str:
+    """robot_action이 돌려준 작업 번호(예: 'r12')로 로봇 팔 명령의 진행 상태를 확인합니다."""
+    task = get_shared_dispatcher(ROBOT_SERVER_URL, status_url=ROBOT_STATUS_URL).get_task(task_id.strip())
+    if task is None:
+        return f"작업 {task_id}을(를) 찾지 못하였나이다."
+    return task.describe()
+
+# 디스패처의 작업 상태를 읽기만 합니다.
+robot_task_status.metadata = {"parallel_safe": True, "live_state": True}
@@ -1,86 +1,111 @@
 import streamlit as st
 import math
+import os
+import time
+import numpy as np
 from langchain_core.tools import tool
 from logger import get_logger
+from arm_kinematics import (solve_inverse_kinematics, solve_ik_batch, angles_to_dict,
+                            camera_to_robot, get_reachability_map)
 
 # 도구의 동작 상태 및 오류를 기록하기 위한 로거
 logger = get_logger('TOOLS')
 
-# [로봇 물리 제원 설정 - 단위: Meters]
-LINK_L1 = 0.08      # 어깨에서 팔꿈치까지 (J2~J3)
-LINK_L2 = 0.08      # 팔꿈치에서 손목까지 (J3~J4)
-LINK_D = 0.19       # 손목에서 그리퍼 끝단까지 (J4~End)
-BASE_HEIGHT = 0.12  # 지면에서 J2 관절까지의 높이
-TOTAL_REACH = LINK_L1 + LINK_L2 + LINK_D # 총 가동 범위: 0.35m
+# [궤적 모드 설정]
+WAYPOINT_SPACING = 0.01        # 궤적 경유점 간격 (1cm)
+WAYPOINT_INTERVAL_S = 0.02     # 경유점을 팔에 차례로 보낼 때의 간격 (스트리밍 실행)
+ARRIVAL_TOLERANCE = 0.005      # 도달 판정 거리 (0.5cm)
+# 점진 모드에서 도구 호출 한 번마다 드는 LLM 왕복 시간 추정치 (절약 시간 보고용)
+LLM_ROUND_TRIP_S = float(os.environ.get("MACH_LLM_ROUND_TRIP_S", "4.0"))
 
-# [카메라 설치 오프셋 설정 - 단위: Meters]
-# 로봇 베이스 중심(0,0,0) 기준 카메라의 상대 위치
-CAM_OFFSET_X = -0.05 # 로봇보다 5cm 뒤에 위치
-CAM_OFFSET_Y = 0.0   # 로봇과 좌우 정렬됨
-CAM_OFFSET_Z = 0.10  # 로봇 베이스보다 10cm 높게 위치
 
-def solve_inverse_kinematics(x_m, y_m, z_m):
+def plan_waypoints(start, target, spacing=WAYPOINT_SPACING):
+    """시작점에서 목표점까지 spacing 간격으로 직선 보간한 경유점 (N, 3) 배열을 만듭니다. (시작점 제외)"""
+    start, target = np.asarray(start, dtype=np.float64), np.asarray(target, dtype=np.float64)
+    count = max(int(math.ceil(np.linalg.norm(target - start) / spacing)), 1)
+    return start + (target - start) * (np.arange(1, count + 1) / count)[:, None]
+
+
+def solve_trajectory(waypoints):
     """
-    3차원 좌표를 5축 로봇의 관절 각도로 변환합니다.
-    그리퍼(D) 길이까지 포함하여 도달 가능 여부를 판단합니다.
+    경유점 (N, 3)의 도달 가능 여부와 관절 각도를 구합니다.
+    먼저 도달 가능 지도로 닿지 않는 경로를 걸러내고(경계 근처 경유점만 IK로 확인),
+    통과한 경로만 IK를 한 번에 풀어 (도달 가능 여부 (N,), 각도 (N, 5))를 반환합니다.
     """
-    try:
-        # 1. J1: 베이스 수평 회전각 (atan2 사용)
-        joint1 = math.degrees(math.atan2(y_m, x_m))
-        
-        # 2. 로봇 베이스(J2) 기준 목표 높이(z)와 수평 거리(r)
-        r_target = math.sqrt(x_m**2 + y_m**2)
-        z_target = z_m - BASE_HEIGHT
-        
-        # 전체 도달 거리 검증 (피타고라스 정리)
-        dist_to_target = math.sqrt(r_target**2 + z_target**2)
-        if dist_to_target > TOTAL_REACH:
-            return None # 물리적으로 닿지 않는 곳
-
-        # 3. 그리퍼(D) 접근 각도(phi) 계산
-        # 목표 지점을 향해 팔을 뻗도록 유동적으로 설정
-        phi_rad = math.atan2(z_target, r_target)
-        
-        # 손목 위치(J4) 추정
-        r_wrist = r_target - LINK_D * math.cos(phi_rad)
-        z_wrist = z_target - LINK_D * math.sin(phi_rad)
-        
-        # 4. L1, L2 구간에 대한 코사인 법칙 적용
-        dist_sq = r_wrist**2 + z_wrist**2
-        dist = math.sqrt(dist_sq)
-        
-        # 손목 위치까지 도달 가능한지 재검증
-        if dist > (LINK_L1 + LINK_L2):
-            return None
+    reachable = get_reachability_map().contains(waypoints)
+    if not reachable.all():
+        return reachable, None
+    angles, reachable = solve_ik_batch(waypoints)
+    return reachable, angles
+
+
+def count_incremental_calls(distance):
+    """점진 모드(5cm/1cm 보폭)로 같은 거리를 가려면 필요한 도구 호출 횟수 (마지막 안착 보고 포함)."""
+    calls = 1
+    while distance >= ARRIVAL_TOLERANCE:
+        step_size = 0.05 if distance > 0.10 else 0.01
+        distance = max(distance - step_size, 0.0)
+        calls += 1
+    return calls
+
+
+def execute_trajectory(waypoints, stream=False):
+    """
+    경유점을 팔(가상 위치)에 적용합니다.
+    stream이 True이면 경유점을 WAYPOINT_INTERVAL_S 간격으로 차례로 보내고, 아니면 마지막 점으로 한 번에 이동합니다.
+    """
+    points = waypoints if stream else waypoints[-1:]
+    for index, (x, y, z) in enumerate(points.tolist()):
+        st.session_state.current_arm_pos = {"x": x, "y": y, "z": z}
+        if stream and index < len(points) - 1:
+            time.sleep(WAYPOINT_INTERVAL_S)
+
+    # 팔이 움직였으므로 다음 프레임에서는 반드시 새로 탐지하도록 엔진에 알립니다.
+    if "engine" in st.session_state:
+        st.session_state.engine.notify_arm_moved()
+
+
+def run_trajectory(command, start, target, stream=False):
+    """[궤적 모드] 전체 경로를 한 번에 계획·검증·실행하고 요약 한 줄을 반환합니다."""
+    started = time.perf_counter()
+    distance = float(np.linalg.norm(np.subtract(target, start)))
+    if distance < ARRIVAL_TOLERANCE:
+        final_angles = solve_inverse_kinematics(*start)
+        return f"마마, 이미 목표 위치에 있사옵니다. 최종 각도: {final_angles}."
+
+    waypoints = plan_waypoints(start, target)
+    reachable, angles = solve_trajectory(waypoints)
+    unreachable = np.flatnonzero(~reachable)
+    if len(unreachable):
+        # 하나라도 닿지 않으면 움직이지 않고 바로 보고합니다.
+        first = waypoints[unreachable[0]]
+        return (f"❌ 경로 {len(waypoints)}개 경유점 중 {len(unreachable)}개가 팔이 닿지 않는 위치이옵니다 "
+                f"(첫 지점: {first[0]*100:.1f}, {first[1]*100:.1f}, {first[2]*100:.1f}cm). 이동하지 않았나이다.")
+
+    execute_trajectory(waypoints, stream=stream)
+    elapsed = time.perf_counter() - started
+
+    # 점진 모드였다면 필요했을 LLM 왕복 횟수로 절약 시간을 추정합니다.
+    replaced_calls = count_incremental_calls(distance)
+    saved_s = max((replaced_calls - 1) * LLM_ROUND_TRIP_S - elapsed, 0.0)
+    logger.info(f"[{command}] trajectory {len(waypoints)} waypoints, {distance*100:.1f}cm in {elapsed*1000:.0f}ms "
+                f"(replaces {replaced_calls} incremental calls, ~{saved_s:.0f}s saved)")
+
+    final = waypoints[-1]
+    return (f"마마, 안착하였나이다! 경로 {distance*100:.1f}cm를 경유점 {len(waypoints)}개로 한 번에 이동하여 "
+            f"로봇 좌표 ({final[0]*100:.1f}, {final[1]*100:.1f}, {final[2]*100:.1f})cm에 도달하였나이다. "
+            f"최종 각도: {angles_to_dict(angles[-1])}. 소요 {elapsed*1000:.0f}ms "
+            f"(점진 이동 {replaced_calls}회 호출 대비 약 {saved_s:.0f}초 절약). 추가 이동은 필요 없사옵니다.")
 
-        # J3(팔꿈치) 각도 계산
-        cos_j3 = (dist_sq - LINK_L1**2 - LINK_L2**2) / (2 * LINK_L1 * LINK_L2)
-        joint3_rad = math.acos(max(-1, min(1, cos_j3)))
-        
-        # J2(어깨) 각도 계산
-        alpha = math.atan2(z_wrist, r_wrist)
-        beta = math.acos(max(-1, min(1, (LINK_L1**2 + dist_sq - LINK_L2**2) / (2 * LINK_L1 * dist))))
-        
-        # 90도 오프셋 보정 적용 (마마의 교시 준수)
-        j2_final = math.degrees(alpha + beta) - 90.0
-        j3_final = math.degrees(joint3_rad) - 90.0
-        # 말단 그리퍼가 수평을 유지하거나 목표를 향하도록 설정
-        j4_final = math.degrees(phi_rad) - (j2_final + 90.0) - (j3_final + 90.0)
-        
-        return {
-            "J1": round(joint1, 1), 
-            "J2": round(j2_final, 1), 
-            "J3": round(j3_final, 1), 
-            "J4": round(j4_final, 1), 
-            "J5": 0.0
-        }
-    except Exception:
-        return None
 
 @tool
-def robot_action(command: str, target_x_cm: float = None, target_y_cm: float = None, target_z_cm: float = None) -> str:
+def robot_action(command: str, target_x_cm: float = None, target_y_cm: float = None, target_z_cm: float = None,
+                 mode: str = "trajectory") -> str:
     """
-    카메라 좌표를 로봇 좌표로 번역하여 점진적으로 이동시키고 각 관절 각도를 산출합니다.
+    카메라 좌표를 로봇 좌표로 번역하여 팔을 이동시키고 각 관절 각도를 산출합니다.
+    mode="trajectory"(기본)는 목표까지의 전체 경로를 한 번에 계획·검증·실행하고,
+    mode="stream"은 같은 경로의 경유점을 팔에 차례로 보내며,
+    mode="incremental"은 예전처럼 한 번에 5cm(목표 근처 1cm)씩만 이동합니다.
     """
     try:
         # 좌표값이 없는 단순 명령 처리
@@ -88,11 +113,7 @@ def robot_action(command: str, target_x_cm: float = None, target_y_cm: float = N
             return f"[{command}] 시뮬레이션 동작을 수행하였나이다."
 
         # [1단계] 카메라 좌표계(Vision) -> 로봇 좌표계(Robot) 번역
-        # 로봇 X = 카메라 Z + Offset / 로봇 Y = -카메라 X / 로봇 Z = -카메라 Y + Offset
-        v_x, v_y, v_z = target_x_cm / 100.0, target_y_cm / 100.0, target_z_cm / 100.0
-        robot_target_x = v_z + CAM_OFFSET_X
-        robot_target_y = -v_x + CAM_OFFSET_Y
-        robot_target_z = -v_y + CAM_OFFSET_Z
+        robot_target_x, robot_target_y, robot_target_z = camera_to_robot(target_x_cm, target_y_cm, target_z_cm)
         
         # [2단계] 로봇의 가상 현재 위치 관리 (Streamlit 세션 활용)
         if "current_arm_pos" not in st.session_state:
@@ -100,6 +121,10 @@ def robot_action(command: str, target_x_cm: float = None, target_y_cm: float = N
             st.session_state.current_arm_pos = {"x": 0.05, "y": 0.0, "z": 0.12}
 
         curr = st.session_state.current_arm_pos
+
+        if mode in ("trajectory", "stream"):
+            return run_trajectory(command, (curr['x'], curr['y'], curr['z']),
+                                  (robot_target_x, robot_target_y, robot_target_z), stream=(mode == "stream"))
         
         # 목표 지점까지의 벡터 및 직선 거리 계산
         diff_x = robot_target_x - curr['x']
@@ -108,7 +133,7 @@ def robot_action(command: str, target_x_cm: float = None, target_y_cm: float = N
         total_dist = math.sqrt(diff_x**2 + diff_y**2 + diff_z**2)
 
         # 최종 도달 판정 (0.5cm 이내)
-        if total_dist < 0.005:
+        if total_dist < ARRIVAL_TOLERANCE:
             final_angles = solve_inverse_kinematics(curr['x'], curr['y'], curr['z'])
             return f"마마, 안착하였나이다! 최종 각도: {final_angles}. 시뮬레이션 종료."
 
@@ -123,6 +148,10 @@ def robot_action(command: str, target_x_cm: float = None, target_y_cm: float = N
             "z": curr['z'] + (diff_z * step_scale)
         }
         st.session_state.current_arm_pos = new_pos
+
+        # 팔이 움직였으므로 다음 프레임에서는 반드시 새로 탐지하도록 엔진에 알립니다.
+        if "engine" in st.session_state:
+            st.session_state.engine.notify_arm_moved()
         
         # 현재 위치에 대한 역기구학 각도 계산
         angles = solve_inverse_kinematics(new_pos['x'], new_pos['y'], new_pos['z'])
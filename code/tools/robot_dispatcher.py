@@ -0,0 +1,350 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+import requests
+from requests.adapters import HTTPAdapter
+import numpy as np
+from logger import get_logger
+
+logger = get_logger('TOOLS')
+
+# 작업 상태
+TASK_QUEUED = "queued"          # 대기열에서 전송을 기다리는 중
+TASK_SENT = "sent"              # 서버가 받아 수행 중
+TASK_DONE = "done"              # 수행 완료
+TASK_FAILED = "failed"          # 전송 또는 수행 실패
+TASK_SUPERSEDED = "superseded"  # 보내기 전에 더 새로운 이동 명령으로 대체됨
+TASK_REJECTED = "rejected"      # 대기열이 가득 차 받지 않음
+FINISHED_STATES = (TASK_DONE, TASK_FAILED, TASK_SUPERSEDED, TASK_REJECTED)
+
+# 서버가 돌려주는 작업 상태 문자열 해석
+REMOTE_DONE = ("done", "completed", "complete", "success", "finished")
+REMOTE_FAILED = ("failed", "error", "aborted", "cancelled")
+
+# 지연 시간 히스토그램 구간 상한 (ms)
+HISTOGRAM_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """
+    이름별 지연 시간을 고정 구간 히스토그램과 최근 구간의 백분위수로 집계합니다.
+    """
+    def __init__(self, bounds_ms=HISTOGRAM_BOUNDS_MS, window=200):
+        self._lock = threading.Lock()
+        self.bounds_ms = bounds_ms
+        self._window = window
+        self._buckets = {}
+        self._recent = {}
+
+    def record(self, name, latency_s):
+        """지연 시간 한 건을 기록합니다."""
+        latency_ms = latency_s * 1000
+        with self._lock:
+            buckets = self._buckets.setdefault(name, [0] * (len(self.bounds_ms) + 1))
+            buckets[int(np.searchsorted(self.bounds_ms, latency_ms))] += 1
+            self._recent.setdefault(name, deque(maxlen=self._window)).append(latency_ms)
+
+    def snapshot(self):
+        """이름별 건수, 평균/p50/p95(ms)와 구간별 건수('<=50ms': n 형태)를 반환합니다."""
+        labels = [f"<={bound}ms" for bound in self.bounds_ms] + [f">{self.bounds_ms[-1]}ms"]
+        with self._lock:
+            report = {}
+            for name, buckets in self._buckets.items():
+                recent = np.asarray(self._recent[name], dtype=np.float64)
+                report[name] = {
+                    'count': sum(buckets),
+                    'mean_ms': round(float(recent.mean()), 1),
+                    'p50_ms': round(float(np.percentile(recent, 50)), 1),
+                    'p95_ms': round(float(np.percentile(recent, 95)), 1),
+                    'histogram': {label: count for label, count in zip(labels, buckets) if count},
+                }
+            return report
+
+
+class RobotTask:
+    """
+    디스패처에 제출된 명령 하나의 진행 상태입니다.
+    task_id는 디스패처가 붙이는 번호이며, 서버가 돌려준 작업 번호는 remote_id에 기록됩니다.
+    """
+    def __init__(self, task_id, command, target_mm=None, speed=50):
+        self.task_id = task_id
+        self.command = command
+        self.target_mm = target_mm
+        self.speed = speed
+        self.status = TASK_QUEUED
+        self.remote_id = None
+        self.message = None
+        self.error = None
+        self.superseded_by = None
+        self.submitted_at = time.perf_counter()
+        self.sent_at = None
+        self.finished_at = None
+        self._finished = threading.Event()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self._finished.is_set()
+
+    @property
+    def ok(self):
+        """전송 또는 수행이 성공했는지 여부입니다. (수행 중인 작업은 서버가 받았으므로 성공으로 봅니다)"""
+        return self.status in (TASK_SENT, TASK_DONE)
+
+    def wait(self, timeout=None):
+        """작업이 끝날 때까지 최대 timeout초 기다리고, 끝났는지 여부를 반환합니다."""
+        return self._finished.wait(timeout)
+
+    def add_done_callback(self, callback):
+        """작업이 끝나면 callback(task)를 호출합니다. (디스패처 스레드에서 호출되며, 이미 끝났으면 바로 호출)"""
+        with self._callbacks_lock:
+            if not self.done:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _finish(self, status, message=None, error=None):
+        self.status = status
+        self.message = message if message is not None else self.message
+        self.error = error
+        self.finished_at = time.perf_counter()
+        with self._callbacks_lock:
+            self._finished.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                logger.error(f"로봇 작업 {self.task_id} 완료 콜백 오류: {e}")
+
+    def describe(self):
+        """도구가 그대로 보고할 수 있는 한 줄 요약을 반환합니다."""
+        text = f"작업 {self.task_id} [{self.command}] 상태: {self.status}"
+        if self.remote_id is not None:
+            text += f" (서버 ID: {self.remote_id})"
+        if self.superseded_by is not None:
+            text += f", 작업 {self.superseded_by}(으)로 대체됨"
+        if self.message:
+            text += f", {self.message}"
+        if self.error:
+            text += f", 오류: {self.error}"
+        if self.finished_at is not None:
+            text += f", {(self.finished_at - self.submitted_at) * 1000:.0f}ms 소요"
+        return text
+
+
+class RobotCommandDispatcher:
+    """
+    로봇 서버로 가는 명령을 한 줄로 세워 전송 스레드 하나가 차례로 보내는 디스패처입니다.
+    - 연결은 keep-alive 세션 하나를 재사용합니다.
+    - submit()은 대기열에 넣고 바로 RobotTask를 반환하며, 기다릴지는 호출한 쪽이 정합니다.
+    - 아직 보내지 않은 이동 명령은 새 이동 명령이 들어오면 대체(coalescing)되어, 팔은 항상 최신 목표로만 갑니다.
+    - 대기열은 max_queue개로 제한되며, 가득 차면 새 명령을 거절합니다.
+    - status_url이 있으면 서버의 작업 번호로 완료 여부를 확인한 뒤 다음 명령을 보냅니다.
+      서버가 상태 조회를 지원하지 않으면(404) 접수 응답을 완료로 간주합니다.
+    """
+    def __init__(self, url, status_url=None, max_queue=16, timeout=5.0, poll_interval=0.1,
+                 completion_timeout=30.0, history=256):
+        self.url = url
+        self.status_url = status_url
+        self.status_supported = status_url is not None
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.completion_timeout = completion_timeout
+
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.latency = LatencyHistogram()
+
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self._tasks = OrderedDict()
+        self._history = history
+        self._ids = itertools.count(1)
+        self._thread = None
+        self.is_running = False
+
+        # 통계
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def start(self):
+        """전송 스레드를 시작합니다. submit()이 처음 불릴 때 자동으로 시작됩니다."""
+        with self._condition:
+            if self.is_running:
+                return
+            self.is_running = True
+            self._thread = threading.Thread(target=self._send_loop, name="robot-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """전송 스레드를 멈추고 대기 중인 명령을 실패로 정리합니다."""
+        with self._condition:
+            self.is_running = False
+            pending = list(self._queue)
+            self._queue.clear()
+            self._condition.notify_all()
+        for task in pending:
+            task._finish(TASK_FAILED, error="dispatcher stopped")
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def submit(self, command, target_mm=None, speed=50, coalesce=True):
+        """
+        명령을 대기열에 넣고 바로 RobotTask를 반환합니다.
+        coalesce가 True인 이동 명령(target_mm이 있는 명령)은 아직 보내지 않은 같은 종류의 이동 명령을 대체합니다.
+        """
+        self.start()
+        with self._condition:
+            task = RobotTask(f"r{next(self._ids)}", command, target_mm, speed)
+            self._remember(task)
+            self.submitted += 1
+
+            if coalesce and target_mm is not None:
+                for queued in [t for t in self._queue if t.command == command and t.target_mm is not None]:
+                    self._queue.remove(queued)
+                    queued.superseded_by = task.task_id
+                    queued._finish(TASK_SUPERSEDED)
+                    self.coalesced += 1
+
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                task._finish(TASK_REJECTED, error=f"queue full ({self.max_queue})")
+                return task
+
+            self._queue.append(task)
+            self._condition.notify_all()
+            return task
+
+    def send(self, command, target_mm=None, speed=50, timeout=None):
+        """명령을 제출하고 끝날 때까지(최대 timeout초) 기다린 뒤 RobotTask를 반환합니다."""
+        task = self.submit(command, target_mm, speed)
+        task.wait(self.timeout + self.completion_timeout if timeout is None else timeout)
+        return task
+
+    def get_task(self, task_id):
+        """디스패처 작업 번호(또는 서버 작업 번호)로 최근 작업을 찾습니다. 없으면 None입니다."""
+        with self._condition:
+            task = self._tasks.get(task_id)
+            if task is None:
+                task = next((t for t in self._tasks.values() if str(t.remote_id) == str(task_id)), None)
+            return task
+
+    def stats(self):
+        """대기열 길이, 제출/대체/거절/실패 횟수, 명령별 지연 시간 히스토그램을 반환합니다."""
+        with self._condition:
+            report = {
+                'queue_depth': len(self._queue),
+                'submitted': self.submitted,
+                'coalesced': self.coalesced,
+                'rejected': self.rejected,
+                'failed': self.failed,
+                'status_tracking': self.status_supported,
+            }
+        report['latency'] = self.latency.snapshot()
+        return report
+
+    def _remember(self, task):
+        """최근 history개의 작업만 조회용으로 보관합니다."""
+        self._tasks[task.task_id] = task
+        while len(self._tasks) > self._history:
+            self._tasks.popitem(last=False)
+
+    def _send_loop(self):
+        """대기열의 명령을 하나씩 보내고, 상태 조회가 가능하면 끝날 때까지 확인합니다."""
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or not self.is_running)
+                if not self.is_running:
+                    return
+                task = self._queue.popleft()
+                task.sent_at = time.perf_counter()
+            self.latency.record(f"{task.command}.queue", task.sent_at - task.submitted_at)
+
+            try:
+                self._post(task)
+                if self.status_supported and task.remote_id is not None:
+                    self._track(task)
+                else:
+                    task._finish(TASK_DONE)
+            except Exception as e:
+                logger.error(f"로봇 명령 {task.task_id} 전송 실패: {e}")
+                task._finish(TASK_FAILED, error=str(e))
+
+            if task.status == TASK_FAILED:
+                self.failed += 1
+            else:
+                self.latency.record(f"{task.command}.total", task.finished_at - task.submitted_at)
+
+    def _post(self, task):
+        """명령을 서버에 보내고 접수 결과를 작업에 기록합니다."""
+        payload = {
+            "command": task.command,
+            "target": {
+                "x": task.target_mm[0],
+                "y": task.target_mm[1],
+                "z": task.target_mm[2]
+            } if task.target_mm is not None else None,
+            "speed": task.speed
+        }
+        started = time.perf_counter()
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        self.latency.record(f"{task.command}.request", time.perf_counter() - started)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+
+        result = response.json()
+        task.remote_id = result.get("task_id")
+        task.message = result.get("message", "명령이 전달되었습니다.")
+        task.status = TASK_SENT
+
+    def _track(self, task):
+        """서버 작업 번호로 완료될 때까지 상태를 조회합니다."""
+        deadline = time.perf_counter() + self.completion_timeout
+        while self.is_running and time.perf_counter() < deadline:
+            response = self.session.get(self.status_url.format(task_id=task.remote_id), timeout=self.timeout)
+            if response.status_code == 404:
+                # 상태 조회를 지원하지 않는 예전 서버이면 접수 응답을 완료로 보고, 이후로는 조회하지 않습니다.
+                self.status_supported = False
+                task._finish(TASK_DONE)
+                return
+            response.raise_for_status()
+            result = response.json()
+            status = str(result.get("status", "")).lower()
+            if status in REMOTE_DONE:
+                task._finish(TASK_DONE, message=result.get("message"))
+                return
+            if status in REMOTE_FAILED:
+                task._finish(TASK_FAILED, error=result.get("message", status))
+                return
+            time.sleep(self.poll_interval)
+        task._finish(TASK_FAILED, error="completion timeout" if self.is_running else "dispatcher stopped")
+
+
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+
+
+def get_shared_dispatcher(url, status_url=None):
+    """
+    같은 서버 주소에 대해 프로세스 전체에서 하나의 디스패처를 공유합니다.
+    여러 도구가 각자 연결을 열지 않고 같은 대기열과 세션을 쓰게 합니다.
+    """
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(url)
+        if dispatcher is None:
+            dispatcher = RobotCommandDispatcher(url, status_url=status_url)
+            _dispatchers[url] = dispatcher
+        return dispatcher
+
+
+def dispatcher_stats():
+    """지금까지 만들어진 디스패처들의 통계를 {서버 주소: 통계} 형태로 반환합니다."""
+    with _dispatchers_lock:
+        dispatchers = dict(_dispatchers)
+    return {url: dispatcher.stats() for url, dispatcher in dispatchers.items()}
@@ -15,7 +15,7 @@ def vision_analyze(query: str) -> str:
         if "engine" not in st.session_state:
             return "엔진이 준비되지 않았습니다."
             
-        frame = st.session_state.engine.last_frame
+        frame = st.session_state.engine.get_snapshot(fresh=True).frame
         if frame is None: return "영상을 찾을 수 없습니다."
         
         # 이미지 최적화 및 Base64 인코딩
@@ -40,4 +40,7 @@ def vision_analyze(query: str) -> str:
         return f"분석 서버 오류 (코드: {response.status_code})"
     except Exception as e:
         logger.error(f"vision_analyze 오류: {e}")
-        return f"분석 중 오류 발생: {str(e)}"
\ No newline at end of file
+        return f"분석 중 오류 발생: {str(e)}"
+
+# 지금 카메라 프레임을 분석 모델에 보내 읽기만 합니다.
+vision_analyze.metadata = {"parallel_safe": True, "live_state": True}
@@ -1,29 +1,42 @@
 import streamlit as st
+import numpy as np
 from langchain_core.tools import tool
 from logger import get_logger
+from arm_kinematics import camera_to_robot, get_reachability_map
 
 logger = get_logger('TOOLS')
 
 @tool
 def vision_detect(query: str) -> str:
-    """실시간 카메라에서 감지된 물체와 좌표를 엔진에서 가져옵니다."""
+    """실시간 카메라에서 감지된 물체와 좌표를 엔진에서 가져옵니다. 'cup#3'의 숫자는 물체별 고유 추적 번호이며, 팔이 닿지 않는 물체에는 [팔이 닿지 않는 위치]가 붙습니다."""
     try:
         if "engine" not in st.session_state: 
             return "엔진이 준비되지 않았습니다."
         
         engine = st.session_state.engine
         
-        result_text = engine.last_vision_result
-        coords = engine.last_coordinates
+        # 팔이 방금 움직였다면 이동 후에 찍힌 프레임이 발행될 때까지 잠시 기다립니다.
+        snapshot = engine.get_snapshot(fresh=True)
+        result_text = snapshot.vision_result
+        coords = snapshot.coordinates
         
         if coords:
             # 단위를 mm에서 cm로 변경하여 보고 문구를 생성합니다.
             res = f"감지 결과: {result_text}\n"
-            for c in coords:
-                res += f"- {c['name']}: (x={c['x']}, y={c['y']}, z={c['z']}cm)\n"
+            # 팔이 닿지 않는 물체는 이동 명령을 내리기 전에 미리 표시합니다. (도달 가능 지도 표 조회)
+            robot_x, robot_y, robot_z = camera_to_robot(*np.array([(c['x'], c['y'], c['z']) for c in coords]).T)
+            reachable = get_reachability_map().contains(np.stack([robot_x, robot_y, robot_z], axis=1))
+            for c, can_reach in zip(coords, reachable):
+                # 추적 ID가 있으면 'cup#3'처럼 표시하여 같은 종류의 물체를 구분합니다.
+                label = f"{c['name']}#{c['id']}" if 'id' in c else c['name']
+                res += f"- {label}: (x={c['x']}, y={c['y']}, z={c['z']}cm)"
+                res += "\n" if can_reach else " [팔이 닿지 않는 위치]\n"
             return res
             
         return f"감지 결과: {result_text}"
     except Exception as e:
         logger.error(f"탐지 도구 오류: {e}")
-        return "정보 획득 실패"
\ No newline at end of file
+        return "정보 획득 실패"
+
+# 최신 비전 스냅샷의 탐지 결과를 읽기만 합니다.
+vision_detect.metadata = {"parallel_safe": True, "live_state": True}
@@ -0,0 +1,66 @@
+import streamlit as st
+from langchain_core.tools import tool
+from logger import get_logger
+from pybullet_server import get_shared_server
+from servo_controller import SimArm, CommandArm
+from robot_action import SIM_SERVER_IP, SIM_SERVER_PORT, send_robot_command
+from robot_dispatcher import TASK_REJECTED, TASK_FAILED
+
+logger = get_logger('TOOLS')
+
+# 제어 루프 결과 코드별 보고 문구
+STATUS_MESSAGES = {
+    'reached': "✅ 목표에 도달하였나이다",
+    'lost': "❌ 목표가 시야에서 사라져 멈추었나이다",
+    'unreachable': "❌ 팔이 닿지 않는 위치라 멈추었나이다",
+    'stalled': "❌ 더 가까이 다가가지 못해 멈추었나이다",
+    'arm_error': "❌ 팔이 명령에 응답하지 않아 멈추었나이다",
+    'timeout': "❌ 제한 시간 안에 도달하지 못하였나이다",
+    'no_vision': "❌ 비전 루프가 동작하지 않아 시작하지 못하였나이다",
+    'invalid_target': "❌ 물체 이름을 알아듣지 못하였나이다 ('cup' 또는 'cup#3' 형식)",
+}
+
+
+def make_arm(sim_mode):
+    """
+    조종판 모드에 맞는 팔 객체를 만듭니다. 실제 팔은 위치를 알려주지 않으므로 보낸 명령으로 위치를 추정하고,
+    도착 보고 전에 마지막 명령(RobotTask)이 끝나기를 기다립니다.
+    """
+    if sim_mode:
+        return SimArm(get_shared_server(SIM_SERVER_IP, SIM_SERVER_PORT))
+
+    def send(position_m):
+        try:
+            # 서보 루프는 기다리지 않고 제출만 하며, 아직 보내지 않은 이전 이동 명령은 디스패처가 대체합니다.
+            task = send_robot_command("move_to_xyz", [v * 1000 for v in position_m], wait=False)
+            return None if task.status in (TASK_REJECTED, TASK_FAILED) else task
+        except Exception as e:
+            logger.error(f"visual_servo 이동 명령 실패: {e}")
+            return None
+    return CommandArm(send)
+
+
+@tool
+def visual_servo(target: str, timeout_s: float = 20.0) -> str:
+    """
+    물체 이름(예: 'cup', 추적 번호를 붙이면 'cup#3')을 받아 로봇 팔 끝을 그 물체까지 가져갑니다.
+    실시간 카메라로 위치를 계속 재확인하며 조금씩 접근하므로, 한 번 호출하면 도착하거나 멈출 때까지 스스로 진행합니다.
+    """
+    try:
+        if "engine" not in st.session_state:
+            return "엔진이 준비되지 않았습니다."
+
+        engine = st.session_state.engine
+        result = engine.servo_to(target.strip(), make_arm(st.session_state.get('sim_mode', False)), timeout=timeout_s)
+        message = STATUS_MESSAGES.get(result['status'], result['status'])
+        if result['status'] in ('no_vision', 'invalid_target'):
+            return message
+        return (f"{message}. 대상: {result['target']}, 남은 거리: {result['distance_cm']}cm, "
+                f"팔 위치: {result['position_cm']}cm, {result['frames']}프레임 / {result['moves']}회 이동, "
+                f"{result['elapsed_s']}초 소요")
+    except Exception as e:
+        logger.error(f"visual_servo 오류: {e}")
+        return f"송구하오나 마마, 팔을 물체로 이끌지 못하였사옵니다: {str(e)}"
+
+# 팔을 움직이며, 결과는 그때의 카메라 화면에 따라 달라집니다.
+visual_servo.metadata = {"live_state": True}
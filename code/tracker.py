@@ -0,0 +1,165 @@
+# code/tracker.py
+
+import numpy as np
+from detections import DetectionBatch
+
+
+def box_iou_matrix(boxes_a, boxes_b):
+    """
+    두 xyxy 박스 집합 사이의 IoU 행렬 (len(a), len(b))을 한 번에 계산합니다.
+    """
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return intersection / np.maximum(union, 1e-6)
+
+
+class ObjectTracker:
+    """
+    YOLO 탐지 결과에 지속적인 객체 ID를 부여하는 IoU/중심점 기반 추적기입니다. (SORT 방식 간소화)
+    - 트랙과 탐지 사이의 비용 행렬을 벡터 연산으로 계산하고 탐욕적으로 짝을 짓습니다.
+    - 박스는 등속 모델로 예측하므로, YOLO를 건너뛴 프레임에서도 위치를 추정할 수 있습니다.
+    - 3D 좌표(cm)는 지수 이동 평균으로 평활화합니다.
+    """
+    def __init__(self, min_score=0.1, max_missed=15, point_smoothing=0.4, velocity_smoothing=0.5):
+        self.min_score = min_score
+        self.max_missed = max_missed
+        self.point_smoothing = point_smoothing
+        self.velocity_smoothing = velocity_smoothing
+        self._next_id = 1
+
+        # 트랙 상태 (모두 행 단위로 정렬된 배열)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.names = np.empty(0, dtype=object)
+        self.class_ids = np.empty(0, dtype=np.int32)
+        self.confidences = np.empty(0, dtype=np.float32)
+        self.boxes = np.empty((0, 4), dtype=np.float64)
+        self.velocities = np.empty((0, 4), dtype=np.float64)
+        self.points = np.empty((0, 3), dtype=np.float64)
+        self.missed = np.empty(0, dtype=np.int32)
+        self.observed_at = np.empty(0, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _predicted_boxes(self, timestamp):
+        """각 트랙이 마지막으로 관측된 이후 경과 시간만큼 박스를 등속 예측합니다."""
+        dt = np.maximum(timestamp - self.observed_at, 0.0)[:, None]
+        return self.boxes + self.velocities * dt
+
+    def _match(self, predicted, detections):
+        """
+        같은 클래스끼리만 짝을 짓습니다. 박스가 겹치면 IoU를, 겹치지 않으면
+        박스 크기 대비 중심점 거리로 만든 근접도를 점수로 사용합니다.
+        """
+        if len(predicted) == 0 or len(detections) == 0:
+            return []
+
+        iou = box_iou_matrix(predicted, detections.boxes.astype(np.float64))
+        track_centers = (predicted[:, :2] + predicted[:, 2:]) / 2
+        det_centers = (detections.boxes[:, :2] + detections.boxes[:, 2:]) / 2
+        distance = np.linalg.norm(track_centers[:, None, :] - det_centers[None, :, :], axis=2)
+        diagonal = np.linalg.norm(predicted[:, 2:] - predicted[:, :2], axis=1)[:, None]
+        proximity = np.clip(1 - distance / np.maximum(diagonal, 1.0), 0, 1) * 0.5
+
+        score = np.where(iou > 0, iou, proximity)
+        score[self.class_ids[:, None] != detections.class_ids[None, :]] = 0.0
+
+        pairs = []
+        used_tracks, used_dets = set(), set()
+        flat_order = np.argsort(score, axis=None)[::-1]
+        for track_index, det_index in zip(*np.unravel_index(flat_order, score.shape)):
+            if score[track_index, det_index] < self.min_score:
+                break
+            if track_index in used_tracks or det_index in used_dets:
+                continue
+            used_tracks.add(track_index)
+            used_dets.add(det_index)
+            pairs.append((track_index, det_index))
+        return pairs
+
+    def update(self, detections, timestamp):
+        """
+        새 YOLO 탐지 결과(DetectionBatch)로 트랙을 갱신하고,
+        이번 프레임에 관측된 트랙만 ID가 붙은 DetectionBatch로 반환합니다.
+        """
+        predicted = self._predicted_boxes(timestamp)
+        pairs = self._match(predicted, detections)
+        matched_tracks = np.array([p[0] for p in pairs], dtype=np.int64)
+        matched_dets = np.array([p[1] for p in pairs], dtype=np.int64)
+
+        self.missed += 1
+        if len(pairs):
+            new_boxes = detections.boxes[matched_dets].astype(np.float64)
+            dt = (timestamp - self.observed_at[matched_tracks])[:, None]
+            measured_velocity = np.where(dt > 0, (new_boxes - self.boxes[matched_tracks]) / np.maximum(dt, 1e-6), 0.0)
+            alpha = self.velocity_smoothing
+            self.velocities[matched_tracks] = alpha * measured_velocity + (1 - alpha) * self.velocities[matched_tracks]
+            self.boxes[matched_tracks] = new_boxes
+            self.confidences[matched_tracks] = detections.confidences[matched_dets]
+            self.points[matched_tracks] = self._smooth(self.points[matched_tracks], detections.points[matched_dets])
+            self.missed[matched_tracks] = 0
+            self.observed_at[matched_tracks] = timestamp
+
+        # 짝을 찾지 못한 탐지는 새 트랙으로 등록
+        unmatched = np.setdiff1d(np.arange(len(detections)), matched_dets)
+        if len(unmatched):
+            count = len(unmatched)
+            self.ids = np.concatenate((self.ids, np.arange(self._next_id, self._next_id + count)))
+            self._next_id += count
+            self.names = np.concatenate((self.names, detections.names[unmatched]))
+            self.class_ids = np.concatenate((self.class_ids, detections.class_ids[unmatched]))
+            self.confidences = np.concatenate((self.confidences, detections.confidences[unmatched]))
+            self.boxes = np.vstack((self.boxes, detections.boxes[unmatched].astype(np.float64)))
+            self.velocities = np.vstack((self.velocities, np.zeros((count, 4))))
+            self.points = np.vstack((self.points, detections.points[unmatched]))
+            self.missed = np.concatenate((self.missed, np.zeros(count, dtype=np.int32)))
+            self.observed_at = np.concatenate((self.observed_at, np.full(count, timestamp)))
+
+        # 오래 관측되지 않은 트랙은 제거
+        self._keep(self.missed <= self.max_missed)
+        return self._to_batch(self.missed == 0, self.boxes)
+
+    def predict(self, timestamp):
+        """
+        YOLO를 건너뛴 프레임에서 직전 프레임에 관측된 트랙의 박스 위치를 등속 예측하여 반환합니다.
+        3D 좌표는 refresh_points로 새 깊이 측정값을 반영해야 갱신됩니다.
+        """
+        return self._to_batch(self.missed == 0, self._predicted_boxes(timestamp))
+
+    def refresh_points(self, track_ids, points):
+        """예측 박스에서 새로 측정한 3D 좌표를 트랙에 반영하고 평활화된 좌표를 반환합니다."""
+        rows = np.searchsorted(self.ids, track_ids)
+        self.points[rows] = self._smooth(self.points[rows], points)
+        return self.points[rows].copy()
+
+    def _smooth(self, previous, measured):
+        """깊이가 유효한(z > 0) 측정값만 지수 이동 평균으로 반영합니다."""
+        valid = measured[:, 2] > 0
+        alpha = self.point_smoothing
+        blended = np.where((previous[:, 2] > 0)[:, None], alpha * measured + (1 - alpha) * previous, measured)
+        return np.where(valid[:, None], blended, previous)
+
+    def _keep(self, mask):
+        """mask가 True인 트랙만 남깁니다."""
+        self.ids = self.ids[mask]
+        self.names = self.names[mask]
+        self.class_ids = self.class_ids[mask]
+        self.confidences = self.confidences[mask]
+        self.boxes = self.boxes[mask]
+        self.velocities = self.velocities[mask]
+        self.points = self.points[mask]
+        self.missed = self.missed[mask]
+        self.observed_at = self.observed_at[mask]
+
+    def _to_batch(self, mask, boxes):
+        """선택된 트랙을 track_ids가 채워진 DetectionBatch로 변환합니다."""
+        boxes = boxes[mask].astype(np.float32)
+        centers = ((boxes[:, :2] + boxes[:, 2:]) / 2).astype(np.int32)
+        return DetectionBatch(
+            self.names[mask], self.class_ids[mask], self.confidences[mask],
+            boxes, centers, self.points[mask].copy(), track_ids=self.ids[mask]
+        )
@@ -1,10 +1,18 @@
-import cv2
 import numpy as np
 import pyrealsense2 as rs
-from ultralytics import YOLO
 from logger import get_logger
+from depth_sampling import sample_box_depth
+from detector import YoloDetector
+from detections import DetectionBatch
+from motion_gate import MotionGate
+from tracker import ObjectTracker
+from vision_renderer import VisionRenderer
+from frame_source import FrameRecorder
+from sim_camera import SimCameraModel
 import os
 import sys
+import threading
+import time
 
 # 파이불렛 서버 통신을 위한 경로 추가
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -13,36 +21,116 @@ if tools_path not in sys.path:
     sys.path.append(tools_path)
 
 try:
-    from pybullet_server import PyBulletServer
+    from pybullet_server import get_shared_server
 except ImportError:
-    PyBulletServer = None
+    get_shared_server = None
 
 # 비전 시스템의 상태와 오류를 기록하기 위한 로거 설정
 logger = get_logger('VISION')
 
+# 모드별 기본 깊이 샘플링 방식 (리얼센스는 구멍이 잦아 ROI 중앙값 사용)
+DEPTH_SAMPLING_DEFAULTS = {'sim': 'center', 'real': 'median'}
+
+
+def intrinsics_to_params(intrinsics):
+    """
+    리얼센스 intrinsics 객체를 벡터 연산에 쓰기 쉬운 딕셔너리로 변환함.
+    """
+    return {
+        'width': intrinsics.width, 'height': intrinsics.height,
+        'fx': intrinsics.fx, 'fy': intrinsics.fy,
+        'ppx': intrinsics.ppx, 'ppy': intrinsics.ppy,
+        'model': str(intrinsics.model).split('.')[-1],
+        'coeffs': [float(c) for c in intrinsics.coeffs],
+    }
+
+
+def deproject_pixels(params, pixel_x, pixel_y, depth_m):
+    """
+    여러 픽셀을 한 번에 카메라 3D 좌표(m)로 역투영함.
+    rs2_deproject_pixel_to_point와 같은 식을 NumPy 배열 단위로 계산하며,
+    깊이가 0인 픽셀은 (0, 0, 0)으로 남김.
+    """
+    x = (pixel_x - params['ppx']) / params['fx']
+    y = (pixel_y - params['ppy']) / params['fy']
+    coeffs = params['coeffs']
+    if params['model'] == 'inverse_brown_conrady' and any(coeffs):
+        r2 = x * x + y * y
+        f = 1 + coeffs[0] * r2 + coeffs[1] * r2 * r2 + coeffs[4] * r2 * r2 * r2
+        ux = x * f + 2 * coeffs[2] * x * y + coeffs[3] * (r2 + 2 * x * x)
+        uy = y * f + 2 * coeffs[3] * x * y + coeffs[2] * (r2 + 2 * y * y)
+        x, y = ux, uy
+
+    points = np.stack((depth_m * x, depth_m * y, depth_m), axis=1)
+    points[depth_m <= 0] = 0.0
+    return points
+
+
 class VisionSystem:
-    def __init__(self, model_path=None, sim_mode=False):
+    def __init__(self, model_path=None, sim_mode=False, depth_sampling=None, roi_ratio=0.5,
+                 motion_gating=True, force_inference_interval=1.0, tracking=True, min_inference_interval=0.0,
+                 detector_backend=None, detector_options=None, source=None):
         """
         비전 시스템 초기화.
         sim_mode가 True이면 파이불렛 시뮬레이션 모드로 동작하며,
         False이면 실제 리얼센스 카메라를 초기화함.
+        depth_sampling은 {'sim': ..., 'real': ...} 형태로 모드별 박스 깊이 샘플링 방식
+        ('center', 'median', 'trimmed_mean')을 지정함.
+        motion_gating이 True이면 장면 변화가 없을 때 YOLO 추론을 생략하되,
+        force_inference_interval(초)마다 한 번은 반드시 추론함.
+        tracking이 True이면 탐지 결과에 지속적인 객체 ID를 부여하고, min_inference_interval(초)로
+        YOLO 실행 빈도를 낮춘 사이의 프레임은 추적기의 예측 위치로 채움.
+        detector_backend는 'torch', 'onnx', 'openvino' 중 하나이며, 지정하지 않으면
+        환경 변수 MACH_YOLO_BACKEND(기본값 torch)를 따름. detector_options는
+        YoloDetector의 imgsz, int8, threads 등의 설정을 딕셔너리로 전달함.
+        source에 frame_source.ReplaySource를 넘기면 카메라/시뮬레이터 대신 녹화 세션을 재생하며,
+        모드와 카메라 파라미터는 녹화 당시의 값을 따름.
         """
-        self.sim_mode = sim_mode
+        self.source = source
+        self.sim_mode = source.sim_mode if source is not None else sim_mode
+        self.recorder = None
+        self._record_lock = threading.Lock()
         self.model_path = model_path
+        self.depth_sampling = dict(DEPTH_SAMPLING_DEFAULTS, **(depth_sampling or {}))
+        self.roi_ratio = roi_ratio
+        self.motion_gate = MotionGate(
+            force_interval=force_inference_interval, min_interval=min_inference_interval
+        ) if motion_gating else None
+        self.tracker = ObjectTracker() if tracking else None
+        self.renderer = VisionRenderer(sim_mode=self.sim_mode)
         self.sim_server = None
+        # 파이불렛 깊이 버퍼 → 좌표 변환 모델 (녹화 세션이면 녹화 당시 카메라 설정 사용)
+        sim_camera = getattr(source, 'meta', {}).get('sim_camera') if source is not None else None
+        self.sim_camera = SimCameraModel(**(sim_camera or {}))
+        self.sim_step = None  # 마지막으로 받은 시뮬레이션 스텝 번호 (/frame 미지원 서버면 None)
+        self.last_detections = DetectionBatch.empty()
+        self.last_detection_result = None
         self.pipeline = None
+        # 최근 호출의 단계별 소요 시간(초). 벤치마크와 진단용으로 사용함
+        self.stage_times = {}
         
         # 모델 경로 설정
         if self.model_path is None:
             base_directory = os.path.dirname(os.path.abspath(__file__))
             self.model_path = os.path.normpath(os.path.join(base_directory, "..", "data", "models", "yolo11n.pt"))
         
-        self.model = YOLO(self.model_path)
+        backend = detector_backend or os.environ.get("MACH_YOLO_BACKEND", "torch")
+        self.model = YoloDetector(self.model_path, backend=backend, **(detector_options or {}))
 
-        if self.sim_mode:
+        if self.source is not None:
+            # 녹화 세션 재생 모드 초기화 (하드웨어/서버 불필요)
+            if not self.sim_mode:
+                self.camera_params = self.source.camera_params
+                self.depth_scale = self.source.depth_scale
+            logger.info(f"Vision system initialized in replay mode ({len(self.source)} frames, "
+                        f"{'sim' if self.sim_mode else 'realsense'}).")
+        elif self.sim_mode:
             # 파이불렛 시뮬레이션 모드 초기화
-            if PyBulletServer:
-                self.sim_server = PyBulletServer()
+            if get_shared_server:
+                self.sim_server = get_shared_server()
+                # MACH_SIM_STREAM=1이면 매 프레임 요청하는 대신 서버가 밀어 주는 프레임을 받습니다.
+                if os.environ.get("MACH_SIM_STREAM") == "1":
+                    self.sim_server.start_stream()
                 logger.info("Vision system initialized in PyBullet simulation mode.")
             else:
                 logger.error("PyBulletServer module not found.")
@@ -58,7 +146,7 @@ class VisionSystem:
                 depth_sensor = self.profile.get_device().first_depth_sensor()
                 self.depth_scale = depth_sensor.get_depth_scale()
                 self.intrinsics = self.profile.get_stream(rs.stream.color).as_video_stream_profile().get_intrinsics()
-                self.colorizer = rs.colorizer()
+                self.camera_params = intrinsics_to_params(self.intrinsics)
                 logger.info(f"RealSense Vision system initialized. Depth scale: {self.depth_scale}")
             except Exception as error:
                 logger.error(f"Camera initialization failed: {error}")
@@ -70,16 +158,9 @@ class VisionSystem:
         리얼센스와 파이불렛 모드 각각에 맞는 계산법을 적용함.
         """
         if self.sim_mode:
-            # 파이불렛 깊이 데이터(0~1)를 cm 단위로 변환 (카메라 파라미터 기반)
-            near, far = 0.01, 10.0
-            width, height = 600, 480
+            # 파이불렛 깊이 데이터(0~1)를 공용 카메라 모델로 cm 단위로 변환
             depth_val = depth_data[pixel_y][pixel_x]
-            
-            # 파이불렛 투영 행렬 기반 거리 계산
-            z_m = far * near / (far - (far - near) * depth_val)
-            x_m = (pixel_x - width / 2) * (z_m / width)
-            y_m = (pixel_y - height / 2) * (z_m / height)
-            
+            x_m, y_m, z_m = self.sim_camera.pixel_to_point(pixel_x, pixel_y, depth_val, depth_data.shape)
             return round(x_m * 100, 2), round(y_m * 100, 2), round(z_m * 100, 2)
         else:
             # 리얼센스 픽셀 역투영 (기존 로직)
@@ -89,65 +170,203 @@ class VisionSystem:
                 return round(point[0] * 100, 2), round(point[1] * 100, 2), round(point[2] * 100, 2)
         return 0.0, 0.0, 0.0
 
+    def deproject_boxes(self, boxes_xyxy, depth_data):
+        """
+        모든 탐지 박스의 중심점을 한 번의 NumPy 연산으로 실제 좌표(cm)로 변환함.
+        깊이 값은 모드별로 설정된 샘플링 방식(depth_sampling)에 따라 추출함.
+        depth_data는 파이불렛 모드에서는 깊이 버퍼(0~1) 배열,
+        리얼센스 모드에서는 정렬된 z16 깊이 이미지 배열임.
+        """
+        height, width = depth_data.shape[:2]
+        centers = ((boxes_xyxy[:, :2] + boxes_xyxy[:, 2:]) / 2).astype(np.int32)
+        np.clip(centers[:, 0], 0, width - 1, out=centers[:, 0])
+        np.clip(centers[:, 1], 0, height - 1, out=centers[:, 1])
+        # 중심 한 픽셀 또는 박스 안쪽 영역의 강건한 대표값으로 깊이를 샘플링
+        method = self.depth_sampling['sim' if self.sim_mode else 'real']
+        depth_values = sample_box_depth(depth_data, boxes_xyxy, method=method, inner_ratio=self.roi_ratio)
+
+        if self.sim_mode:
+            # 해상도별로 미리 계산된 광선 격자에서 중심 픽셀의 광선을 꺼내 거리를 곱함
+            points = self.sim_camera.points_at(centers[:, 0], centers[:, 1], depth_values, depth_data.shape)
+        else:
+            pixel_x = centers[:, 0].astype(np.float64)
+            pixel_y = centers[:, 1].astype(np.float64)
+            points = deproject_pixels(self.camera_params, pixel_x, pixel_y, depth_values * self.depth_scale)
+
+        return centers, points * 100
+
+    def build_detection_batch(self, boxes, depth_data):
+        """
+        YOLO 결과의 boxes 텐서를 한 번에 NumPy로 옮겨 DetectionBatch를 생성함.
+        """
+        if boxes is None or len(boxes) == 0:
+            return DetectionBatch.empty()
+
+        boxes_xyxy = boxes.xyxy.cpu().numpy()
+        class_ids = boxes.cls.cpu().numpy().astype(np.int32)
+        confidences = boxes.conf.cpu().numpy()
+        centers, points = self.deproject_boxes(boxes_xyxy, depth_data)
+        names = np.array([self.model.names[class_id] for class_id in class_ids.tolist()], dtype=object)
+        return DetectionBatch(names, class_ids, confidences, boxes_xyxy, centers, points)
+
+    def capture(self):
+        """
+        [수집 단계] 컬러 이미지와 깊이 배열을 한 쌍으로 가져옴.
+        리얼센스 모드에서는 프레임 정렬(align)까지 수행하며,
+        다른 스레드로 넘겨도 안전하도록 프레임 버퍼를 복사해 둠.
+        """
+        started = time.perf_counter()
+        if self.source is not None:
+            # 녹화 세션에서 다음 프레임 재생
+            color_image, depth_data = self.source.read()
+        elif self.sim_mode:
+            # 파이불렛 서버에서 같은 시뮬레이션 스텝의 이미지와 깊이 데이터를 한 번에 수신
+            color_image, depth_data, self.sim_step = self.sim_server.get_frame()
+        else:
+            # 실제 리얼센스 카메라에서 프레임 수신 및 정렬
+            frames = self.pipeline.wait_for_frames(timeout_ms=5000)
+            acquired = time.perf_counter()
+            self.stage_times['acquire'] = acquired - started
+            aligned_frames = self.align.process(frames)
+            color_frame = aligned_frames.get_color_frame()
+            depth_frame = aligned_frames.get_depth_frame()
+            if not color_frame or not depth_frame:
+                return None, None
+            color_image = np.asanyarray(color_frame.get_data()).copy()
+            depth_data = np.asanyarray(depth_frame.get_data()).copy()
+            self.stage_times['align'] = time.perf_counter() - acquired
+
+        if self.sim_mode or self.source is not None:
+            self.stage_times['acquire'] = time.perf_counter() - started
+        if color_image is None or depth_data is None:
+            return None, None
+        with self._record_lock:
+            if self.recorder is not None:
+                self.recorder.write(color_image, depth_data)
+        return color_image, depth_data
+
+    def start_recording(self, path):
+        """
+        이후 수집되는 프레임을 path 폴더에 녹화함.
+        재생 시 좌표 계산을 재현할 수 있도록 모드와 카메라 파라미터를 함께 저장함.
+        """
+        metadata = {'mode': 'sim' if self.sim_mode else 'realsense'}
+        if self.sim_mode:
+            metadata['sim_camera'] = self.sim_camera.metadata()
+        else:
+            metadata['camera_params'] = self.camera_params
+            metadata['depth_scale'] = self.depth_scale
+        with self._record_lock:
+            self.recorder = FrameRecorder(path, metadata)
+        logger.info(f"Recording frames to {path}")
+
+    def stop_recording(self):
+        """녹화를 마치고 메타데이터를 기록함."""
+        with self._record_lock:
+            recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+
+    def detect(self, color_image, depth_data):
+        """
+        [추론 단계] YOLO 탐지와 좌표 변환을 수행하여 DetectionBatch를 반환함.
+        원본 YOLO 결과 객체도 함께 반환함.
+        장면 변화가 없으면 추론을 생략하고 직전 박스의 좌표만 새 깊이로 갱신함.
+        """
+        timestamp = time.monotonic()
+        if self.motion_gate is not None and not self.motion_gate.should_infer(color_image):
+            started = time.perf_counter()
+            batch = self.refresh_detections(depth_data, timestamp)
+            self.stage_times['inference'] = 0.0
+            self.stage_times['deprojection'] = time.perf_counter() - started
+            return batch, self.last_detection_result
+
+        started = time.perf_counter()
+        results = self.model(color_image, conf=0.5)
+        inferred = time.perf_counter()
+        self.stage_times['inference'] = inferred - started
+        batch = DetectionBatch.empty()
+        detection_result = None
+
+        if results:
+            detection_result = results[0]
+            # 모든 박스의 중심/깊이/3D 좌표를 한 번에 계산 (cm 단위)
+            batch = self.build_detection_batch(detection_result.boxes, depth_data)
+
+        if self.tracker is not None:
+            # 추적기를 거쳐 객체별 ID를 부여하고 3D 좌표를 평활화
+            batch = self.tracker.update(batch, timestamp)
+        self.stage_times['deprojection'] = time.perf_counter() - inferred
+
+        self.last_detections = batch
+        self.last_detection_result = detection_result
+        return batch, detection_result
+
+    def refresh_detections(self, depth_data, timestamp=None):
+        """
+        YOLO를 건너뛴 프레임에서 직전 박스(추적기 사용 시 예측 박스)의
+        3D 좌표만 새 깊이 데이터로 다시 계산함.
+        """
+        if self.tracker is not None:
+            batch = self.tracker.predict(time.monotonic() if timestamp is None else timestamp)
+            if len(batch):
+                batch.centers, points = self.deproject_boxes(batch.boxes, depth_data)
+                batch.points = self.tracker.refresh_points(batch.track_ids, points)
+            self.last_detections = batch
+            return batch
+
+        previous = self.last_detections
+        if len(previous) == 0:
+            return previous
+
+        centers, points = self.deproject_boxes(previous.boxes, depth_data)
+        batch = DetectionBatch(previous.names, previous.class_ids, previous.confidences,
+                               previous.boxes, centers, points)
+        self.last_detections = batch
+        return batch
+
+    def force_inference(self):
+        """
+        다음 프레임에서 장면 변화 여부와 관계없이 YOLO 추론을 수행하도록 요청함.
+        로봇 팔이 움직인 직후처럼 탐지 결과를 반드시 새로 얻어야 할 때 호출함.
+        """
+        if self.motion_gate is not None:
+            self.motion_gate.force()
+
+    def render(self, color_image, depth_data, batch):
+        """
+        [표시 단계] 탐지 박스를 그린 이미지와 깊이 컬러맵을 나란히 붙인 화면을 생성함.
+        화면을 실제로 볼 때만 호출되며, 반환 이미지는 재사용되는 버퍼이므로 보관 시 복사해야 함.
+        """
+        rendered = self.renderer.render(color_image, depth_data, batch)
+        self.stage_times.update(self.renderer.timings)
+        return rendered
+
     def process_frame(self):
         """
         프레임을 가져와 물체를 탐지하고 실제 좌표(cm)를 산출함.
-        모드에 따라 파이불렛 서버 또는 리얼센스 카메라에서 데이터를 수신함.
+        수집/추론/표시 단계를 한 스레드에서 순서대로 수행하는 단일 호출용 경로이며,
+        엔진의 실시간 루프는 vision_pipeline.VisionPipeline으로 각 단계를 분리하여 실행함.
         """
         try:
-            if self.sim_mode:
-                # 파이불렛 서버에서 이미지 및 깊이 데이터 수신
-                color_image = self.sim_server.get_rgb_image()
-                depth_frame = self.sim_server.get_depth_data()
-                depth_colormap = cv2.applyColorMap(cv2.convertScaleAbs(depth_frame, alpha=255), cv2.COLORMAP_JET)
-            else:
-                # 실제 리얼센스 카메라에서 프레임 수신 및 정렬
-                frames = self.pipeline.wait_for_frames(timeout_ms=5000)
-                aligned_frames = self.align.process(frames)
-                color_frame = aligned_frames.get_color_frame()
-                depth_frame = aligned_frames.get_depth_frame() # rs.depth_frame 객체
-                color_image = np.asanyarray(color_frame.get_data())
-                depth_colormap = np.asanyarray(self.colorizer.colorize(depth_frame).get_data())
-
-            if color_image is None or depth_frame is None:
+            color_image, depth_data = self.capture()
+            if color_image is None:
                 return None, None, "nothing", []
 
-            # YOLO 탐지 수행
-            results = self.model(color_image, verbose=False, conf=0.5)
-            annotated_image = color_image.copy()
-            detected_items = []
-            coordinates = []
-
-            if results:
-                detection_result = results[0]
-                annotated_image = detection_result.plot()
-                
-                for box in detection_result.boxes:
-                    class_id = int(box.cls[0])
-                    name = self.model.names[class_id]
-                    confidence = float(box.conf[0])
-                    box_coords = box.xyxy[0].cpu().numpy()
-                    center_x = int((box_coords[0] + box_coords[2]) / 2)
-                    center_y = int((box_coords[1] + box_coords[3]) / 2)
-                    
-                    # 좌표 변환 함수 호출 (cm 단위)
-                    real_x, real_y, real_z = self.get_real_world_coordinates(center_x, center_y, depth_frame)
-                    
-                    detected_items.append(name)
-                    coordinates.append({
-                        'name': name, 'confidence': round(confidence, 2),
-                        'x': real_x, 'y': real_y, 'z': real_z
-                    })
-
-            detection_text = ", ".join(set(detected_items)) if detected_items else "nothing"
-            combined_display = np.hstack((annotated_image, depth_colormap))
-            return combined_display, annotated_image, detection_text, coordinates
+            batch, _ = self.detect(color_image, depth_data)
+            combined_display, annotated_image = self.render(color_image, depth_data, batch)
+            return combined_display.copy(), annotated_image.copy(), batch.to_text(), batch.to_coordinates()
             
         except Exception as error:
             logger.error(f"Frame processing error: {error}")
             return None, None, "error", []
 
     def release(self):
-        """리소스 해제 (리얼센스 전용)"""
-        if self.pipeline and not self.sim_mode:
+        """리소스 해제 (녹화 종료, 재생 소스, 시뮬레이터 스트림 및 리얼센스 파이프라인 정리)"""
+        self.stop_recording()
+        if self.source is not None:
+            self.source.release()
+        elif self.sim_server is not None:
+            self.sim_server.stop_stream()
+        elif self.pipeline and not self.sim_mode:
             self.pipeline.stop()
\ No newline at end of file
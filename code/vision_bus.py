@@ -0,0 +1,257 @@
+# code/vision_bus.py
+
+import json
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from detections import DetectionBatch
+from logger import get_logger
+
+logger = get_logger('BUS')
+
+BUS_VERSION = 1
+META_BYTES = 8192    # 배열 형식, 클래스 이름 등을 담은 JSON 영역
+STATS_BYTES = 16384  # 작업 프로세스가 주기적으로 기록하는 통계 JSON 영역 (앞 4바이트는 길이)
+ALIGN = 64
+
+# 제어 영역(int64) 인덱스
+LATEST_SEQ, CAPTURED_SEQ, FORCE_COUNT, STOP_FLAG, WORKER_PID = range(5)
+# 시각 영역(float64) 인덱스
+HEARTBEAT = 0
+
+# 탐지 결과 한 건을 고정 크기 레코드로 저장하기 위한 형식 (track_id가 -1이면 추적 ID 없음)
+DETECTION_DTYPE = np.dtype([
+    ('class_id', '<i4'), ('track_id', '<i4'), ('confidence', '<f4'),
+    ('box', '<f4', (4,)), ('center', '<i4', (2,)), ('point', '<f8', (3,)),
+])
+
+
+def _aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _attach_untracked(name):
+    """
+    다른 프로세스가 만든 공유 메모리에 붙습니다.
+    읽는 쪽이 종료될 때 resource_tracker가 세그먼트를 지워 버리지 않도록 추적 대상에서 제외합니다.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 미만에는 track 인자가 없습니다.
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+class SharedFrameBus:
+    """
+    비전 작업 프로세스가 컬러/깊이 프레임과 탐지 레코드를 써 넣는 공유 메모리 링 버퍼입니다.
+    slots칸을 돌아가며 쓰고, 읽는 쪽은 가장 최근 칸의 프레임과 탐지 레코드를 복사해 갑니다.
+    각 칸의 번호(slot_seq)를 쓰기 전에 -1로 지웠다가 다 쓴 뒤 프레임 번호로 채우므로,
+    읽는 쪽은 복사 전후 번호를 비교해 쓰는 중이거나 복사하는 사이 덮어써진 칸을 걸러냅니다.
+    공유 메모리 칸은 작업 프로세스가 곧 덮어쓰므로, 칸 위의 뷰를 그대로 들고 있으면 안 됩니다.
+    """
+    def __init__(self, shm, meta, owner):
+        self.shm = shm
+        self.meta = meta
+        self.owner = owner
+        self.name = shm.name
+        self.slots = meta['slots']
+        self.max_detections = meta['max_detections']
+        self.names = np.array(meta['names'], dtype=object)
+
+        buf = shm.buf
+        offset = META_BYTES
+        self._stats = np.ndarray((STATS_BYTES,), dtype=np.uint8, buffer=buf, offset=offset)
+        offset = _aligned(offset + STATS_BYTES)
+        layout = [
+            ('control', (8,), np.int64),
+            ('clock', (4,), np.float64),
+            ('slot_seq', (self.slots,), np.int64),
+            ('slot_captured_at', (self.slots,), np.float64),
+            ('slot_count', (self.slots,), np.int32),
+            ('color', (self.slots, *meta['color_shape']), np.dtype(meta['color_dtype'])),
+            ('depth', (self.slots, *meta['depth_shape']), np.dtype(meta['depth_dtype'])),
+            ('records', (self.slots, self.max_detections), DETECTION_DTYPE),
+        ]
+        for attr, shape, dtype in layout:
+            array = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+            setattr(self, attr, array)
+            offset = _aligned(offset + array.nbytes)
+
+    @staticmethod
+    def required_size(meta):
+        """메타 정보에 맞는 공유 메모리 크기(바이트)를 계산합니다."""
+        slots = meta['slots']
+        sizes = [
+            8 * 8, 4 * 8, slots * 8, slots * 8, slots * 4,
+            slots * int(np.prod(meta['color_shape'])) * np.dtype(meta['color_dtype']).itemsize,
+            slots * int(np.prod(meta['depth_shape'])) * np.dtype(meta['depth_dtype']).itemsize,
+            slots * meta['max_detections'] * DETECTION_DTYPE.itemsize,
+        ]
+        size = _aligned(META_BYTES + STATS_BYTES)
+        for nbytes in sizes:
+            size = _aligned(size + nbytes)
+        return size
+
+    @classmethod
+    def create(cls, name, color_image, depth_data, names, slots=8, max_detections=64, **extra_meta):
+        """첫 프레임의 형식을 기준으로 공유 메모리를 새로 만듭니다. (작업 프로세스 쪽)"""
+        if isinstance(names, dict):
+            names = [names.get(i, str(i)) for i in range(max(names) + 1)] if names else []
+        meta = dict(extra_meta, version=BUS_VERSION, slots=slots, max_detections=max_detections,
+                    color_shape=list(color_image.shape), color_dtype=color_image.dtype.str,
+                    depth_shape=list(depth_data.shape), depth_dtype=depth_data.dtype.str,
+                    names=list(names))
+        encoded = json.dumps(meta).encode("utf-8")
+        if len(encoded) > META_BYTES:
+            raise ValueError(f"Bus metadata too large ({len(encoded)} bytes)")
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls.required_size(meta))
+        shm.buf[:len(encoded)] = encoded
+        bus = cls(shm, meta, owner=True)
+        bus.control[:] = 0
+        bus.clock[:] = 0.0
+        bus.slot_seq[:] = -1
+        return bus
+
+    @classmethod
+    def attach(cls, name):
+        """이미 만들어진 공유 메모리에 붙습니다. 없으면 FileNotFoundError가 발생합니다. (엔진 쪽)"""
+        shm = _attach_untracked(name)
+        raw = bytes(shm.buf[:META_BYTES]).split(b"\0", 1)[0]
+        meta = json.loads(raw.decode("utf-8"))
+        if meta.get('version') != BUS_VERSION:
+            shm.close()
+            raise RuntimeError(f"Incompatible vision bus version: {meta.get('version')}")
+        return cls(shm, meta, owner=False)
+
+    # --- 작업 프로세스(쓰기) 쪽 ---
+
+    def mark_captured(self, seq):
+        """수집 단계가 새 프레임 번호를 매겼음을 기록합니다."""
+        self.control[CAPTURED_SEQ] = seq
+
+    def write_packet(self, packet):
+        """파이프라인 발행 패킷(seq, captured_at, color, depth, batch)을 다음 칸에 씁니다."""
+        seq = packet['seq']
+        slot = seq % self.slots
+        batch = packet['batch']
+        count = min(len(batch), self.max_detections)
+
+        self.slot_seq[slot] = -1
+        np.copyto(self.color[slot], packet['color'])
+        np.copyto(self.depth[slot], packet['depth'])
+        records = self.records[slot, :count]
+        records['class_id'] = batch.class_ids[:count]
+        records['track_id'] = batch.track_ids[:count] if batch.track_ids is not None else -1
+        records['confidence'] = batch.confidences[:count]
+        records['box'] = batch.boxes[:count]
+        records['center'] = batch.centers[:count]
+        records['point'] = batch.points[:count]
+        self.slot_count[slot] = count
+        self.slot_captured_at[slot] = packet['captured_at']
+        self.slot_seq[slot] = seq
+        self.control[LATEST_SEQ] = seq
+
+    def heartbeat(self):
+        """작업 프로세스가 살아 있음을 기록합니다."""
+        self.clock[HEARTBEAT] = time.time()
+
+    def write_stats(self, stats):
+        """통계 딕셔너리를 JSON으로 기록합니다. 영역보다 크면 기록하지 않습니다."""
+        encoded = json.dumps(stats).encode("utf-8")
+        if len(encoded) > STATS_BYTES - 4:
+            return
+        self._stats[4:4 + len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+        self._stats[:4] = np.frombuffer(np.uint32(len(encoded)).tobytes(), dtype=np.uint8)
+
+    def consume_force_requests(self, seen):
+        """엔진이 보낸 강제 추론 요청 횟수를 확인하여 (새 요청 여부, 현재 횟수)를 반환합니다."""
+        current = int(self.control[FORCE_COUNT])
+        return current != seen, current
+
+    # --- 엔진(읽기) 쪽 ---
+
+    @property
+    def latest_seq(self):
+        return int(self.control[LATEST_SEQ])
+
+    @property
+    def captured_seq(self):
+        return int(self.control[CAPTURED_SEQ])
+
+    def heartbeat_age(self):
+        """작업 프로세스의 마지막 생존 신호 이후 지난 시간(초)을 반환합니다."""
+        return time.time() - float(self.clock[HEARTBEAT])
+
+    def request_inference(self):
+        """작업 프로세스에 다음 프레임의 YOLO 추론을 강제하도록 요청합니다."""
+        self.control[FORCE_COUNT] += 1
+
+    def request_stop(self):
+        """작업 프로세스에 종료를 요청합니다."""
+        self.control[STOP_FLAG] = 1
+
+    @property
+    def stop_requested(self):
+        return bool(self.control[STOP_FLAG])
+
+    def read_stats(self):
+        """작업 프로세스가 마지막으로 기록한 통계를 반환합니다. 쓰는 도중이면 None을 반환합니다."""
+        length = int(np.frombuffer(self._stats[:4].tobytes(), dtype=np.uint32)[0])
+        if length == 0 or length > STATS_BYTES - 4:
+            return None
+        try:
+            return json.loads(self._stats[4:4 + length].tobytes().decode("utf-8"))
+        except ValueError:
+            return None
+
+    def read_latest(self, after_seq=0):
+        """
+        after_seq보다 새 프레임이 있으면 발행 패킷 형태의 딕셔너리를 반환합니다.
+        color/depth와 탐지 레코드를 모두 복사하므로, 반환한 패킷은 작업 프로세스가 칸을 덮어써도 바뀌지 않습니다.
+        새 프레임이 없거나 해당 칸을 쓰는 중이었거나 복사하는 사이 덮어써졌으면 None을 반환합니다.
+        """
+        seq = self.latest_seq
+        if seq <= after_seq:
+            return None
+        slot = seq % self.slots
+        if self.slot_seq[slot] != seq:
+            return None
+
+        count = int(self.slot_count[slot])
+        records = self.records[slot, :count].copy()
+        captured_at = float(self.slot_captured_at[slot])
+        color = self.color[slot].copy()
+        depth = self.depth[slot].copy()
+        if self.slot_seq[slot] != seq:
+            return None
+
+        track_ids = records['track_id'] if count and (records['track_id'] >= 0).all() else None
+        batch = DetectionBatch(
+            self.names[records['class_id']] if count else np.empty(0, dtype=object),
+            records['class_id'], records['confidence'], records['box'],
+            records['center'], records['point'], track_ids
+        )
+        return {
+            'seq': seq, 'captured_at': captured_at,
+            'color': color, 'depth': depth, 'batch': batch
+        }
+
+    def close(self):
+        """공유 메모리 매핑을 닫습니다. 만든 쪽이라면 세그먼트도 삭제합니다."""
+        for attr in ('_stats', 'control', 'clock', 'slot_seq', 'slot_captured_at',
+                     'slot_count', 'color', 'depth', 'records'):
+            setattr(self, attr, None)
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except (BufferError, FileNotFoundError) as error:
+            logger.warning(f"Vision bus close: {error}")
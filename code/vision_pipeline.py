@@ -0,0 +1,254 @@
+# code/vision_pipeline.py
+
+import threading
+import time
+from collections import deque
+import cv2
+from logger import get_logger
+
+logger = get_logger('PIPELINE')
+
+
+class LatestSlot:
+    """
+    단일 칸짜리 '최신 우선(latest wins)' 버퍼입니다.
+    소비자가 가져가기 전에 새 항목이 들어오면 이전 항목은 버려지므로,
+    느린 단계 앞에 오래된 프레임이 줄줄이 쌓이지 않습니다.
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._item = None
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        """새 항목을 넣습니다. 아직 소비되지 않은 항목이 있으면 덮어씁니다."""
+        with self._condition:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._condition.notify_all()
+
+    def get(self, timeout=None):
+        """항목이 들어올 때까지 기다렸다가 꺼내 갑니다. 시간 초과나 종료 시 None을 반환합니다."""
+        with self._condition:
+            if self._item is None and not self._closed:
+                self._condition.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def close(self):
+        """대기 중인 소비자를 깨우고 더 이상 기다리지 않도록 합니다."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class StageStats:
+    """
+    파이프라인 단계별 처리 속도(FPS)와 지연 시간을 최근 구간 기준으로 집계합니다.
+    """
+    def __init__(self, name, window=30):
+        self.name = name
+        self._lock = threading.Lock()
+        self._stamps = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, latency_s):
+        """한 번의 처리가 끝났음을 기록합니다."""
+        with self._lock:
+            self._stamps.append(time.perf_counter())
+            self._latencies.append(latency_s)
+            self.count += 1
+
+    def snapshot(self):
+        """현재까지의 통계를 딕셔너리로 반환합니다."""
+        with self._lock:
+            fps = 0.0
+            if len(self._stamps) > 1:
+                span = self._stamps[-1] - self._stamps[0]
+                fps = (len(self._stamps) - 1) / span if span > 0 else 0.0
+            latency_ms = sum(self._latencies) / len(self._latencies) * 1000 if self._latencies else 0.0
+            last_ms = self._latencies[-1] * 1000 if self._latencies else 0.0
+            return {
+                'fps': round(fps, 1), 'latency_ms': round(latency_ms, 1),
+                'last_latency_ms': round(last_ms, 1), 'count': self.count
+            }
+
+
+class VisionPipeline:
+    """
+    비전 루프를 수집(capture) / 추론(inference) / 발행(publish) 세 스레드로 분리하여 실행합니다.
+    단계 사이는 LatestSlot으로 연결되어, YOLO가 느려도 깊이 정렬과 프레임 수집은 멈추지 않고
+    발행 단계는 항상 가장 최근에 추론이 끝난 프레임을 내보냅니다.
+    주석/컬러맵 화면은 render_latest()로 실제 화면을 볼 때만 그리며, window_name이 주어지면
+    별도 뷰어 스레드가 display_fps 주기로 화면을 그려 띄웁니다. (None이면 헤드리스)
+    on_capture가 주어지면 수집 단계가 프레임 번호를 매길 때마다 그 번호로 호출됩니다.
+    """
+    def __init__(self, vision, on_publish, window_name=None, min_capture_interval=0.0, display_fps=15,
+                 on_capture=None):
+        self.vision = vision
+        self.on_publish = on_publish
+        self.on_capture = on_capture
+        self.window_name = window_name
+        self.min_capture_interval = min_capture_interval
+        self.display_interval = 1.0 / display_fps
+        self.is_running = False
+        self._latest_packet = None
+        self._rendered = (None, None)
+        self._render_lock = threading.Lock()
+
+        self.capture_slot = LatestSlot()
+        self.result_slot = LatestSlot()
+        self.stats_by_stage = {
+            'capture': StageStats('capture'),
+            'inference': StageStats('inference'),
+            'publish': StageStats('publish'),
+            'render': StageStats('render'),
+        }
+        self._end_to_end = StageStats('end_to_end')
+        self._sequence = 0
+
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name="vision-capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="vision-inference", daemon=True),
+            threading.Thread(target=self._publish_loop, name="vision-publish", daemon=True),
+        ]
+        if self.window_name:
+            self.threads.append(threading.Thread(target=self._viewer_loop, name="vision-viewer", daemon=True))
+
+    def start(self):
+        """모든 단계의 스레드를 시작합니다."""
+        self.is_running = True
+        for thread in self.threads:
+            thread.start()
+        mode = "viewer" if self.window_name else "headless"
+        logger.info(f"Vision pipeline started (capture / inference / publish, {mode})")
+
+    def stop(self):
+        """모든 단계에 종료를 알립니다. 카메라 해제는 수집 스레드가 담당합니다."""
+        self.is_running = False
+        self.capture_slot.close()
+        self.result_slot.close()
+
+    @property
+    def last_captured_seq(self):
+        """수집 단계가 마지막으로 매긴 프레임 번호입니다."""
+        return self._sequence
+
+    def stats(self):
+        """단계별 FPS, 지연 시간, 버려진 프레임 수를 반환합니다."""
+        report = {name: stage.snapshot() for name, stage in self.stats_by_stage.items()}
+        report['capture']['dropped'] = self.capture_slot.dropped
+        report['inference']['dropped'] = self.result_slot.dropped
+        report['end_to_end_ms'] = self._end_to_end.snapshot()['latency_ms']
+        return report
+
+    def _capture_loop(self):
+        """[수집 스레드] 카메라(또는 시뮬레이터)에서 프레임을 받아 최신 칸에 넣습니다."""
+        try:
+            while self.is_running:
+                started = time.perf_counter()
+                try:
+                    color_image, depth_data = self.vision.capture()
+                except Exception as error:
+                    logger.error(f"Capture error: {error}")
+                    color_image, depth_data = None, None
+
+                if color_image is None:
+                    # 수신 실패 시 서버를 두드리지 않도록 잠시 쉬었다가 재시도
+                    time.sleep(0.05)
+                    continue
+
+                self._sequence += 1
+                if self.on_capture is not None:
+                    self.on_capture(self._sequence)
+                self.capture_slot.put({
+                    'seq': self._sequence, 'captured_at': started,
+                    'color': color_image, 'depth': depth_data
+                })
+                elapsed = time.perf_counter() - started
+                self.stats_by_stage['capture'].record(elapsed)
+
+                if self.min_capture_interval > elapsed:
+                    time.sleep(self.min_capture_interval - elapsed)
+        finally:
+            self.vision.release()
+            logger.info("Capture stage stopped")
+
+    def _inference_loop(self):
+        """[추론 스레드] 가장 최근 프레임에 대해서만 YOLO 탐지와 좌표 변환을 수행합니다."""
+        while self.is_running:
+            packet = self.capture_slot.get(timeout=0.5)
+            if packet is None:
+                continue
+
+            started = time.perf_counter()
+            try:
+                batch, detection_result = self.vision.detect(packet['color'], packet['depth'])
+            except Exception as error:
+                logger.error(f"Inference error: {error}")
+                continue
+
+            packet['batch'] = batch
+            packet['result'] = detection_result
+            self.result_slot.put(packet)
+            self.stats_by_stage['inference'].record(time.perf_counter() - started)
+
+    def _publish_loop(self):
+        """[발행 스레드] 추론 결과를 엔진 상태에 반영합니다. 화면 그리기는 하지 않습니다."""
+        while self.is_running:
+            packet = self.result_slot.get(timeout=0.5)
+            if packet is None:
+                continue
+
+            started = time.perf_counter()
+            try:
+                self.on_publish(packet)
+            except Exception as error:
+                logger.error(f"Publish error: {error}")
+                continue
+            self._latest_packet = packet
+
+            finished = time.perf_counter()
+            self.stats_by_stage['publish'].record(finished - started)
+            self._end_to_end.record(finished - packet['captured_at'])
+
+    def render_latest(self):
+        """
+        가장 최근에 발행된 프레임의 합성 화면과 주석 이미지를 그려 반환합니다.
+        같은 프레임을 여러 번 요청하면 다시 그리지 않고 이전 결과를 돌려줍니다.
+        반환 이미지는 재사용 버퍼이므로 보관하려면 복사해야 합니다.
+        """
+        packet = self._latest_packet
+        if packet is None:
+            return None, None
+
+        with self._render_lock:
+            if self._rendered[0] != packet['seq']:
+                started = time.perf_counter()
+                combined, annotated = self.vision.render(packet['color'], packet['depth'], packet['batch'])
+                self._rendered = (packet['seq'], (combined, annotated))
+                self.stats_by_stage['render'].record(time.perf_counter() - started)
+            return self._rendered[1]
+
+    def _viewer_loop(self):
+        """[뷰어 스레드] 화면 주기(display_fps)에 맞춰 최신 프레임을 그려 창에 띄웁니다."""
+        try:
+            while self.is_running:
+                started = time.perf_counter()
+                combined, _ = self.render_latest()
+                if combined is not None:
+                    cv2.imshow(self.window_name, combined)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    self.stop()
+                    break
+
+                remaining = self.display_interval - (time.perf_counter() - started)
+                if remaining > 0:
+                    time.sleep(remaining)
+        except Exception as error:
+            logger.error(f"Viewer error: {error}")
+        finally:
+            cv2.destroyAllWindows()
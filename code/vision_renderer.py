@@ -0,0 +1,68 @@
+# code/vision_renderer.py
+
+import threading
+import time
+import cv2
+import numpy as np
+
+
+class VisionRenderer:
+    """
+    탐지 결과 주석과 깊이 컬러맵을 좌우로 붙인 화면을 그리는 클래스입니다.
+    화면 버퍼를 미리 할당해 두고 매번 같은 메모리에 덮어 그리므로 프레임마다 새 배열을 만들지 않습니다.
+    반환되는 이미지는 다음 render 호출 시 덮어써지므로, 보관하려면 복사해서 사용해야 합니다.
+    """
+    def __init__(self, sim_mode=False):
+        self.sim_mode = sim_mode
+        self._lock = threading.Lock()
+        self._combined = None
+        self._depth_u8 = None
+        # 최근 render 호출의 주석(annotation)/합성(composition) 소요 시간(초)
+        self.timings = {}
+        # 클래스 번호별로 고정된 박스 색상표
+        self._palette = np.random.default_rng(7).integers(64, 256, size=(80, 3)).tolist()
+
+    def _ensure_buffers(self, height, width):
+        """해상도가 바뀌었을 때만 화면 버퍼를 다시 할당합니다."""
+        if self._combined is None or self._combined.shape[:2] != (height, width * 2):
+            self._combined = np.empty((height, width * 2, 3), dtype=np.uint8)
+            self._depth_u8 = np.empty((height, width), dtype=np.uint8)
+
+    def render(self, color_image, depth_data, batch):
+        """
+        주석 이미지와 깊이 컬러맵을 합친 화면을 그려 (합성 화면, 주석 이미지 영역)을 반환합니다.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            height, width = color_image.shape[:2]
+            self._ensure_buffers(height, width)
+            annotated = self._combined[:, :width]
+            depth_view = self._combined[:, width:]
+
+            np.copyto(annotated, color_image)
+            self._draw_detections(annotated, batch)
+            annotated_at = time.perf_counter()
+
+            # 깊이 컬러맵은 합성 버퍼의 오른쪽 절반에 바로 그립니다.
+            alpha = 255 if self.sim_mode else 0.03
+            cv2.convertScaleAbs(depth_data, dst=self._depth_u8, alpha=alpha)
+            cv2.applyColorMap(self._depth_u8, cv2.COLORMAP_JET, dst=depth_view)
+            self.timings = {
+                'annotation': annotated_at - started,
+                'composition': time.perf_counter() - annotated_at
+            }
+            return self._combined, annotated
+
+    def _draw_detections(self, image, batch):
+        """탐지 박스와 '이름#ID 거리' 라벨을 이미지 위에 그립니다."""
+        track_ids = batch.track_ids.tolist() if batch.track_ids is not None else [None] * len(batch)
+        for box, name, class_id, track_id, point in zip(
+            batch.boxes.astype(np.int32).tolist(), batch.names.tolist(),
+            batch.class_ids.tolist(), track_ids, batch.points.tolist()
+        ):
+            color = self._palette[class_id % len(self._palette)]
+            label = f"{name}#{track_id}" if track_id is not None else name
+            label += f" {point[2]:.0f}cm"
+            cv2.rectangle(image, (box[0], box[1]), (box[2], box[3]), color, 2)
+            cv2.putText(image, label, (box[0], max(box[1] - 6, 12)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
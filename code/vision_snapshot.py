@@ -0,0 +1,68 @@
+# code/vision_snapshot.py
+
+import threading
+import time
+
+
+class VisionSnapshot:
+    """
+    한 프레임의 비전 결과(원본 프레임, 탐지 문자열, 좌표 목록)를 한 덩어리로 묶은 불변 객체입니다.
+    seq는 수집 단계에서 매긴 프레임 번호이며, captured_at은 프레임을 받은 시각(time.perf_counter)입니다.
+    세 값을 따로따로 읽다가 서로 다른 프레임의 값이 섞이는 일을 막기 위해 항상 통째로 교체됩니다.
+    """
+    __slots__ = ('seq', 'captured_at', 'published_at', 'frame', 'vision_result', 'coordinates', 'batch')
+
+    def __init__(self, seq, captured_at, frame=None, vision_result="nothing", coordinates=(), batch=None):
+        if frame is not None:
+            # 스냅샷을 공유하는 다른 스레드가 프레임을 고쳐 쓰지 못하도록 읽기 전용으로 만듭니다.
+            frame.setflags(write=False)
+        values = {
+            'seq': seq, 'captured_at': captured_at, 'published_at': time.perf_counter(),
+            'frame': frame, 'vision_result': vision_result,
+            'coordinates': tuple(coordinates), 'batch': batch,
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("VisionSnapshot is immutable")
+
+    @property
+    def age(self):
+        """프레임을 받은 뒤 지난 시간(초)을 반환합니다."""
+        return time.perf_counter() - self.captured_at
+
+
+class SnapshotStore:
+    """
+    최신 VisionSnapshot 하나를 잠금으로 보호하며 보관합니다.
+    발행 스레드는 publish()로 스냅샷을 원자적으로 교체하고, 에이전트 도구는 latest()로 읽거나
+    wait_for_snapshot()으로 특정 프레임 이후의 새 스냅샷이 들어올 때까지 잠시 기다릴 수 있습니다.
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._snapshot = VisionSnapshot(seq=0, captured_at=time.perf_counter())
+
+    def publish(self, snapshot):
+        """새 스냅샷으로 교체하고 기다리는 스레드를 깨웁니다. 이전 프레임 번호의 스냅샷은 무시합니다."""
+        with self._condition:
+            if snapshot.seq < self._snapshot.seq:
+                return False
+            self._snapshot = snapshot
+            self._condition.notify_all()
+            return True
+
+    def latest(self):
+        """가장 최근 스냅샷을 반환합니다."""
+        with self._condition:
+            return self._snapshot
+
+    def wait_for_snapshot(self, newer_than=0, timeout=None):
+        """
+        프레임 번호가 newer_than보다 큰 스냅샷이 들어올 때까지 최대 timeout초 기다립니다.
+        시간 안에 들어오지 않으면 None을 반환합니다.
+        """
+        with self._condition:
+            if self._condition.wait_for(lambda: self._snapshot.seq > newer_than, timeout):
+                return self._snapshot
+            return None
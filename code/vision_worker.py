@@ -0,0 +1,262 @@
+# code/vision_worker.py
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from vision_bus import SharedFrameBus
+from vision_pipeline import StageStats
+from vision_renderer import VisionRenderer
+from logger import get_logger
+
+logger = get_logger('WORKER')
+
+
+def bus_name_for(sim_mode):
+    """모드별 공유 메모리 이름. 같은 이름으로 다시 붙으면 실행 중인 작업 프로세스를 재사용합니다."""
+    return f"mach_vision_{'sim' if sim_mode else 'real'}"
+
+
+def run_worker(bus_name, sim_mode=False, replay=None, slots=8, stats_interval=1.0):
+    """
+    [작업 프로세스] 카메라/YOLO를 이 프로세스에서 소유하고, 발행 결과를 공유 메모리 링 버퍼에 씁니다.
+    엔진이 종료를 요청하거나 부모 프로세스(Streamlit 서버)가 사라지면 정리하고 끝냅니다.
+    """
+    # 무거운 모듈은 작업 프로세스에서만 불러옵니다.
+    from vision import VisionSystem
+    from vision_pipeline import VisionPipeline
+    from frame_source import ReplaySource
+
+    parent_pid = os.getppid()
+    source = ReplaySource(replay, pacing="realtime") if replay else None
+    vision = VisionSystem(sim_mode=sim_mode, source=source)
+
+    # 첫 프레임으로 공유 메모리의 배열 크기와 형식을 정합니다.
+    color_image, depth_data = vision.capture()
+    while color_image is None:
+        if os.getppid() != parent_pid:
+            vision.release()
+            return
+        time.sleep(0.2)
+        color_image, depth_data = vision.capture()
+
+    bus = SharedFrameBus.create(bus_name, color_image, depth_data, vision.model.names,
+                                slots=slots, sim_mode=vision.sim_mode)
+    bus.heartbeat()
+    pipeline = VisionPipeline(
+        vision, on_publish=bus.write_packet, on_capture=bus.mark_captured,
+        min_capture_interval=1 / 30 if vision.sim_mode else 0.0
+    )
+    pipeline.start()
+    logger.info(f"Vision worker {os.getpid()} publishing to shared memory '{bus_name}'")
+
+    force_seen, stats_at = 0, 0.0
+    try:
+        while pipeline.is_running and not bus.stop_requested:
+            if os.getppid() != parent_pid:
+                logger.info("Parent process exited, stopping vision worker")
+                break
+
+            requested, force_seen = bus.consume_force_requests(force_seen)
+            if requested:
+                vision.force_inference()
+            bus.heartbeat()
+
+            now = time.monotonic()
+            if now - stats_at >= stats_interval:
+                stats = pipeline.stats()
+                if vision.motion_gate is not None:
+                    stats['motion_gate'] = vision.motion_gate.stats()
+                bus.write_stats(stats)
+                stats_at = now
+            time.sleep(0.02)
+    finally:
+        pipeline.stop()
+        for thread in pipeline.threads:
+            thread.join(timeout=5)
+        bus.close()
+        logger.info("Vision worker stopped")
+
+
+class VisionWorkerClient:
+    """
+    [엔진 쪽] 비전 작업 프로세스를 띄우거나 이미 실행 중인 프로세스의 공유 메모리에 붙어,
+    새 프레임이 발행될 때마다 on_publish(packet)를 호출하는 읽기 스레드를 돌립니다.
+    VisionPipeline과 같은 인터페이스(start/stop/stats/render_latest/last_captured_seq)를 제공하므로
+    엔진은 같은 프로세스 파이프라인과 구분하지 않고 사용할 수 있습니다.
+    YOLO와 cv2 작업이 다른 프로세스에서 돌기 때문에 Streamlit 화면이 GIL 경합으로 끊기지 않으며,
+    공유 메모리 이름이 고정되어 있어 Streamlit이 엔진을 다시 만들어도 카메라를 재시작하지 않습니다.
+    packet의 color/depth는 공유 메모리 칸에서 복사한 배열이므로, 작업 프로세스가 칸을 덮어써도 바뀌지 않습니다.
+    """
+    def __init__(self, on_publish, sim_mode=False, replay=None, bus_name=None,
+                 startup_timeout=60.0, stale_after=3.0, poll_interval=0.005):
+        self.on_publish = on_publish
+        self.sim_mode = sim_mode
+        self.replay = replay
+        self.bus_name = bus_name or bus_name_for(sim_mode)
+        self.startup_timeout = startup_timeout
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+
+        self.bus = None
+        self.process = None
+        self.is_running = False
+        self.renderer = VisionRenderer(sim_mode=sim_mode)
+        self._latest_packet = None
+        self._rendered = (None, None)
+        self._render_lock = threading.Lock()
+        self.stats_by_stage = {'bus_read': StageStats('bus_read'), 'render': StageStats('render')}
+        self._end_to_end = StageStats('end_to_end')
+        self.threads = [threading.Thread(target=self._reader_loop, name="vision-bus-reader", daemon=True)]
+
+    def start(self):
+        """작업 프로세스에 붙거나(없으면 새로 띄우고) 읽기 스레드를 시작합니다."""
+        self.bus = self._attach_existing() or self._spawn_worker()
+        self.is_running = True
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, shutdown_worker=True):
+        """읽기 스레드를 멈춥니다. shutdown_worker가 True이면 작업 프로세스에도 종료를 요청합니다."""
+        self.is_running = False
+        for thread in self.threads:
+            if thread.is_alive():
+                thread.join(timeout=1)
+        if self.bus is None:
+            return
+        if shutdown_worker:
+            self.bus.request_stop()
+            if self.process is not None:
+                try:
+                    self.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.process.terminate()
+        self._latest_packet = None
+        self._rendered = (None, None)
+        self.bus.close()
+        self.bus = None
+
+    def _attach_existing(self):
+        """살아 있는 작업 프로세스의 공유 메모리가 있으면 붙고, 멈춘 채 남은 세그먼트는 지웁니다."""
+        try:
+            bus = SharedFrameBus.attach(self.bus_name)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if bus.stop_requested or bus.heartbeat_age() > self.stale_after:
+            logger.warning(f"Removing stale vision bus '{self.bus_name}'")
+            try:
+                bus.shm.unlink()
+            except FileNotFoundError:
+                pass
+            bus.close()
+            return None
+
+        logger.info(f"Attached to running vision worker on '{self.bus_name}'")
+        return bus
+
+    def _spawn_worker(self):
+        """작업 프로세스를 띄우고 공유 메모리가 준비될 때까지 기다립니다."""
+        command = [sys.executable, os.path.abspath(__file__), "--bus", self.bus_name]
+        if self.sim_mode:
+            command.append("--sim")
+        if self.replay:
+            command += ["--replay", self.replay]
+        self.process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)))
+        logger.info(f"Spawned vision worker (pid {self.process.pid})")
+
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Vision worker exited with code {self.process.returncode}")
+            try:
+                bus = SharedFrameBus.attach(self.bus_name)
+            except (FileNotFoundError, ValueError):
+                # 아직 만들어지지 않았거나 메타 정보를 쓰는 중입니다.
+                time.sleep(0.2)
+                continue
+            if bus.heartbeat_age() < self.stale_after:
+                return bus
+            bus.close()
+            time.sleep(0.2)
+
+        self.process.terminate()
+        raise TimeoutError(f"Vision worker did not start within {self.startup_timeout:.0f}s")
+
+    @property
+    def last_captured_seq(self):
+        """작업 프로세스의 수집 단계가 마지막으로 매긴 프레임 번호입니다."""
+        return self.bus.captured_seq if self.bus is not None else 0
+
+    def force_inference(self):
+        """작업 프로세스에 다음 프레임의 YOLO 추론을 강제하도록 요청합니다."""
+        if self.bus is not None:
+            self.bus.request_inference()
+
+    def _reader_loop(self):
+        """[읽기 스레드] 새 프레임이 들어올 때마다 엔진에 발행합니다."""
+        last_seq = 0
+        warned = False
+        while self.is_running:
+            packet = self.bus.read_latest(after_seq=last_seq)
+            if packet is None:
+                if not warned and self.bus.heartbeat_age() > self.stale_after:
+                    logger.warning("Vision worker heartbeat lost")
+                    warned = True
+                time.sleep(self.poll_interval)
+                continue
+
+            warned = False
+            started = time.perf_counter()
+            try:
+                self.on_publish(packet)
+            except Exception as error:
+                logger.error(f"Publish error: {error}")
+            last_seq = packet['seq']
+            self._latest_packet = packet
+
+            finished = time.perf_counter()
+            self.stats_by_stage['bus_read'].record(finished - started)
+            # perf_counter는 시스템 전역 단조 시계이므로 작업 프로세스의 수집 시각과 비교할 수 있습니다.
+            self._end_to_end.record(finished - packet['captured_at'])
+
+    def render_latest(self):
+        """가장 최근 프레임의 합성 화면과 주석 이미지를 이 프로세스에서 그려 반환합니다."""
+        packet = self._latest_packet
+        if packet is None:
+            return None, None
+
+        with self._render_lock:
+            if self._rendered[0] != packet['seq']:
+                started = time.perf_counter()
+                rendered = self.renderer.render(packet['color'], packet['depth'], packet['batch'])
+                self._rendered = (packet['seq'], rendered)
+                self.stats_by_stage['render'].record(time.perf_counter() - started)
+            return self._rendered[1]
+
+    def stats(self):
+        """작업 프로세스가 기록한 단계별 통계에 이 프로세스의 읽기/그리기 통계를 더해 반환합니다."""
+        if self.bus is None:
+            return {}
+        report = self.bus.read_stats() or {}
+        for name, stage in self.stats_by_stage.items():
+            report[name] = stage.snapshot()
+        report['end_to_end_ms'] = self._end_to_end.snapshot()['latency_ms']
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MACH VII 비전 작업 프로세스")
+    parser.add_argument("--bus", default=None, help="공유 메모리 이름")
+    parser.add_argument("--sim", action="store_true", help="파이불렛 시뮬레이션 모드")
+    parser.add_argument("--replay", default=None, help="녹화 세션 폴더")
+    parser.add_argument("--slots", type=int, default=8, help="링 버퍼 칸 수")
+    args = parser.parse_args()
+    run_worker(args.bus or bus_name_for(args.sim), sim_mode=args.sim, replay=args.replay, slots=args.slots)
+
+
+if __name__ == "__main__":
+    main()